@@ -5,10 +5,15 @@ import argparse
 import logging
 import sys
 from pathlib import Path
-from typing import Callable, Dict
+from typing import Callable, Dict, List, Optional
 
 import pandas as pd
 
+from column_requirements import required_source_columns
+from dataset_schemas import apply_schema
+from ingest_readers import stream_filter_csv
+from raw_cache import cached_read, project
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 RAW_DIR = PROJECT_ROOT / "data" / "raw"
 PROCESSED_DIR = PROJECT_ROOT / "data" / "processed"
@@ -23,6 +28,11 @@ DATASETS = {
     "census": RAW_DIR / "census_state_indicators.csv",
 }
 
+# The WHO extract covers every country and year; only the India slice is kept,
+# filtered while the file is scanned. None keeps every WHO indicator column.
+WHO_COUNTRY = "india"
+WHO_COLUMNS: Optional[List[str]] = None
+
 
 def configure_logging() -> logging.Logger:
     logger = logging.getLogger("ingest_sources")
@@ -42,12 +52,30 @@ def configure_logging() -> logging.Logger:
     return logger
 
 
-def read_file(path: Path, loader: Callable[[Path], pd.DataFrame], logger: logging.Logger) -> pd.DataFrame:
+def read_file(
+    path: Path,
+    loader: Callable[[Path], pd.DataFrame],
+    logger: logging.Logger,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    cache_variant: str = "",
+    columns: Optional[Callable[[str], bool]] = None,
+) -> pd.DataFrame:
     if not path.exists() or path.stat().st_size == 0:
         logger.warning("File %s missing or empty; returning empty DataFrame.", path)
         return pd.DataFrame()
     try:
-        df = loader(path)
+        if use_cache:
+            df = cached_read(
+                path,
+                loader,
+                logger,
+                refresh=refresh_cache,
+                variant=cache_variant,
+                columns=columns,
+            )
+        else:
+            df = project(loader(path), columns)
         if df.empty:
             logger.warning("File %s loaded but contains no rows.", path)
         return df
@@ -57,14 +85,20 @@ def read_file(path: Path, loader: Callable[[Path], pd.DataFrame], logger: loggin
 
 
 def load_who(path: Path) -> pd.DataFrame:
-    df = pd.read_csv(path)
+    try:
+        df = stream_filter_csv(path, "country", WHO_COUNTRY, columns=WHO_COLUMNS)
+    except KeyError:
+        df = pd.read_csv(path)
     columns = {c: c.strip().lower() for c in df.columns}
     df.rename(columns=columns, inplace=True)
-    if "country" in df.columns:
-        df = df[df["country"].str.lower() == "india"]
     return df
 
 
+def who_cache_variant() -> str:
+    columns = ",".join(sorted(WHO_COLUMNS)) if WHO_COLUMNS is not None else "*"
+    return f"country={WHO_COUNTRY};columns={columns}"
+
+
 def load_excel(path: Path) -> pd.DataFrame:
     return pd.read_excel(path)
 
@@ -73,11 +107,20 @@ def load_csv(path: Path) -> pd.DataFrame:
     return pd.read_csv(path)
 
 
+def clean_column_name(name: object) -> str:
+    return str(name).strip().lower().replace(" ", "_")
+
+
+def column_selector(dataset_name: str) -> Callable[[str], bool]:
+    needed = required_source_columns(dataset_name)
+    return lambda column: clean_column_name(column) in needed
+
+
 def clean_generic(df: pd.DataFrame, dataset_name: str) -> pd.DataFrame:
     if df.empty:
         return df
     df = df.copy()
-    df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
+    df.columns = [clean_column_name(c) for c in df.columns]
     df["source_dataset"] = dataset_name
     return df
 
@@ -89,7 +132,13 @@ def save_dataset(df: pd.DataFrame, name: str, logger: logging.Logger) -> None:
     logger.info("Saved %s rows to %s", len(df), output_path)
 
 
-def ingest_datasets(selected: Dict[str, Path], logger: logging.Logger) -> None:
+def ingest_datasets(
+    selected: Dict[str, Path],
+    logger: logging.Logger,
+    use_cache: bool = True,
+    refresh_cache: bool = False,
+    full_panel: bool = False,
+) -> None:
     loaders: Dict[str, Callable[[Path], pd.DataFrame]] = {
         "who_tb_global": load_who,
         "india_tb_reports": load_excel,
@@ -98,9 +147,19 @@ def ingest_datasets(selected: Dict[str, Path], logger: logging.Logger) -> None:
         "nfhs": load_csv,
         "census": load_csv,
     }
+    cache_variants = {"who_tb_global": who_cache_variant()}
     for name, path in selected.items():
-        df = read_file(path, loaders[name], logger)
+        df = read_file(
+            path,
+            loaders[name],
+            logger,
+            use_cache,
+            refresh_cache,
+            cache_variants.get(name, ""),
+            None if full_panel else column_selector(name),
+        )
         df = clean_generic(df, name)
+        df = apply_schema(df, name, logger)
         save_dataset(df, name, logger)
 
 
@@ -113,6 +172,21 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Skip WHO TB global dataset processing if already done.",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Parse raw files directly instead of using the columnar raw-file cache.",
+    )
+    parser.add_argument(
+        "--refresh-cache",
+        action="store_true",
+        help="Re-convert every raw file into the columnar cache even if unchanged.",
+    )
+    parser.add_argument(
+        "--full-panel",
+        action="store_true",
+        help="Keep every source column instead of only those downstream stages declare.",
+    )
     return parser.parse_args()
 
 
@@ -125,7 +199,13 @@ def main() -> None:
         logger.info("Skip WHO dataset flag detected; removing from processing queue.")
         datasets_to_process.pop("who_tb_global")
 
-    ingest_datasets(datasets_to_process, logger)
+    ingest_datasets(
+        datasets_to_process,
+        logger,
+        use_cache=not args.no_cache,
+        refresh_cache=args.refresh_cache,
+        full_panel=args.full_panel,
+    )
     logger.info("Ingestion complete.")
 
 
@@ -1,17 +1,23 @@
 """Clean and merge processed datasets into a state-year panel."""
 from __future__ import annotations
 
+import argparse
 import logging
 import sys
-from functools import reduce
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Optional
 
 import pandas as pd
 
+from column_requirements import required_panel_columns, required_source_columns
+from dataset_schemas import memory_mb, read_csv_with_schema, widen_floats
+from geography import resolve_districts, resolve_states
+from panel_builder import build_panel
+from panel_store import panel_csv_path, panel_store_dir, write_panel_store
+from variable_catalogue import write_variable_store
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 PROCESSED_DIR = PROJECT_ROOT / "data" / "processed"
-OUTPUT_PATH = PROCESSED_DIR / "state_year_panel.csv"
 LOG_PATH = PROCESSED_DIR / "clean_merge.log"
 
 PROCESSED_FILES = {
@@ -23,18 +29,6 @@ PROCESSED_FILES = {
     "census": PROCESSED_DIR / "census_clean.csv",
 }
 
-STATE_ALIASES = {
-    "andaman and nicobar islands": "andaman & nicobar islands",
-    "dadra and nagar haveli and daman and diu": "dadra & nagar haveli and daman & diu",
-    "odisha": "odisha",
-    "orissa": "odisha",
-    "nct of delhi": "delhi",
-    "delhi": "delhi",
-    "uttaranchal": "uttarakhand",
-    "pondicherry": "puducherry",
-    "telangana": "telangana",
-}
-
 STATE_CANDIDATES = {
     "state",
     "state_ut",
@@ -44,8 +38,18 @@ STATE_CANDIDATES = {
     "state/ut",
     "name",
 }
+DISTRICT_CANDIDATES = {"district", "district_name", "districts"}
 YEAR_CANDIDATES = {"year", "fy", "financial_year", "survey_year", "time"}
 
+# How sources without a year column attach to a state-year panel
+# (see panel_builder.BROADCAST_RULES and FIXED_YEAR_RULE).
+YEARLESS_BROADCAST = {
+    "india_tb_reports": "all_years",
+    "india_tb_notifications_2025": ("year", 2025),
+    "nfhs": "all_years",
+    "census": "all_years",
+}
+
 
 def configure_logging() -> logging.Logger:
     logger = logging.getLogger("clean_merge")
@@ -65,14 +69,6 @@ def configure_logging() -> logging.Logger:
     return logger
 
 
-def normalize_state_name(value: str) -> str:
-    if value is None:
-        return "unknown"
-    normalized = str(value).strip().lower()
-    normalized = normalized.replace("&", "and")
-    return STATE_ALIASES.get(normalized, normalized.title())
-
-
 def detect_column(df: pd.DataFrame, candidates: set[str]) -> Optional[str]:
     for col in df.columns:
         if col.lower() in candidates:
@@ -80,17 +76,29 @@ def detect_column(df: pd.DataFrame, candidates: set[str]) -> Optional[str]:
     return None
 
 
-def load_dataset(path: Path, dataset_name: str, logger: logging.Logger) -> pd.DataFrame:
+def load_dataset(
+    path: Path,
+    dataset_name: str,
+    logger: logging.Logger,
+    full_panel: bool = False,
+    level: str = "state",
+) -> pd.DataFrame:
     if not path.exists() or path.stat().st_size == 0:
         logger.warning("Processed file %s missing or empty.", path)
         return pd.DataFrame()
-    df = pd.read_csv(path)
+    usecols = None
+    if not full_panel:
+        needed = required_source_columns(dataset_name)
+        usecols = lambda column: str(column).strip().lower() in needed  # noqa: E731
+    df = read_csv_with_schema(path, dataset_name, logger, usecols=usecols)
     if df.empty:
         logger.warning("Processed file %s contains no data.", path)
-    return standardize_dataset(df, dataset_name, logger)
+    return standardize_dataset(df, dataset_name, logger, level)
 
 
-def standardize_dataset(df: pd.DataFrame, dataset_name: str, logger: logging.Logger) -> pd.DataFrame:
+def standardize_dataset(
+    df: pd.DataFrame, dataset_name: str, logger: logging.Logger, level: str = "state"
+) -> pd.DataFrame:
     if df.empty:
         return df
     df = df.copy()
@@ -99,59 +107,107 @@ def standardize_dataset(df: pd.DataFrame, dataset_name: str, logger: logging.Log
     if not state_col:
         logger.error("Dataset %s lacks a recognizable state column.", dataset_name)
         return pd.DataFrame()
-    df["state"] = df[state_col].apply(normalize_state_name)
+    df["state"] = resolve_states(df[state_col], logger).astype("category")
+    keys = ["state"]
+    drop_cols = {state_col}
+    if level == "district":
+        district_col = detect_column(df, DISTRICT_CANDIDATES)
+        if not district_col:
+            logger.info("Dataset %s has no district column; left out of the district panel.", dataset_name)
+            return pd.DataFrame()
+        df["district"] = resolve_districts(df[district_col], df["state"].astype(object), logger)
+        df["district"] = df["district"].astype("category")
+        keys = ["district", "state"]
+        drop_cols.add(district_col)
     year_col = detect_column(df, YEAR_CANDIDATES)
     if year_col:
-        df["year"] = df[year_col]
+        df["year"] = df[year_col].astype("category")
     else:
-        logger.info("Dataset %s lacks year column; merging on state only.", dataset_name)
-    drop_cols = {state_col}
+        logger.info("Dataset %s lacks year column; merging on %s only.", dataset_name, level)
     if year_col:
         drop_cols.add(year_col)
+    keys += ["year"] if "year" in df.columns else []
     value_cols = [
-        c for c in df.columns if c not in drop_cols.union({"state", "year"})
+        c for c in df.columns if c not in drop_cols.union(keys)
     ]
-    ordered_cols = ["state"] + (["year"] if "year" in df.columns else []) + value_cols
-    df = df[ordered_cols]
+    df = df[keys + value_cols]
     renamed_cols = {
-        col: (col if col in {"state", "year"} else f"{dataset_name}_{col}")
+        col: (col if col in keys else f"{dataset_name}_{col}")
         for col in df.columns
     }
     df.rename(columns=renamed_cols, inplace=True)
     return df
 
 
-def merge_datasets(datasets: Dict[str, pd.DataFrame], logger: logging.Logger) -> pd.DataFrame:
-    frames: List[pd.DataFrame] = [df for df in datasets.values() if not df.empty]
-    if not frames:
-        logger.warning("No datasets available to merge; writing empty panel.")
-        return pd.DataFrame(columns=["state", "year"])
-
-    def merge_two(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
-        if right.empty:
-            return left
-        keys = [k for k in ["state", "year"] if k in left.columns and k in right.columns]
-        if not keys:
-            keys = ["state"]
-        logger.info("Merging on keys: %s", keys)
-        return pd.merge(left, right, on=keys, how="outer")
-
-    merged = reduce(merge_two, frames)
+def merge_datasets(
+    datasets: Dict[str, pd.DataFrame], logger: logging.Logger, level: str = "state"
+) -> pd.DataFrame:
+    if level == "district":
+        # Districts are keyed by their "District, State" id; the state column
+        # is re-attached after the join rather than merged as a value.
+        district_states = {}
+        for df in datasets.values():
+            if not df.empty:
+                district_states.update(zip(df["district"].astype(object), df["state"].astype(object)))
+        datasets = {name: df.drop(columns=["state"], errors="ignore") for name, df in datasets.items()}
+        merged = build_panel(datasets, logger, broadcast=YEARLESS_BROADCAST, unit="district")
+        if "district" in merged.columns:
+            merged.insert(1, "state", merged["district"].astype(object).map(district_states).astype("category"))
+        merged.sort_values(by=[c for c in ["year", "state", "district"] if c in merged.columns], inplace=True)
+        return merged
+    merged = build_panel(datasets, logger, broadcast=YEARLESS_BROADCAST)
     merged.sort_values(by=[c for c in ["year", "state"] if c in merged.columns], inplace=True)
     return merged
 
 
+def project_panel(panel: pd.DataFrame, logger: logging.Logger) -> pd.DataFrame:
+    wanted = {"district", "state", "year"} | required_panel_columns()
+    missing = sorted(wanted - set(panel.columns) - {"district", "year"})
+    if missing:
+        logger.warning("Panel lacks columns declared by downstream stages: %s", ", ".join(missing))
+    return panel[[c for c in panel.columns if c in wanted]]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Clean and merge processed datasets into a state-year panel."
+    )
+    parser.add_argument(
+        "--full-panel",
+        action="store_true",
+        help="Merge every source column instead of only those downstream stages declare.",
+    )
+    parser.add_argument(
+        "--level",
+        choices=["state", "district"],
+        default="state",
+        help="Geographic unit of the panel; district panels use sources with a district column.",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
+    args = parse_args()
     logger = configure_logging()
     logger.info("Loading processed datasets for merging.")
     datasets = {
-        name: load_dataset(path, name, logger)
+        name: load_dataset(path, name, logger, full_panel=args.full_panel, level=args.level)
         for name, path in PROCESSED_FILES.items()
     }
-    panel = merge_datasets(datasets, logger)
-    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    panel.to_csv(OUTPUT_PATH, index=False)
-    logger.info("State-year panel saved to %s with %s rows.", OUTPUT_PATH, len(panel))
+    panel = merge_datasets(datasets, logger, args.level)
+    if not args.full_panel:
+        panel = project_panel(panel, logger)
+    output_path = panel_csv_path(args.level)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    logger.info("Panel holds %s columns in %.2f MB.", panel.shape[1], memory_mb(panel))
+    # Written values keep the digits they were parsed with.
+    panel = widen_floats(panel)
+    panel.to_csv(output_path, index=False)
+    write_panel_store(panel, logger, panel_store_dir(args.level))
+    write_variable_store(panel, logger, args.level)
+    logger.info(
+        "%s-year panel saved to %s with %s rows.", args.level.capitalize(), output_path, len(panel)
+    )
 
 
 if __name__ == "__main__":
@@ -8,6 +8,8 @@ from typing import Dict, List
 
 import pandas as pd
 import re
+
+from geography import find_states_in_text
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 LIT_DB_PATH = PROJECT_ROOT / "lit" / "lit_db.csv"
@@ -38,45 +40,6 @@ TEMPLATE_COLUMNS = [
     "extraction_status",
 ]
 
-STATE_VARIANTS: Dict[str, List[str]] = {
-    "andhra pradesh": ["andhra pradesh"],
-    "arunachal pradesh": ["arunachal"],
-    "assam": ["assam"],
-    "bihar": ["bihar"],
-    "chhattisgarh": ["chhattisgarh"],
-    "delhi": ["delhi", "nct of delhi"],
-    "goa": ["goa"],
-    "gujarat": ["gujarat"],
-    "haryana": ["haryana"],
-    "himachal pradesh": ["himachal"],
-    "jharkhand": ["jharkhand"],
-    "karnataka": ["karnataka"],
-    "kerala": ["kerala"],
-    "madhya pradesh": ["madhya pradesh", "mp "],
-    "maharashtra": ["maharashtra"],
-    "manipur": ["manipur"],
-    "meghalaya": ["meghalaya"],
-    "mizoram": ["mizoram"],
-    "nagaland": ["nagaland"],
-    "odisha": ["odisha", "orissa"],
-    "punjab": ["punjab"],
-    "rajasthan": ["rajasthan"],
-    "sikkim": ["sikkim"],
-    "tamil nadu": ["tamil nadu", "tamilnadu"],
-    "telangana": ["telangana"],
-    "tripura": ["tripura"],
-    "uttar pradesh": ["uttar pradesh", "uttar-pradesh", "up"],
-    "uttarakhand": ["uttarakhand", "uttaranchal"],
-    "west bengal": ["west bengal", "wb"],
-    "andaman & nicobar islands": ["andaman", "nicobar"],
-    "dadra & nagar haveli and daman & diu": ["dadra", "daman", "diu"],
-    "puducherry": ["puducherry", "pondicherry"],
-    "jammu & kashmir": ["jammu", "kashmir"],
-    "ladakh": ["ladakh"],
-    "lakshadweep": ["lakshadweep"],
-    "chandigarh": ["chandigarh"],
-}
-
 DELAY_PATTERNS: Dict[str, List[str]] = {
     "patient_delay_days": ["patient delay", "median patient delay", "symptom to treatment delay"],
     "diagnostic_delay_days": ["diagnostic delay", "health system delay", "provider delay"],
@@ -109,16 +72,6 @@ def load_csv(path: Path, columns: List[str]) -> pd.DataFrame:
     return pd.read_csv(path)
 
 
-def detect_state(text: str) -> str:
-    lowered = text.lower()
-    for canonical, variants in STATE_VARIANTS.items():
-        for keyword in variants:
-            pattern = rf"\b{re.escape(keyword.strip())}\b"
-            if re.search(pattern, lowered):
-                return canonical.title()
-    return ""
-
-
 def parse_sample_size(text: str) -> float | None:
     match = re.search(r"(?:n\s*=\s*|sample size of\s*)(\d{2,5})", text, re.IGNORECASE)
     if match:
@@ -148,17 +101,24 @@ def extract_delay_terms(text: str) -> Dict[str, float]:
 def auto_extract_from_literature(lit_db: pd.DataFrame) -> pd.DataFrame:
     if lit_db.empty:
         return pd.DataFrame(columns=["pmid"])
+    combined = pd.Series(
+        [
+            f"{title} {abstract}"
+            for title, abstract in zip(
+                lit_db.get("title", pd.Series("", index=lit_db.index)),
+                lit_db.get("abstract", pd.Series("", index=lit_db.index)),
+            )
+        ],
+        index=lit_db.index,
+        dtype=object,
+    )
+    detected_states = find_states_in_text(combined)
     records = []
-    for _, row in lit_db.iterrows():
-        combined_text = " ".join(
-            [
-                str(row.get("title", "")),
-                str(row.get("abstract", "")),
-            ]
-        )
+    for (_, row), combined_text, detected_state in zip(
+        lit_db.iterrows(), combined, detected_states
+    ):
         delays = extract_delay_terms(combined_text)
         sample = parse_sample_size(combined_text)
-        detected_state = detect_state(combined_text)
         record: Dict[str, object] = {
             "pmid": row.get("pmid"),
             "title": row.get("title"),
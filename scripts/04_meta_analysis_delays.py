@@ -1,19 +1,42 @@
 """Perform random-effects meta-analysis of TB delay metrics."""
 from __future__ import annotations
 
+import argparse
 import logging
 import math
 import sys
+import time
 from pathlib import Path
 from typing import Dict, List, Tuple
 
 import matplotlib.pyplot as plt
-import numpy as np
 import pandas as pd
 
+from meta_bootstrap import bootstrap_intervals
+from meta_pooling import (
+    INTERVALS,
+    POOL_COLUMNS,
+    TAU_METHODS,
+    cumulative_analysis,
+    estimator_comparison,
+    influence_analysis,
+    pool_groups,
+    study_effects,
+    subgroup_levels,
+)
+from meta_regression import run_meta_regression
+from meta_store import AUDIT_PATH, STORE_PATH, SufficientStatisticsStore, current_quarter
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DATA_PATH = PROJECT_ROOT / "data" / "processed" / "lit_delay_extracted.csv"
 OUTPUT_TABLE = PROJECT_ROOT / "data" / "processed" / "meta_delay_results.csv"
+SUBGROUP_TABLE = PROJECT_ROOT / "data" / "processed" / "meta_delay_subgroups.csv"
+INFLUENCE_TABLE = PROJECT_ROOT / "data" / "processed" / "meta_delay_influence.csv"
+CUMULATIVE_TABLE = PROJECT_ROOT / "data" / "processed" / "meta_delay_cumulative.csv"
+ESTIMATOR_TABLE = PROJECT_ROOT / "data" / "processed" / "meta_delay_estimators.csv"
+BOOTSTRAP_TABLE = PROJECT_ROOT / "data" / "processed" / "meta_delay_bootstrap.csv"
+META_REGRESSION_DIR = PROJECT_ROOT / "data" / "processed"
+META_REGRESSION_SUMMARY = META_REGRESSION_DIR / "meta_regression_summary.csv"
 FIGURES_DIR = PROJECT_ROOT / "output" / "figures"
 LOG_PATH = PROJECT_ROOT / "data" / "processed" / "meta_analysis.log"
 
@@ -23,6 +46,7 @@ DELAY_TYPES = {
     "treatment_delay_days": "Treatment delay (days)",
     "total_delay_days": "Total delay (days)",
 }
+SUBGROUP_MODERATORS = ["state", "setting_public_private", "study_year"]
 
 
 def configure_logging() -> logging.Logger:
@@ -49,80 +73,95 @@ def load_data() -> pd.DataFrame:
     return pd.read_csv(DATA_PATH)
 
 
-def compute_standard_error(row: pd.Series, column: str) -> float:
-    se_column = column.replace("_days", "_se")
-    if se_column in row and not pd.isna(row[se_column]):
-        return float(row[se_column])
-    sd_column = column.replace("_days", "_sd")
-    if sd_column in row and "sample_size" in row and row.get("sample_size"):
-        try:
-            return float(row[sd_column]) / math.sqrt(float(row["sample_size"]))
-        except (ValueError, ZeroDivisionError):
-            return math.nan
-    return math.nan
-
-
-def dersimonian_laird(effects: np.ndarray, variances: np.ndarray) -> Dict[str, float]:
-    weights = 1 / variances
-    fixed_effect = np.sum(weights * effects) / np.sum(weights)
-    q = np.sum(weights * (effects - fixed_effect) ** 2)
-    df = len(effects) - 1
-    c = np.sum(weights) - (np.sum(weights ** 2) / np.sum(weights))
-    tau_sq = max(0.0, (q - df) / c) if c > 0 else 0.0
-    weights_random = 1 / (variances + tau_sq)
-    pooled = np.sum(weights_random * effects) / np.sum(weights_random)
-    pooled_se = math.sqrt(1 / np.sum(weights_random))
-    ci_low = pooled - 1.96 * pooled_se
-    ci_high = pooled + 1.96 * pooled_se
-    return {
-        "effect": pooled,
-        "se": pooled_se,
-        "ci_low": ci_low,
-        "ci_high": ci_high,
-        "tau_sq": tau_sq,
-        "q": q,
-        "k": len(effects),
-    }
-
-
-def run_meta_analysis(df: pd.DataFrame, logger: logging.Logger) -> pd.DataFrame:
-    results = []
+def run_meta_analysis(
+    df: pd.DataFrame, long: pd.DataFrame, args: argparse.Namespace, logger: logging.Logger
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
     for column, label in DELAY_TYPES.items():
         if column not in df.columns:
             logger.warning("Column %s missing; skipping.", column)
-            continue
-        cols = [
-            column,
-            *[c for c in ["pmid", "state", "study_year", "setting_public_private", "sample_size"] if c in df.columns],
-        ]
-        subset = df[cols].copy()
-        for aux_col in [
-            column.replace("_days", "_se"),
-            column.replace("_days", "_sd"),
-        ]:
-            if aux_col in df.columns and aux_col not in subset.columns:
-                subset[aux_col] = df.loc[subset.index, aux_col]
-        subset = subset.dropna(subset=[column])
-        if subset.empty:
+        elif not (long["delay_column"] == column).any():
             logger.warning("No data for %s", column)
-            continue
-        se_values = subset.apply(lambda row: compute_standard_error(row, column), axis=1)
-        subset["variance"] = se_values ** 2
-        subset.loc[subset["variance"].isna() | (subset["variance"] == 0), "variance"] = 1.0
-        effects = subset[column].astype(float).values
-        variances = subset["variance"].astype(float).values
-        stats = dersimonian_laird(effects, variances)
-        stats.update({"delay_type": label})
-        results.append(stats)
-        create_forest_plot(subset, label, stats, logger)
-    return pd.DataFrame(results)
+    start = time.perf_counter()
+    results = pool_groups(long, ["delay_type"], args.tau_method, args.interval)
+    subgroups = pool_groups(
+        subgroup_levels(long, SUBGROUP_MODERATORS),
+        ["delay_type", "moderator", "level"],
+        args.tau_method,
+        args.interval,
+    )
+    logger.info(
+        "Pooled %s delay types and %s subgroups (%s tau^2, %s interval) in %.1f ms.",
+        len(results), len(subgroups), args.tau_method, args.interval,
+        1000 * (time.perf_counter() - start),
+    )
+    for row in results.itertuples(index=False):
+        subset = long[long["delay_type"] == row.delay_type]
+        create_forest_plot(subset, str(row.delay_type), row._asdict(), logger)
+    results = results[POOL_COLUMNS + ["delay_type"]].astype({"delay_type": str})
+    return results, subgroups.astype({"delay_type": str, "moderator": str})
+
+
+def run_influence_analysis(
+    long: pd.DataFrame, results: pd.DataFrame, args: argparse.Namespace, logger: logging.Logger
+) -> None:
+    start = time.perf_counter()
+    influence = influence_analysis(long, results, args.tau_method, args.interval)
+    cumulative = cumulative_analysis(long, method=args.tau_method, interval=args.interval)
+    logger.info(
+        "Computed %s leave-one-out and %s cumulative pools in %.1f ms.",
+        len(influence), len(cumulative), 1000 * (time.perf_counter() - start),
+    )
+    influence.astype({"delay_type": str}).to_csv(INFLUENCE_TABLE, index=False)
+    cumulative.astype({"delay_type": str}).to_csv(CUMULATIVE_TABLE, index=False)
+    logger.info("Leave-one-out influence table saved to %s", INFLUENCE_TABLE)
+    logger.info("Cumulative meta-analysis saved to %s", CUMULATIVE_TABLE)
+
+
+def run_estimator_comparison(long: pd.DataFrame, logger: logging.Logger) -> None:
+    comparison = estimator_comparison(long)
+    comparison.astype({"delay_type": str}).to_csv(ESTIMATOR_TABLE, index=False)
+    logger.info("Estimator comparison (%s) saved to %s", ", ".join(TAU_METHODS), ESTIMATOR_TABLE)
+
+
+def run_bootstrap(
+    long: pd.DataFrame, results: pd.DataFrame, args: argparse.Namespace, logger: logging.Logger
+) -> None:
+    if args.bootstrap <= 0:
+        return
+    start = time.perf_counter()
+    intervals = bootstrap_intervals(
+        long, results, args.bootstrap, args.seed, args.tau_method, args.workers
+    )
+    logger.info(
+        "Bootstrapped %s delay types with %s replicates each in %.2f s.",
+        len(intervals), args.bootstrap, time.perf_counter() - start,
+    )
+    intervals.to_csv(BOOTSTRAP_TABLE, index=False)
+    logger.info("Bootstrap intervals saved to %s", BOOTSTRAP_TABLE)
+
+
+def run_moderator_analysis(long: pd.DataFrame, args: argparse.Namespace, logger: logging.Logger) -> None:
+    start = time.perf_counter()
+    summary, coefficients = run_meta_regression(
+        long, n_permutations=args.permutations, seed=args.seed, workers=args.workers
+    )
+    logger.info(
+        "Fitted %s meta-regression models with %s permutations each in %.2f s.",
+        len(summary), args.permutations, time.perf_counter() - start,
+    )
+    summary.to_csv(META_REGRESSION_SUMMARY, index=False)
+    logger.info("Meta-regression summary saved to %s", META_REGRESSION_SUMMARY)
+    for moderator, table in coefficients.items():
+        output_file = META_REGRESSION_DIR / f"meta_regression_{moderator}.csv"
+        table.to_csv(output_file, index=False)
+        logger.info("Saved %s meta-regression coefficients to %s", moderator, output_file)
 
 
 def create_forest_plot(subset: pd.DataFrame, label: str, stats: Dict[str, float], logger: logging.Logger) -> None:
     FIGURES_DIR.mkdir(parents=True, exist_ok=True)
     fig, ax = plt.subplots(figsize=(8, max(4, 0.3 * len(subset))))
     y_positions = range(len(subset))
-    effects = subset.iloc[:, 0].astype(float)
+    effects = subset["effect"].astype(float)
     se_values = subset["variance"].apply(math.sqrt)
     ax.errorbar(effects, y_positions, xerr=1.96 * se_values, fmt="o", color="steelblue")
     ax.axvline(stats["effect"], color="darkred", linestyle="--", label="Pooled")
@@ -139,8 +178,95 @@ def create_forest_plot(subset: pd.DataFrame, label: str, stats: Dict[str, float]
     logger.info("Saved forest plot to %s", output_file)
 
 
+def update_store(long: pd.DataFrame, args: argparse.Namespace, logger: logging.Logger) -> None:
+    store = SufficientStatisticsStore()
+    store.sync(long, args.quarter, logger)
+    store.record_quarter(args.quarter)
+    store.save()
+    logger.info("Sufficient statistics saved to %s; audit log at %s", STORE_PATH, AUDIT_PATH)
+
+
+def pool_from_store(args: argparse.Namespace, logger: logging.Logger) -> None:
+    store = SufficientStatisticsStore()
+    for study_id in args.retract:
+        pools = [pool for pool, entry in store.pools.items() if study_id in entry["studies"]]
+        if not pools:
+            logger.warning("Study %s is not in the store; nothing to retract.", study_id)
+        for pool in pools:
+            store.retract(pool, study_id, args.quarter)
+            logger.info("Retracted study %s from %s.", study_id, pool)
+    estimates = store.estimates(args.tau_method, args.interval)
+    order = {label: position for position, label in enumerate(DELAY_TYPES.values())}
+    estimates = estimates.sort_values("pool", key=lambda pools: pools.map(order), kind="stable")
+    results = estimates.rename(columns={"pool": "delay_type"})[POOL_COLUMNS + ["delay_type"]]
+    OUTPUT_TABLE.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(OUTPUT_TABLE, index=False)
+    store.record_quarter(args.quarter)
+    store.save()
+    logger.info("Meta-analysis results updated from the store and saved to %s", OUTPUT_TABLE)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--permutations",
+        type=int,
+        default=1000,
+        help="Permutations per meta-regression model for permutation p-values (0 to skip).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processes for the permutation tests and bootstrap (default: one per CPU).",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=2000,
+        help="Study-level bootstrap replicates per delay type (0 to skip).",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=42, help="Seed for the permutation and bootstrap streams."
+    )
+    parser.add_argument(
+        "--tau-method",
+        choices=TAU_METHODS,
+        default="DL",
+        help="Between-study variance estimator for the pooled, subgroup and influence tables.",
+    )
+    parser.add_argument(
+        "--interval",
+        choices=INTERVALS,
+        default="z",
+        help="Confidence interval: normal (z) or Hartung-Knapp-Sidik-Jonkman (hksj).",
+    )
+    parser.add_argument(
+        "--quarter",
+        default=current_quarter(),
+        help="Living-review quarter recorded in the store's audit log (default: current quarter).",
+    )
+    parser.add_argument(
+        "--store-only",
+        action="store_true",
+        help="Update the pooled estimates from the sufficient-statistics store without reading the extraction table.",
+    )
+    parser.add_argument(
+        "--retract",
+        nargs="*",
+        default=[],
+        metavar="STUDY_ID",
+        help="With --store-only, study IDs (PMIDs) to retract from every pool before re-estimating.",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
+    args = parse_args()
     logger = configure_logging()
+    if args.store_only:
+        pool_from_store(args, logger)
+        return
     df = load_data()
     if df.empty:
         logger.error("Literature extraction file missing or empty; cannot run meta-analysis.")
@@ -149,10 +275,18 @@ def main() -> None:
             OUTPUT_TABLE, index=False
         )
         return
-    results = run_meta_analysis(df, logger)
+    long = study_effects(df, DELAY_TYPES)
+    results, subgroups = run_meta_analysis(df, long, args, logger)
     OUTPUT_TABLE.parent.mkdir(parents=True, exist_ok=True)
     results.to_csv(OUTPUT_TABLE, index=False)
+    subgroups.to_csv(SUBGROUP_TABLE, index=False)
     logger.info("Meta-analysis results saved to %s", OUTPUT_TABLE)
+    logger.info("Subgroup pools saved to %s", SUBGROUP_TABLE)
+    update_store(long, args, logger)
+    run_influence_analysis(long, results, args, logger)
+    run_estimator_comparison(long, logger)
+    run_bootstrap(long, results, args, logger)
+    run_moderator_analysis(long, args, logger)
 
 
 if __name__ == "__main__":
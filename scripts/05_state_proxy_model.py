@@ -1,6 +1,7 @@
 """Compute proxy indicators and cluster states by TB delay intensity."""
 from __future__ import annotations
 
+import argparse
 import json
 import logging
 import sys
@@ -12,6 +13,12 @@ import pandas as pd
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 
+from approx_comparison import write_comparison
+from column_requirements import stage_variables
+from geography import level_path
+from rollups import frame_level, rollup
+from variable_catalogue import read_variables
+
 try:
     import pymc as pm
     import arviz as az
@@ -20,7 +27,6 @@ except ImportError:
     az = None
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
-PANEL_PATH = PROJECT_ROOT / "data" / "processed" / "state_year_panel.csv"
 OUTPUT_PATH = PROJECT_ROOT / "data" / "processed" / "proxy_delay_results.csv"
 DASHBOARD_PATH = PROJECT_ROOT / "output" / "dashboards" / "state_delay_profiles.json"
 LOG_PATH = PROJECT_ROOT / "data" / "processed" / "proxy_model.log"
@@ -31,6 +37,19 @@ BAYESIAN_PREDICTIONS_PATH = (
 BAYESIAN_COEFFICIENTS_PATH = (
     PROJECT_ROOT / "data" / "processed" / "bayesian_delay_coefficients.csv"
 )
+# --approx previews; the full NUTS outputs above are their reference.
+APPROX_PREDICTIONS_PATH = (
+    PROJECT_ROOT / "data" / "processed" / "bayesian_delay_predictions_approx.csv"
+)
+APPROX_COEFFICIENTS_PATH = (
+    PROJECT_ROOT / "data" / "processed" / "bayesian_delay_coefficients_approx.csv"
+)
+APPROX_COMPARISON_PATH = (
+    PROJECT_ROOT / "data" / "processed" / "bayesian_delay_approx_vs_nuts.csv"
+)
+APPROX_STATISTICS = {"mean": "sd", "sd": "sd", "hdi_5%": "sd", "hdi_95%": "sd"}
+
+PANEL_VARIABLES = stage_variables("05_state_proxy_model")
 
 PROXY_COLUMNS = [
     "pn_ratio",
@@ -62,11 +81,11 @@ def configure_logging() -> logging.Logger:
     return logger
 
 
-def load_panel(logger: logging.Logger) -> pd.DataFrame:
-    if not PANEL_PATH.exists() or PANEL_PATH.stat().st_size == 0:
+def load_panel(logger: logging.Logger, level: str = "state") -> pd.DataFrame:
+    panel = read_variables(PANEL_VARIABLES, logger=logger, level=level)
+    if panel.empty:
         logger.error("State-year panel missing; cannot compute proxies.")
-        return pd.DataFrame(columns=["state", "year"])
-    return pd.read_csv(PANEL_PATH)
+    return panel
 
 
 def load_prevalence_cases(logger: logging.Logger) -> float:
@@ -94,12 +113,12 @@ def prepare_proxy_features(df: pd.DataFrame, prevalence_cases: float, logger: lo
             return pd.Series(np.nan, index=result.index)
         return pd.to_numeric(result[series_name], errors="coerce")
 
-    population = to_numeric("census_population")
-    notifications = to_numeric("india_tb_notifications_2025_total_notified_2025")
-    fallback_2024 = to_numeric("india_tb_reports_2024__tb_patients_notified")
-    fallback_2023 = to_numeric("india_tb_reports_2023__tb_patients_notified")
+    population = to_numeric("population")
+    notifications = to_numeric("tb_notified_2025")
+    fallback_2024 = to_numeric("tb_notified_2024")
+    fallback_2023 = to_numeric("tb_notified_2023")
     notifications = notifications.fillna(fallback_2024).fillna(fallback_2023)
-    tb_deaths = to_numeric("india_tb_reports_tb_deaths__2024_january_to_october").fillna(0)
+    tb_deaths = to_numeric("tb_deaths_2024_jan_oct").fillna(0)
 
     total_population = population.replace({0: np.nan}).sum()
     if total_population and prevalence_cases:
@@ -114,23 +133,19 @@ def prepare_proxy_features(df: pd.DataFrame, prevalence_cases: float, logger: lo
     with np.errstate(divide="ignore", invalid="ignore"):
         result["in_ratio"] = result["incidence_proxy"] / notifications.replace({0: np.nan})
 
-    sanitation_col = "nfhs_population_living_in_households_that_use_an_improved_sanitation_facility2_(%)"
-    result["symptomatic_no_care_pct"] = 100 - to_numeric(sanitation_col)
+    result["symptomatic_no_care_pct"] = 100 - to_numeric("improved_sanitation_pct")
 
-    wealth_col = "census_households_with_tv_computer_laptop_telephone_mobile_phone_and_scooter_car"
-    households = to_numeric("census_households").replace({0: np.nan})
-    result["private_first_provider_pct"] = 100 * (to_numeric(wealth_col) / households)
+    households = to_numeric("households").replace({0: np.nan})
+    result["private_first_provider_pct"] = 100 * (to_numeric("households_with_assets") / households)
 
-    treated = to_numeric("india_tb_reports_2023__treated_successfully")
-    notified_2023 = to_numeric("india_tb_reports_2023__tb_patients_notified").replace({0: np.nan})
+    treated = to_numeric("tb_treated_successfully_2023")
+    notified_2023 = to_numeric("tb_notified_2023").replace({0: np.nan})
     with np.errstate(divide="ignore", invalid="ignore"):
         result["bact_confirmed_pct"] = 100 * (treated / notified_2023)
 
     result["crowding_index"] = population / households
-    result["literacy_pct"] = to_numeric("census_literacy_rate_pct")
-
-    clean_fuel_col = "nfhs_households_using_clean_fuel_for_cooking3_(%)"
-    result["poverty_pct"] = 100 - to_numeric(clean_fuel_col)
+    result["literacy_pct"] = to_numeric("literacy_rate_pct")
+    result["poverty_pct"] = 100 - to_numeric("clean_cooking_fuel_pct")
 
     if "year" not in result.columns:
         result["year"] = 2024
@@ -150,7 +165,7 @@ def cluster_states(df: pd.DataFrame, logger: logging.Logger) -> pd.DataFrame:
     features = features.fillna(0)
     scaler = StandardScaler()
     scaled = scaler.fit_transform(features)
-    n_clusters = min(4, max(1, len(df["state"].unique())))
+    n_clusters = min(4, max(1, len(df[frame_level(df)].unique())))
     if n_clusters <= 1:
         df["delay_cluster"] = 0
         return df
@@ -160,12 +175,13 @@ def cluster_states(df: pd.DataFrame, logger: logging.Logger) -> pd.DataFrame:
     return df
 
 
-def export_dashboard(df: pd.DataFrame) -> None:
-    DASHBOARD_PATH.parent.mkdir(parents=True, exist_ok=True)
+def export_dashboard(df: pd.DataFrame, logger: logging.Logger, path: Path = DASHBOARD_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
     for col in PROXY_COLUMNS:
         if col not in df.columns:
             df[col] = np.nan
-    grouped = df.groupby("state").agg({
+    unit = frame_level(df)
+    grouped = rollup(df, unit, {
         "delay_cluster": "first",
         "pn_ratio": "mean",
         "in_ratio": "mean",
@@ -175,16 +191,17 @@ def export_dashboard(df: pd.DataFrame) -> None:
         "crowding_index": "mean",
         "literacy_pct": "mean",
         "poverty_pct": "mean",
-    })
+    }, logger, name="proxy_dashboard")
+    grouped = grouped.drop(columns=[c for c in ("state", "zone") if c != unit], errors="ignore")
     payload = {
         "generated_by": "05_state_proxy_model.py",
         "states": grouped.reset_index().to_dict(orient="records"),
     }
-    DASHBOARD_PATH.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
 
 
 def run_bayesian_delay_model(
-    df: pd.DataFrame, logger: logging.Logger
+    df: pd.DataFrame, logger: logging.Logger, approx: bool = False, approx_steps: int = 30000
 ) -> Tuple[pd.DataFrame, pd.DataFrame]:
     if pm is None or az is None:
         logger.warning("PyMC/ArviZ not installed; skipping Bayesian modelling step.")
@@ -203,11 +220,12 @@ def run_bayesian_delay_model(
     if missing:
         logger.warning("Missing columns for Bayesian model: %s", ", ".join(missing))
         return pd.DataFrame(), pd.DataFrame()
-    aggregated = (
-        df.groupby("state")[[target, *feature_cols]]
-        .mean(numeric_only=True)
-        .dropna(subset=[target])
-    )
+    unit = frame_level(df)
+    aggregations = {column: "mean" for column in [target, *feature_cols]}
+    if "delay_cluster" in df.columns:
+        aggregations["delay_cluster"] = "first"
+    rolled = rollup(df, unit, aggregations, logger, name="proxy_bayes")
+    aggregated = rolled[[target, *feature_cols]].dropna(subset=[target])
     aggregated = aggregated.replace([np.inf, -np.inf], np.nan).dropna()
     if aggregated.empty or len(aggregated) < 6:
         logger.warning("Insufficient data for Bayesian modelling (n=%s).", len(aggregated))
@@ -225,20 +243,27 @@ def run_bayesian_delay_model(
     y_log = np.log1p(y)
     try:
         with pm.Model() as model:
-            features_data = pm.MutableData("features", X_scaled.values)
+            features_data = pm.Data("features", X_scaled.values)
             intercept = pm.Normal("intercept", mu=0, sigma=2)
             coef = pm.Normal("coef", mu=0, sigma=1, shape=X_scaled.shape[1])
             sigma = pm.HalfNormal("sigma", sigma=1)
             mu = pm.Deterministic("mu", intercept + pm.math.dot(features_data, coef))
             pm.Normal("obs", mu=mu, sigma=sigma, observed=y_log.values)
-            trace = pm.sample(
-                1000,
-                tune=1000,
-                chains=2,
-                target_accept=0.9,
-                progressbar=False,
-                random_seed=42,
-            )
+            if approx:
+                # Mean-field ADVI preview; draws from the fitted approximation.
+                approximation = pm.fit(
+                    n=approx_steps, method="advi", random_seed=42, progressbar=False
+                )
+                trace = approximation.sample(2000, random_seed=42)
+            else:
+                trace = pm.sample(
+                    1000,
+                    tune=1000,
+                    chains=2,
+                    target_accept=0.9,
+                    progressbar=False,
+                    random_seed=42,
+                )
     except Exception as exc:  # pragma: no cover - PyMC runtime errors
         logger.warning("PyMC model failed: %s", exc)
         return pd.DataFrame(), pd.DataFrame()
@@ -251,17 +276,17 @@ def run_bayesian_delay_model(
     upper = np.percentile(flat, 95, axis=0)
     posterior_predictions = pd.DataFrame(
         {
-            "state": X.index,
+            unit: X.index,
             "pn_ratio_observed": y.values,
             "pn_ratio_posterior_mean": np.expm1(mu_mean),
             "pn_ratio_hdi_5": np.expm1(lower),
             "pn_ratio_hdi_95": np.expm1(upper),
+            "approximate": approx,
         }
     )
-    if "delay_cluster" in df.columns:
-        cluster_lookup = df.groupby("state")["delay_cluster"].first()
-        posterior_predictions["delay_cluster"] = posterior_predictions["state"].map(
-            cluster_lookup
+    if "delay_cluster" in rolled.columns:
+        posterior_predictions["delay_cluster"] = posterior_predictions[unit].map(
+            rolled["delay_cluster"]
         )
 
     summary = az.summary(trace, var_names=["intercept", "coef", "sigma"], hdi_prob=0.9)
@@ -279,6 +304,7 @@ def run_bayesian_delay_model(
                 "sd": row["sd"],
                 "hdi_5%": row.get("hdi_5%", np.nan),
                 "hdi_95%": row.get("hdi_95%", np.nan),
+                "approximate": approx,
             }
         )
     coef_df = pd.DataFrame(coef_rows)
@@ -286,27 +312,68 @@ def run_bayesian_delay_model(
     return posterior_predictions, coef_df
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compute state or district delay proxies.")
+    parser.add_argument(
+        "--level",
+        choices=["state", "district"],
+        default="state",
+        help="Panel level to model; district outputs get a _district suffix.",
+    )
+    parser.add_argument(
+        "--approx",
+        action="store_true",
+        help="Preview the Bayesian model with ADVI; writes *_approx outputs and compares them with the last NUTS run.",
+    )
+    parser.add_argument(
+        "--approx-steps", type=int, default=30000, help="ADVI optimisation steps for --approx."
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
+    args = parse_args()
     logger = configure_logging()
-    panel = load_panel(logger)
+    if args.approx and (pm is None or az is None):
+        logger.error("--approx needs PyMC and ArviZ, which are not installed.")
+        return
+    output_path = level_path(OUTPUT_PATH, args.level)
+    panel = load_panel(logger, args.level)
     if panel.empty:
-        OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-        panel.to_csv(OUTPUT_PATH, index=False)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        panel.to_csv(output_path, index=False)
         return
     prevalence_cases = load_prevalence_cases(logger)
     proxies = prepare_proxy_features(panel, prevalence_cases, logger)
     proxies = cluster_states(proxies, logger)
-    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    proxies.to_csv(OUTPUT_PATH, index=False)
-    export_dashboard(proxies)
-    bayes_predictions, bayes_coeffs = run_bayesian_delay_model(proxies, logger)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    proxies.to_csv(output_path, index=False)
+    export_dashboard(proxies, logger, level_path(DASHBOARD_PATH, args.level))
+    bayes_predictions, bayes_coeffs = run_bayesian_delay_model(
+        proxies, logger, args.approx, args.approx_steps
+    )
+    predictions_path = level_path(
+        APPROX_PREDICTIONS_PATH if args.approx else BAYESIAN_PREDICTIONS_PATH, args.level
+    )
+    coefficients_path = level_path(
+        APPROX_COEFFICIENTS_PATH if args.approx else BAYESIAN_COEFFICIENTS_PATH, args.level
+    )
     if not bayes_predictions.empty:
-        bayes_predictions.to_csv(BAYESIAN_PREDICTIONS_PATH, index=False)
-        logger.info("Saved Bayesian predictions to %s", BAYESIAN_PREDICTIONS_PATH)
+        bayes_predictions.to_csv(predictions_path, index=False)
+        logger.info("Saved Bayesian predictions to %s", predictions_path)
     if not bayes_coeffs.empty:
-        bayes_coeffs.to_csv(BAYESIAN_COEFFICIENTS_PATH, index=False)
-        logger.info("Saved Bayesian coefficients to %s", BAYESIAN_COEFFICIENTS_PATH)
-    logger.info("Proxy indicators saved to %s", OUTPUT_PATH)
+        bayes_coeffs.to_csv(coefficients_path, index=False)
+        logger.info("Saved Bayesian coefficients to %s", coefficients_path)
+        if args.approx:
+            write_comparison(
+                bayes_coeffs,
+                level_path(BAYESIAN_COEFFICIENTS_PATH, args.level),
+                level_path(APPROX_COMPARISON_PATH, args.level),
+                ["parameter"],
+                APPROX_STATISTICS,
+                logger,
+            )
+    logger.info("Proxy indicators saved to %s", output_path)
 
 
 if __name__ == "__main__":
@@ -10,6 +10,8 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 
+from geography import STATE_CENTROIDS, resolve_states
+
 try:
     import geopandas as gpd
     from shapely.geometry import Point
@@ -31,56 +33,7 @@ SHAPEFILE_PATH = (
     / "ne_admin1"
     / "ne_50m_admin_1_states_provinces.shp"
 )
-STATE_COORDS = {
-    "andaman and nicobar islands": (11.75, 92.72),
-    "andhra pradesh": (15.91, 79.74),
-    "arunachal pradesh": (28.21, 94.73),
-    "assam": (26.20, 92.93),
-    "bihar": (25.09, 85.31),
-    "chandigarh": (30.74, 76.79),
-    "chhattisgarh": (21.27, 82.04),
-    "dadra and nagar haveli and daman and diu": (20.27, 72.90),
-    "delhi": (28.61, 77.21),
-    "goa": (15.49, 73.83),
-    "gujarat": (22.25, 72.68),
-    "haryana": (29.06, 76.09),
-    "himachal pradesh": (31.10, 77.17),
-    "jammu and kashmir": (34.08, 76.83),
-    "jharkhand": (23.61, 85.28),
-    "karnataka": (15.32, 75.76),
-    "kerala": (10.35, 76.27),
-    "ladakh": (34.15, 77.58),
-    "lakshadweep": (10.57, 72.64),
-    "madhya pradesh": (23.52, 80.83),
-    "maharashtra": (19.76, 75.71),
-    "manipur": (24.72, 93.91),
-    "meghalaya": (25.47, 91.37),
-    "mizoram": (23.46, 92.69),
-    "nagaland": (26.16, 94.56),
-    "odisha": (20.95, 85.10),
-    "puducherry": (11.91, 79.81),
-    "punjab": (31.15, 75.34),
-    "rajasthan": (26.91, 74.80),
-    "sikkim": (27.53, 88.52),
-    "tamil nadu": (11.12, 78.66),
-    "telangana": (17.87, 79.60),
-    "tripura": (23.84, 91.29),
-    "uttar pradesh": (26.85, 80.91),
-    "uttarakhand": (30.18, 79.30),
-    "west bengal": (23.16, 87.84),
-    "andaman & nicobar islands": (11.75, 92.72),
-    "dadra and nagar haveli": (20.27, 72.90),
-    "daman and diu": (20.41, 72.84),
-    "maharastra": (19.76, 75.71),
-}
 
-STATE_NAME_OVERRIDES = {
-    "dadra and nagar haveli": "dadra and nagar haveli and daman and diu",
-    "daman and diu": "dadra and nagar haveli and daman and diu",
-    "nct of delhi": "delhi",
-    "maharastra": "maharashtra",
-}
-
 sns.set_style("whitegrid")
 
 
@@ -117,15 +70,6 @@ def save_placeholder(filename: str, message: str) -> None:
     plt.close(fig)
 
 
-def normalize_state_name(name: str) -> str:
-    if not isinstance(name, str):
-        return ""
-    lowered = name.lower().replace("&", " and ")
-    cleaned = "".join(ch if ch.isalnum() or ch.isspace() else " " for ch in lowered)
-    normalized = " ".join(cleaned.split())
-    return STATE_NAME_OVERRIDES.get(normalized, normalized)
-
-
 def aggregate_state_metrics(proxies: pd.DataFrame) -> pd.DataFrame:
     if proxies.empty or "state" not in proxies.columns:
         return pd.DataFrame()
@@ -134,7 +78,7 @@ def aggregate_state_metrics(proxies: pd.DataFrame) -> pd.DataFrame:
         .agg(pn_ratio=("pn_ratio", "mean"), delay_cluster=("delay_cluster", "first"))
         .reset_index()
     )
-    agg["state_norm"] = agg["state"].apply(normalize_state_name)
+    agg["state_norm"] = resolve_states(agg["state"], merge_successors=True)
     return agg
 
 
@@ -265,7 +209,7 @@ def plot_geopandas_map(proxies: pd.DataFrame, logger: logging.Logger) -> None:
     missing_states = []
     for _, row in aggregated.iterrows():
         norm = row["state_norm"]
-        coords = STATE_COORDS.get(norm)
+        coords = STATE_CENTROIDS.get(norm)
         if not coords:
             missing_states.append(row["state"])
             continue
@@ -324,7 +268,7 @@ def plot_shapefile_map(proxies: pd.DataFrame, logger: logging.Logger) -> None:
         save_placeholder("state_shapefile_map.png", "No India polygons in shapefile")
         logger.warning("Shapefile does not contain India polygons.")
         return
-    india["state_norm"] = india["name"].apply(normalize_state_name)
+    india["state_norm"] = resolve_states(india["name"], logger, merge_successors=True)
     merged = india.merge(aggregated, on="state_norm", how="left")
     fig, ax = plt.subplots(figsize=(8, 10))
     merged.plot(
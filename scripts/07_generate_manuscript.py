@@ -9,7 +9,10 @@ from textwrap import dedent
 
 import pandas as pd
 
-try:
+from column_requirements import stage_variables
+from variable_catalogue import read_variables
+
+try:
     from docx import Document
     from docx.shared import Inches
 except ImportError:
@@ -18,7 +21,6 @@ except ImportError:
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 META_PATH = PROJECT_ROOT / "data" / "processed" / "meta_delay_results.csv"
 PROXY_PATH = PROJECT_ROOT / "data" / "processed" / "proxy_delay_results.csv"
-PANEL_PATH = PROJECT_ROOT / "data" / "processed" / "state_year_panel.csv"
 MANUSCRIPT_PATH = PROJECT_ROOT / "reports" / "manuscript.md"
 POLICY_PATH = PROJECT_ROOT / "reports" / "policy_brief.md"
 MANUSCRIPT_V2_PATH = PROJECT_ROOT / "reports" / "manuscript_v2.md"
@@ -26,6 +28,7 @@ MANUSCRIPT_V3_PATH = PROJECT_ROOT / "reports" / "manuscript_v3.md"
 BAYESIAN_PRED_PATH = PROJECT_ROOT / "data" / "processed" / "bayesian_delay_predictions.csv"
 BAYESIAN_COEF_PATH = PROJECT_ROOT / "data" / "processed" / "bayesian_delay_coefficients.csv"
 LOG_PATH = PROJECT_ROOT / "reports" / "manuscript_generation.log"
+NOTIFICATIONS_COLUMN = "tb_notified_2025"
 
 VANCOUVER_REFS = [
     "1. Sreeramareddy CT, et al. Delays in diagnosis and treatment of pulmonary tuberculosis in India. BMC Infect Dis. 2014;14:193.",
@@ -104,8 +107,8 @@ def df_to_markdown(df: pd.DataFrame, round_cols: list[str] | None = None) -> str
 
 def build_state_narratives(proxy_df: pd.DataFrame, panel_df: pd.DataFrame) -> str:
     narratives = []
-    merged = proxy_df.merge(
-        panel_df[["state", "india_tb_notifications_2025_total_notified_2025"]],
+    merged = proxy_df.drop(columns=[NOTIFICATIONS_COLUMN], errors="ignore").merge(
+        panel_df[["state", NOTIFICATIONS_COLUMN]],
         on="state",
         how="left",
     )
@@ -119,7 +122,7 @@ def build_state_narratives(proxy_df: pd.DataFrame, panel_df: pd.DataFrame) -> st
         ).strip()
         narratives.append(cluster_intro)
         for _, row in cluster_states.sort_values("state").iterrows():
-            notif = row.get("india_tb_notifications_2025_total_notified_2025")
+            notif = row.get(NOTIFICATIONS_COLUMN)
             notif_text = (
                 f"{int(notif):,}" if pd.notna(notif) else "unreported"
             )
@@ -198,10 +201,10 @@ def build_manuscript(
 ) -> str:
     today = date.today().isoformat()
     meta_table = df_to_markdown(meta_df.round(2), round_cols=["effect", "se", "ci_low", "ci_high"])
-    top_states = panel_df[["state", "india_tb_notifications_2025_total_notified_2025"]].dropna()
-    top_states = top_states.sort_values(by="india_tb_notifications_2025_total_notified_2025", ascending=False).head(15)
+    top_states = panel_df[["state", NOTIFICATIONS_COLUMN]].dropna()
+    top_states = top_states.sort_values(by=NOTIFICATIONS_COLUMN, ascending=False).head(15)
     top_states_table = df_to_markdown(
-        top_states.rename(columns={"india_tb_notifications_2025_total_notified_2025": "notifications_2025"})
+        top_states.rename(columns={NOTIFICATIONS_COLUMN: "notifications_2025"})
     )
     cluster_summary = proxy_df.groupby("delay_cluster").agg(
         states=("state", "nunique"),
@@ -348,13 +351,13 @@ def build_short_manuscript(
         ),
         round_cols=["Pooled mean", "SE", "CI_low", "CI_high"],
     )
-    top_states = panel_df[["state", "india_tb_notifications_2025_total_notified_2025"]].dropna()
+    top_states = panel_df[["state", NOTIFICATIONS_COLUMN]].dropna()
     top_states = top_states.sort_values(
-        by="india_tb_notifications_2025_total_notified_2025", ascending=False
+        by=NOTIFICATIONS_COLUMN, ascending=False
     ).head(15)
     top_states_table = df_to_markdown(
         top_states.rename(
-            columns={"india_tb_notifications_2025_total_notified_2025": "Notifications 2025"}
+            columns={NOTIFICATIONS_COLUMN: "Notifications 2025"}
         )
     )
     cluster_summary = proxy_df.groupby("delay_cluster").agg(
@@ -492,15 +495,15 @@ def build_manuscript_v3(
         round_cols=["Pooled mean", "SE", "CI_low", "CI_high"],
     )
     top_states = panel_df[
-        ["state", "india_tb_notifications_2025_total_notified_2025"]
+        ["state", NOTIFICATIONS_COLUMN]
     ].dropna()
     top_states = top_states.sort_values(
-        by="india_tb_notifications_2025_total_notified_2025", ascending=False
+        by=NOTIFICATIONS_COLUMN, ascending=False
     ).head(15)
     top_states_table = df_to_markdown(
         top_states.rename(
             columns={
-                "india_tb_notifications_2025_total_notified_2025": "Notifications 2025"
+                NOTIFICATIONS_COLUMN: "Notifications 2025"
             }
         )
     )
@@ -699,7 +702,7 @@ def export_docx(
     add_df_table(
         document,
         top_states.rename(
-            columns={"india_tb_notifications_2025_total_notified_2025": "Notifications 2025"}
+            columns={NOTIFICATIONS_COLUMN: "Notifications 2025"}
         ),
         "Table 2. Top states by notifications",
     )
@@ -777,7 +780,7 @@ def main() -> None:
     logger = configure_logging()
     meta_df = load_csv(META_PATH)
     proxy_df = load_csv(PROXY_PATH)
-    panel_df = load_csv(PANEL_PATH)
+    panel_df = read_variables(stage_variables("07_generate_manuscript"), logger=logger)
     bayes_df = load_csv(BAYESIAN_PRED_PATH)
     bayes_coef_df = load_csv(BAYESIAN_COEF_PATH)
 
@@ -785,10 +788,10 @@ def main() -> None:
     policy_text = build_policy_brief(meta_df, proxy_df)
 
     top_states_df = panel_df[
-        ["state", "india_tb_notifications_2025_total_notified_2025"]
+        ["state", NOTIFICATIONS_COLUMN]
     ].dropna()
     top_states_df = top_states_df.sort_values(
-        by="india_tb_notifications_2025_total_notified_2025", ascending=False
+        by=NOTIFICATIONS_COLUMN, ascending=False
     ).head(15)
     cluster_summary_df = proxy_df.groupby("delay_cluster").agg(
         states=("state", "nunique"),
@@ -7,10 +7,12 @@ extracted from literature, providing uncertainty quantification through MCMC sam
 
 from __future__ import annotations
 
+import argparse
 import logging
 import sys
+import time
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -28,18 +30,81 @@ try:
     import numpyro
     import numpyro.distributions as dist
     from numpyro import sample
-    from numpyro.infer import MCMC, NUTS
+    from numpyro.infer import MCMC, NUTS, SVI, Predictive, Trace_ELBO
+    from numpyro.infer.autoguide import AutoMultivariateNormal
     import jax.numpy as jnp
     import jax.random as random
     numpyro_available = True
 except ImportError:
     numpyro_available = False
 
+from mcmc_runtime import (
+    CHAIN_METHODS,
+    JAX_CACHE_DIR,
+    available_cores,
+    compile_timer,
+    configure_chain_method,
+    enable_compilation_cache,
+    study_bucket,
+)
+from meta_quadrature import grid_quantiles, mixture_summary, quadrature_draws, quadrature_posterior
+from mcmc_diagnostics import SamplingTargets, diagnostics, sample_until_converged
+from mcmc_warm_start import (
+    WARM_WARMUP,
+    adaptation_state,
+    incompatibility,
+    initial_params,
+    inverse_mass_matrix,
+    load_warm_start,
+    posterior_shift,
+    save_warm_start,
+)
+from meta_store import current_quarter
+from approx_comparison import write_comparison
+from prior_sensitivity import power_scaling_sensitivity, unreliable
+from meta_loo import loo_comparison
+from posterior_store import (
+    POSTERIOR_DIR,
+    load_draws,
+    relative_posterior_path,
+    resolve_posterior_path,
+    save_posterior,
+)
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DATA_PATH = PROJECT_ROOT / "data" / "processed" / "lit_delay_extracted.csv"
 OUTPUT_DIR = PROJECT_ROOT / "data" / "processed"
 FIGURES_DIR = PROJECT_ROOT / "output" / "figures"
 LOG_PATH = OUTPUT_DIR / "mcmc_meta_analysis.log"
+TIMING_PATH = OUTPUT_DIR / "bayesian_meta_analysis_timing.csv"
+CHAIN_BENCHMARK_PATH = OUTPUT_DIR / "bayesian_chain_method_benchmark.csv"
+QUADRATURE_VALIDATION_PATH = OUTPUT_DIR / "bayesian_quadrature_validation.csv"
+QUADRATURE_DRAWS = 1000  # per chain, for plots and the posterior store
+RESULTS_PATH = OUTPUT_DIR / "bayesian_meta_analysis_results.csv"
+SUMMARY_PATH = OUTPUT_DIR / "bayesian_meta_analysis_summary.csv"
+# --approx previews are kept apart from the full outputs.
+APPROX_RESULTS_PATH = OUTPUT_DIR / "bayesian_meta_analysis_results_approx.csv"
+APPROX_SUMMARY_PATH = OUTPUT_DIR / "bayesian_meta_analysis_summary_approx.csv"
+APPROX_COMPARISON_PATH = OUTPUT_DIR / "bayesian_meta_analysis_approx_vs_nuts.csv"
+APPROX_POSTERIOR_DIR = POSTERIOR_DIR / "approx"
+NUTS_REFERENCE_PATH = OUTPUT_DIR / "bayesian_meta_analysis_nuts_reference.csv"
+SENSITIVITY_PATH = OUTPUT_DIR / "bayesian_prior_sensitivity.csv"
+LOO_COMPARISON_PATH = OUTPUT_DIR / "bayesian_likelihood_loo_comparison.csv"
+APPROX_STATISTICS = {
+    "pooled_effect": "effect_se",
+    "effect_se": "effect_se",
+    "hdi_2.5": "effect_se",
+    "hdi_97.5": "effect_se",
+    "tau": None,
+    "tau_hdi_2.5": None,
+    "tau_hdi_97.5": None,
+}
+DIAGNOSTIC_KEYS = (
+    "r_hat_mu", "r_hat_tau", "ess_bulk_mu", "ess_tail_mu", "ess_bulk_tau", "ess_tail_tau", "ess_per_second"
+)
+NUM_CHAINS = 4
+# In-memory draws; written to the posterior store rather than the results CSV.
+DRAW_KEYS = ("samples", "trace", "ppc")
 
 DELAY_TYPES = {
     "patient_delay_days": "Patient delay (days)",
@@ -48,6 +113,8 @@ DELAY_TYPES = {
     "total_delay_days": "Total delay (days)",
 }
 
+TIMINGS: List[Dict[str, object]] = []
+
 
 def configure_logging() -> logging.Logger:
     """Configure logging for the script."""
@@ -123,7 +190,14 @@ def prepare_meta_data(df: pd.DataFrame, delay_type: str, logger: logging.Logger)
     }
 
 
-def run_bayesian_meta_analysis(effects: np.ndarray, ses: np.ndarray, delay_label: str, logger: logging.Logger) -> Dict:
+def run_bayesian_meta_analysis(
+    effects: np.ndarray,
+    ses: np.ndarray,
+    delay_label: str,
+    logger: logging.Logger,
+    chain_method: str = "sequential",
+    targets: Optional[SamplingTargets] = None,
+) -> Dict:
     """Run Bayesian random-effects meta-analysis using PyMC or NumPyro as fallback."""
     if pm is not None and az is not None:
         # Try PyMC first
@@ -173,11 +247,11 @@ def run_bayesian_meta_analysis(effects: np.ndarray, ses: np.ndarray, delay_label
             logger.warning(f"PyMC Bayesian meta-analysis failed for {delay_label}: {exc}")
             if numpyro_available:
                 logger.info("Falling back to NumPyro for Bayesian meta-analysis.")
-                return run_numpyro_meta_analysis(effects, ses, delay_label, logger)
+                return run_numpyro_meta_analysis(effects, ses, delay_label, logger, chain_method, targets)
             return {}
     elif numpyro_available:
         logger.info("Using NumPyro for Bayesian meta-analysis.")
-        return run_numpyro_meta_analysis(effects, ses, delay_label, logger)
+        return run_numpyro_meta_analysis(effects, ses, delay_label, logger, chain_method, targets)
     else:
         logger.warning("Neither PyMC nor NumPyro available; skipping Bayesian meta-analysis.")
         return {}
@@ -228,66 +302,499 @@ def run_bayesian_meta_analysis(effects: np.ndarray, ses: np.ndarray, delay_label
         logger.warning(f"PyMC Bayesian meta-analysis failed for {delay_label}: {exc}")
         if numpyro_available:
             logger.info("Falling back to NumPyro for Bayesian meta-analysis.")
-            return run_numpyro_meta_analysis(effects, ses, delay_label, logger)
+            return run_numpyro_meta_analysis(effects, ses, delay_label, logger, chain_method, targets)
         return {}
 
 
-def run_numpyro_meta_analysis(effects: np.ndarray, ses: np.ndarray, delay_label: str, logger: logging.Logger) -> Dict:
+def run_numpyro_meta_analysis(
+    effects: np.ndarray,
+    ses: np.ndarray,
+    delay_label: str,
+    logger: logging.Logger,
+    chain_method: str = "sequential",
+    targets: Optional[SamplingTargets] = None,
+) -> Dict:
     """Run Bayesian random-effects meta-analysis using NumPyro."""
+    targets = targets or SamplingTargets()
     try:
-        def model(effects_obs, ses_obs):
-            # Priors
-            mu = sample("mu", dist.Normal(0, 10))  # Overall effect
-            tau = sample("tau", dist.HalfNormal(1))  # Between-study heterogeneity
+        # One-row version of the joint model, padded to a bucketed study
+        # count so delay types and refreshes share a compiled kernel.
+        data = {"effects": effects, "ses": ses, "n_studies": len(effects)}
+        padded = pad_studies([data], n_rows=1)
+
+        # Run MCMC in chunks until the convergence targets are met
+        kernel = NUTS(joint_meta_model)
+        mcmc = MCMC(
+            kernel, num_warmup=1000, num_samples=targets.chunk, num_chains=NUM_CHAINS,
+            chain_method=chain_method, jit_model_args=True,
+        )
+        rng_key = random.PRNGKey(42)
+        with compile_timer() as timing:
+            samples, worst = sample_until_converged(
+                mcmc, rng_key, lambda draws: monitored_draws(draws, padded["mask"]), targets, logger,
+                effects_obs=jnp.array(padded["effects"]),
+                ses_obs=jnp.array(padded["ses"]),
+                mask=jnp.array(padded["mask"]),
+            )
+        record_timing(delay_label, padded, timing, chain_method, worst, logger)
 
-            # Study-specific effects
-            with numpyro.plate("studies", len(effects_obs)):
-                theta = sample("theta", dist.Normal(mu, tau))
+        # Extract results
+        n = len(effects)
+        samples = {
+            "mu": samples["mu"][:, :, 0, 0],
+            "tau": samples["tau"][:, :, 0, 0],
+            "theta": samples["theta"][:, :, 0, :n],
+        }
+        return summarise_samples(samples, delay_label, n, sample_seconds=timing["sample"])
 
-            # Likelihood
-            return sample("obs", dist.Normal(theta, ses_obs), obs=effects_obs)
+    except Exception as exc:
+        logger.warning(f"NumPyro Bayesian meta-analysis failed for {delay_label}: {exc}")
+        return {}
 
-        # Run MCMC
-        kernel = NUTS(model)
-        mcmc = MCMC(kernel, num_warmup=1000, num_samples=2000, num_chains=4)
-        rng_key = random.PRNGKey(42)
-        mcmc.run(rng_key, effects_obs=jnp.array(effects), ses_obs=jnp.array(ses))
 
-        # Extract results
-        samples = mcmc.get_samples()
+def monitored_draws(samples: Dict[str, np.ndarray], mask: np.ndarray) -> np.ndarray:
+    """(chain, draw, k) draws of mu, tau and theta for the rows and studies that hold data."""
+    rows = mask.any(axis=1)
+    return np.concatenate(
+        [samples["mu"][:, :, rows, 0], samples["tau"][:, :, rows, 0], samples["theta"][:, :, mask]],
+        axis=2,
+    )
 
-        # Calculate summary statistics
-        mu_samples = samples["mu"]
-        tau_samples = samples["tau"]
 
-        pooled_effect = float(jnp.mean(mu_samples))
-        effect_se = float(jnp.std(mu_samples))
-        hdi_2_5 = float(jnp.percentile(mu_samples, 2.5))
-        hdi_97_5 = float(jnp.percentile(mu_samples, 97.5))
+def record_timing(
+    run: str,
+    padded: Dict[str, np.ndarray],
+    timing: Dict[str, float],
+    chain_method: str,
+    worst: Dict[str, float],
+    logger: logging.Logger,
+) -> None:
+    """Log and keep the compile/sample split and sampling efficiency of one NumPyro run."""
+    rows, width = padded["effects"].shape
+    ess_per_second = worst["ess_bulk"] / timing["sample"] if timing["sample"] > 0 else np.nan
+    ess_per_wall_second = worst["ess_bulk"] / timing["wall"] if timing["wall"] > 0 else np.nan
+    TIMINGS.append({
+        "run": run,
+        "padded_shape": f"{rows}x{width}",
+        "chain_method": chain_method,
+        "num_chains": NUM_CHAINS,
+        "cores": available_cores(),
+        "compile_seconds": timing["compile"],
+        "sample_seconds": timing["sample"],
+        "wall_seconds": timing["wall"],
+        "draws_per_chain": worst["draws"],
+        "max_r_hat": worst["r_hat"],
+        "min_ess_bulk": worst["ess_bulk"],
+        "min_ess_tail": worst["ess_tail"],
+        "ess_per_second": ess_per_second,
+        "ess_per_wall_second": ess_per_wall_second,
+    })
+    logger.info(
+        f"{run}: compile {timing['compile']:.1f} s, sampling {timing['sample']:.1f} s "
+        f"(padded to {rows}x{width}, {chain_method} chains)"
+    )
+    logger.info(
+        f"{run}: {ess_per_second:.0f} bulk ESS/s sampling, {ess_per_wall_second:.0f} per wall-clock second, "
+        f"over {worst['draws']} draws per chain"
+    )
 
-        tau_mean = float(jnp.mean(tau_samples))
-        tau_hdi_2_5 = float(jnp.percentile(tau_samples, 2.5))
-        tau_hdi_97_5 = float(jnp.percentile(tau_samples, 97.5))
 
-        return {
-            "delay_type": delay_label,
-            "pooled_effect": pooled_effect,
-            "effect_se": effect_se,
-            "hdi_2.5": hdi_2_5,
-            "hdi_97.5": hdi_97_5,
-            "tau": tau_mean,
-            "tau_hdi_2.5": tau_hdi_2_5,
-            "tau_hdi_97.5": tau_hdi_97_5,
-            "n_studies": len(effects),
-            "r_hat_mu": np.nan,  # NumPyro doesn't provide R-hat directly
+def summarise_samples(
+    samples: Dict,
+    delay_label: str,
+    n_studies: int,
+    method: str = "NumPyro",
+    sample_seconds: Optional[float] = None,
+) -> Dict:
+    """Summary row for one delay type from its (chain, draw) posterior samples."""
+    mu_samples = np.asarray(samples["mu"]).ravel()
+    tau_samples = np.asarray(samples["tau"]).ravel()
+    diag = diagnostics(np.stack([samples["mu"], samples["tau"]], axis=-1))
+    min_ess = float(np.min(diag["ess_bulk"]))
+    return {
+        "delay_type": delay_label,
+        "pooled_effect": float(np.mean(mu_samples)),
+        "effect_se": float(np.std(mu_samples)),
+        "hdi_2.5": float(np.percentile(mu_samples, 2.5)),
+        "hdi_97.5": float(np.percentile(mu_samples, 97.5)),
+        "tau": float(np.mean(tau_samples)),
+        "tau_hdi_2.5": float(np.percentile(tau_samples, 2.5)),
+        "tau_hdi_97.5": float(np.percentile(tau_samples, 97.5)),
+        "n_studies": n_studies,
+        "r_hat_mu": float(diag["r_hat"][0]),
+        "r_hat_tau": float(diag["r_hat"][1]),
+        "ess_bulk_mu": float(diag["ess_bulk"][0]),
+        "ess_tail_mu": float(diag["ess_tail"][0]),
+        "ess_bulk_tau": float(diag["ess_bulk"][1]),
+        "ess_tail_tau": float(diag["ess_tail"][1]),
+        "draws_per_chain": np.shape(samples["mu"])[1],
+        "ess_per_second": min_ess / sample_seconds if sample_seconds else np.nan,
+        "samples": samples,  # Written to the posterior store by store_draws
+        "method": method
+    }
+
+
+def store_draws(results: Dict, logger: logging.Logger, directory: Path = POSTERIOR_DIR) -> Dict:
+    """Save a result's posterior draws to the store; return its scalar summary with the file path."""
+    if "samples" in results:
+        draws = results["samples"]
+    elif "trace" in results:
+        draws = {name: results["trace"].posterior[name].values for name in ("mu", "tau", "theta")}
+    else:
+        draws = {}
+    summary = {key: value for key, value in results.items() if key not in DRAW_KEYS}
+    if draws:
+        path = save_posterior(
+            draws, results["delay_type"], directory, attrs={"method": results.get("method", "PyMC")}
+        )
+        summary["posterior_path"] = relative_posterior_path(path)
+        logger.info(f"Saved posterior draws for {results['delay_type']} to {path}")
+    return summary
+
+
+def pad_studies(datasets: List[Dict[str, np.ndarray]], n_rows: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Stack per-delay-type study arrays into masked (rows, bucketed studies) arrays.
+
+    Rows beyond ``datasets`` (up to ``n_rows``) are fully masked, so the joint
+    model keeps one shape however many delay types have data.
+    """
+    n_rows = n_rows or len(datasets)
+    width = study_bucket(max(data["n_studies"] for data in datasets))
+    effects = np.zeros((n_rows, width))
+    ses = np.ones((n_rows, width))
+    mask = np.zeros((n_rows, width), dtype=bool)
+    for row, data in enumerate(datasets):
+        n = data["n_studies"]
+        effects[row, :n] = data["effects"]
+        ses[row, :n] = data["ses"]
+        mask[row, :n] = True
+    return {"effects": effects, "ses": ses, "mask": mask}
+
+
+def joint_meta_model(effects_obs, ses_obs, mask):
+    """Random-effects meta-analysis of every delay type at once.
+
+    Same priors and likelihood as the per-delay-type model, with a delay-type
+    plate over padded study arrays. Study effects are non-centred
+    (theta = mu + tau * z) so padded slots only carry their standard-normal
+    prior and leave mu and tau untouched; their observations are masked out.
+    """
+    n_types, n_studies = effects_obs.shape
+    with numpyro.plate("delay_types", n_types, dim=-2):
+        mu = sample("mu", dist.Normal(0, 10))
+        tau = sample("tau", dist.HalfNormal(1))
+        with numpyro.plate("studies", n_studies, dim=-1):
+            z = sample("theta_z", dist.Normal(0, 1))
+            theta = numpyro.deterministic("theta", mu + tau * z)
+            with numpyro.handlers.mask(mask=mask):
+                sample("obs", dist.Normal(theta, ses_obs), obs=effects_obs)
+
+
+def run_joint_numpyro_meta_analysis(
+    datasets: List[Dict[str, np.ndarray]],
+    labels: List[str],
+    logger: logging.Logger,
+    chain_method: str = "sequential",
+    run_label: Optional[str] = None,
+    targets: Optional[SamplingTargets] = None,
+    warm_start: Optional[Dict] = None,
+    save_state: bool = False,
+) -> List[Dict]:
+    """Sample every delay type in one compiled NUTS run and split the draws per delay type.
+
+    With ``warm_start`` (a stored state accepted by choose_warm_start) the
+    chains reuse its step size and mass matrix, start from its draws and
+    only tune the step size in a short warmup; if they then miss the R-hat
+    target the run is repeated with a full warmup. ``save_state`` stores
+    this run's adaptation and posterior for the next warm start.
+    """
+    targets = targets or SamplingTargets()
+    study_ids = [[str(sid) for sid in data["study_ids"]] for data in datasets]
+    try:
+        padded = pad_studies(datasets, n_rows=len(DELAY_TYPES))
+        init_params = None
+        if warm_start is None:
+            kernel = NUTS(joint_meta_model)
+            num_warmup = 1000
+        else:
+            kernel = NUTS(
+                joint_meta_model,
+                step_size=warm_start["step_size"],
+                inverse_mass_matrix=inverse_mass_matrix(warm_start),
+                adapt_mass_matrix=False,
+            )
+            num_warmup = WARM_WARMUP
+            init_params = {
+                name: jnp.array(value)
+                for name, value in initial_params(
+                    warm_start, labels, study_ids, padded["effects"].shape, NUM_CHAINS
+                ).items()
+            }
+        mcmc = MCMC(
+            kernel, num_warmup=num_warmup, num_samples=targets.chunk, num_chains=NUM_CHAINS,
+            chain_method=chain_method, jit_model_args=True,
+        )
+        with compile_timer() as timing:
+            samples, worst = sample_until_converged(
+                mcmc, random.PRNGKey(42), lambda draws: monitored_draws(draws, padded["mask"]), targets, logger,
+                init_params=init_params,
+                effects_obs=jnp.array(padded["effects"]),
+                ses_obs=jnp.array(padded["ses"]),
+                mask=jnp.array(padded["mask"]),
+            )
+        run_label = run_label or f"Joint model ({len(datasets)} delay types)"
+        if warm_start is not None:
+            run_label += f", warm start from {warm_start['quarter']}"
+        record_timing(run_label, padded, timing, chain_method, worst, logger)
+    except Exception as exc:
+        logger.warning(f"Joint NumPyro Bayesian meta-analysis failed: {exc}")
+        return []
+
+    if warm_start is not None and worst["r_hat"] > targets.r_hat:
+        logger.warning("Warm-started chains missed the R-hat target; rerunning with a full warmup.")
+        return run_joint_numpyro_meta_analysis(
+            datasets, labels, logger, chain_method, run_label=None, targets=targets, save_state=save_state
+        )
+    if save_state:
+        save_warm_start(
+            current_quarter(), labels, study_ids, padded["effects"].shape, adaptation_state(mcmc), samples
+        )
+
+    results = []
+    for row, (data, label) in enumerate(zip(datasets, labels)):
+        n = data["n_studies"]
+        per_type = {
+            "mu": samples["mu"][:, :, row, 0],
+            "tau": samples["tau"][:, :, row, 0],
+            "theta": samples["theta"][:, :, row, :n],
+        }
+        results.append(summarise_samples(per_type, label, n, sample_seconds=timing["sample"]))
+    return results
+
+
+def benchmark_chain_methods(
+    datasets: List[Dict[str, np.ndarray]],
+    labels: List[str],
+    logger: logging.Logger,
+    targets: Optional[SamplingTargets] = None,
+) -> pd.DataFrame:
+    """Time the joint model under every chain method, highest bulk ESS per wall-clock second first.
+
+    Each method is run twice so the second run shows the cost with the
+    compilation cache warm. Ranking is on wall time (compile plus sample):
+    a method whose compile does not come back from the cache pays it on
+    every run.
+    """
+    for chain_method in CHAIN_METHODS:
+        for attempt in ("cold", "warm"):
+            logger.info(f"Benchmarking {chain_method} chains ({attempt})")
+            run_joint_numpyro_meta_analysis(
+                datasets, labels, logger, chain_method, run_label=f"Benchmark {attempt}", targets=targets
+            )
+    benchmark = pd.DataFrame(TIMINGS)
+    return benchmark.sort_values(["run", "ess_per_wall_second"], ascending=False, ignore_index=True)
+
+
+def choose_warm_start(
+    datasets: List[Dict[str, np.ndarray]], labels: List[str], logger: logging.Logger
+) -> Optional[Dict]:
+    """The stored warm-start state if it still fits the data, else None for a full warmup.
+
+    The new data's exact posterior (by quadrature, in milliseconds) is
+    compared with the stored one before any sampling.
+    """
+    state = load_warm_start()
+    if state is None:
+        logger.info("No stored posterior to warm-start from; using a full warmup.")
+        return None
+    reason = incompatibility(state, labels, pad_studies(datasets, n_rows=len(DELAY_TYPES))["effects"].shape)
+    if reason:
+        logger.info(f"Full warmup: {reason} since the {state['quarter']} run.")
+        return None
+    padded = pad_studies(datasets)
+    posterior = quadrature_posterior(padded["effects"], padded["ses"], padded["mask"])
+    mu = mixture_summary(posterior["weights"], posterior["mu_mean"], posterior["mu_var"], [0.5])
+    tau_mean = (posterior["weights"] * posterior["tau"]).sum(axis=1)
+    tau_sd = np.sqrt((posterior["weights"] * posterior["tau"] ** 2).sum(axis=1) - tau_mean ** 2)
+    current = {
+        label: {"mu_mean": mu["mean"][row], "mu_sd": mu["sd"][row], "tau_mean": tau_mean[row], "tau_sd": tau_sd[row]}
+        for row, label in enumerate(labels)
+    }
+    shift = posterior_shift(state, current)
+    if shift > 1:
+        logger.info(f"Full warmup: the posterior moved since the {state['quarter']} run (shift score {shift:.2f}).")
+        return None
+    logger.info(f"Warm-starting from the {state['quarter']} posterior (shift score {shift:.2f}).")
+    return state
+
+
+def run_quadrature_meta_analysis(
+    datasets: List[Dict[str, np.ndarray]], labels: List[str], logger: logging.Logger
+) -> List[Dict]:
+    """Exact posterior summaries of every delay type by grid quadrature over tau.
+
+    Rows follow the summarise_samples schema; the draws are independent, so
+    R-hat and ESS are left empty.
+    """
+    start = time.perf_counter()
+    padded = pad_studies(datasets)
+    posterior = quadrature_posterior(padded["effects"], padded["ses"], padded["mask"])
+    mu = mixture_summary(posterior["weights"], posterior["mu_mean"], posterior["mu_var"], [0.025, 0.975])
+    tau_mean = (posterior["weights"] * posterior["tau"]).sum(axis=1)
+    tau_quantiles = grid_quantiles(posterior["tau"], posterior["weights"], [0.025, 0.975])
+    samples = quadrature_draws(
+        posterior, padded["effects"], padded["ses"], padded["mask"], NUM_CHAINS, QUADRATURE_DRAWS
+    )
+    logger.info(f"Quadrature posterior for {len(datasets)} delay types in {1000 * (time.perf_counter() - start):.0f} ms")
+
+    results = []
+    for row, (data, label) in enumerate(zip(datasets, labels)):
+        n = data["n_studies"]
+        results.append({
+            "delay_type": label,
+            "pooled_effect": float(mu["mean"][row]),
+            "effect_se": float(mu["sd"][row]),
+            "hdi_2.5": float(mu["quantiles"][row, 0]),
+            "hdi_97.5": float(mu["quantiles"][row, 1]),
+            "tau": float(tau_mean[row]),
+            "tau_hdi_2.5": float(tau_quantiles[row, 0]),
+            "tau_hdi_97.5": float(tau_quantiles[row, 1]),
+            "n_studies": n,
+            "r_hat_mu": np.nan,
             "r_hat_tau": np.nan,
-            "samples": samples,  # Store samples instead of trace
-            "method": "NumPyro"
+            "ess_bulk_mu": np.nan,
+            "ess_tail_mu": np.nan,
+            "ess_bulk_tau": np.nan,
+            "ess_tail_tau": np.nan,
+            "draws_per_chain": QUADRATURE_DRAWS,
+            "ess_per_second": np.nan,
+            "samples": {
+                "mu": samples["mu"][:, :, row, 0],
+                "tau": samples["tau"][:, :, row, 0],
+                "theta": samples["theta"][:, :, row, :n],
+            },
+            "method": "Quadrature",
+        })
+    return results
+
+
+def run_approx_meta_analysis(
+    datasets: List[Dict[str, np.ndarray]], labels: List[str], logger: logging.Logger, steps: int = 5000
+) -> List[Dict]:
+    """Preview posterior of the joint model by full-rank ADVI (SVI with a multivariate normal guide)."""
+    padded = pad_studies(datasets, n_rows=len(DELAY_TYPES))
+    model_kwargs = {
+        "effects_obs": jnp.array(padded["effects"]),
+        "ses_obs": jnp.array(padded["ses"]),
+        "mask": jnp.array(padded["mask"]),
+    }
+    guide = AutoMultivariateNormal(joint_meta_model)
+    svi = SVI(joint_meta_model, guide, numpyro.optim.Adam(0.01), Trace_ELBO())
+    with compile_timer() as timing:
+        fit = svi.run(random.PRNGKey(42), steps, progress_bar=False, **model_kwargs)
+        predictive = Predictive(
+            joint_meta_model, guide=guide, params=fit.params,
+            num_samples=NUM_CHAINS * QUADRATURE_DRAWS, return_sites=["mu", "tau", "theta"],
+        )
+        draws = {
+            name: np.asarray(value).reshape(NUM_CHAINS, QUADRATURE_DRAWS, *value.shape[1:])
+            for name, value in predictive(random.PRNGKey(43), **model_kwargs).items()
         }
+    logger.info(
+        f"ADVI ({steps} steps): compile {timing['compile']:.1f} s, fitting {timing['sample']:.1f} s, "
+        f"final ELBO loss {float(fit.losses[-1]):.1f}"
+    )
 
-    except Exception as exc:
-        logger.warning(f"NumPyro Bayesian meta-analysis failed for {delay_label}: {exc}")
-        return {}
+    results = []
+    for row, (data, label) in enumerate(zip(datasets, labels)):
+        n = data["n_studies"]
+        per_type = {
+            "mu": draws["mu"][:, :, row, 0],
+            "tau": draws["tau"][:, :, row, 0],
+            "theta": draws["theta"][:, :, row, :n],
+        }
+        summary = summarise_samples(per_type, label, n, method="ADVI")
+        # Draws from the approximation are independent; chain diagnostics say nothing here.
+        summary.update({key: np.nan for key in DIAGNOSTIC_KEYS})
+        results.append(summary)
+    return results
+
+
+def validate_quadrature(quadrature: List[Dict], nuts: List[Dict]) -> pd.DataFrame:
+    """Quadrature posterior means against NUTS, in units of the NUTS Monte Carlo standard error."""
+    rows = []
+    for exact, sampled in zip(quadrature, nuts):
+        for name, mean_key, sd_key in [("mu", "pooled_effect", "effect_se"), ("tau", "tau", None)]:
+            draws = np.asarray(sampled["samples"][name])
+            sd = float(draws.std())
+            mcse = sd / np.sqrt(sampled[f"ess_bulk_{name}"])
+            rows.append({
+                "delay_type": exact["delay_type"],
+                "parameter": name,
+                "quadrature_mean": exact[mean_key],
+                "nuts_mean": sampled[mean_key],
+                "nuts_mcse": mcse,
+                "z": (sampled[mean_key] - exact[mean_key]) / mcse,
+                "quadrature_sd": exact[sd_key] if sd_key else float(np.asarray(exact["samples"][name]).std()),
+                "nuts_sd": sd,
+            })
+    return pd.DataFrame(rows)
+
+
+def prior_sensitivity(
+    prepared: List[tuple], summaries: List[Dict], logger: logging.Logger
+) -> pd.DataFrame:
+    """Power-scaling sensitivity of every delay type from its stored posterior draws; saved to SENSITIVITY_PATH."""
+    paths = {summary["delay_type"]: resolve_posterior_path(summary.get("posterior_path")) for summary in summaries}
+    tables = []
+    for label, data in prepared:
+        path = paths.get(label)
+        if path is None:
+            logger.warning(f"No stored posterior draws for {label}; sensitivity skipped.")
+            continue
+        draws = {name: load_draws(path, name) for name in ("mu", "tau", "theta")}
+        if draws["theta"].shape[1] != data["n_studies"]:
+            logger.warning(f"Stored draws for {label} predate the current data; sensitivity skipped.")
+            continue
+        tables.append(power_scaling_sensitivity(draws, data["effects"], data["ses"], label))
+    if not tables:
+        return pd.DataFrame()
+    table = pd.concat(tables, ignore_index=True)
+    for _, row in table[table["component"] == "prior"].iterrows():
+        if row["diagnosis"] != "-":
+            logger.info(
+                f"{row['delay_type']} {row['parameter']}: {row['diagnosis']} "
+                f"(prior sensitivity {row['sensitivity']:.3f}; mean {row['posterior_mean']:.2f}, "
+                f"{row['mean_alpha_0.5']:.2f} at prior power 0.5, {row['mean_alpha_2']:.2f} at power 2)"
+            )
+    flagged = unreliable(table)
+    if not flagged.empty:
+        logger.warning(f"{len(flagged)} sensitivity rows have k-hat > 0.7; refit with those priors to confirm.")
+    table.to_csv(SENSITIVITY_PATH, index=False)
+    logger.info(f"Saved prior sensitivity to {SENSITIVITY_PATH}")
+    return table
+
+
+def compare_likelihoods(prepared: List[tuple], logger: logging.Logger) -> pd.DataFrame:
+    """PSIS-LOO ranking of the normal, log-normal and t variants; saved to LOO_COMPARISON_PATH."""
+    padded = pad_studies([data for _, data in prepared])
+    table = loo_comparison(
+        padded["effects"], padded["ses"], padded["mask"], [label for label, _ in prepared], logger,
+        n_chains=NUM_CHAINS, n_draws=QUADRATURE_DRAWS,
+    )
+    for label, rows in table.groupby("delay_type", sort=False):
+        best, runner_up = rows.iloc[0], rows.iloc[1]
+        clear = -runner_up["elpd_diff"] > 2 * runner_up["se_diff"]
+        logger.info(
+            f"{label}: {best['model']} ranks first (elpd_loo {best['elpd_loo']:.1f}); "
+            f"{runner_up['model']} {runner_up['elpd_diff']:.2f} ± {runner_up['se_diff']:.2f}"
+            + ("" if clear else ", not a clear difference")
+        )
+    if (table["n_high_k"] > 0).any():
+        logger.warning("Some studies have PSIS k-hat > 0.7; their elpd_loo values are unreliable.")
+    table.to_csv(LOO_COMPARISON_PATH, index=False)
+    logger.info(f"Saved likelihood comparison to {LOO_COMPARISON_PATH}")
+    return table
 
 
 def create_bayesian_forest_plot(data: Dict, results: Dict, delay_label: str, logger: logging.Logger) -> None:
@@ -331,11 +838,11 @@ def create_posterior_plot(results: Dict, delay_label: str, logger: logging.Logge
     FIGURES_DIR.mkdir(parents=True, exist_ok=True)
 
     fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+    posterior_path = resolve_posterior_path(results.get("posterior_path"))
 
-    if "samples" in results:  # NumPyro results
-        samples = results["samples"]
-        mu_samples = samples["mu"]
-        tau_samples = samples["tau"]
+    if "trace" not in results and posterior_path is not None:  # NumPyro results, read from the store
+        mu_samples = load_draws(posterior_path, "mu")
+        tau_samples = load_draws(posterior_path, "tau")
 
         # Plot mu posterior
         axes[0].hist(mu_samples, bins=50, density=True, alpha=0.7, color='blue')
@@ -380,53 +887,232 @@ def create_posterior_plot(results: Dict, delay_label: str, logger: logging.Logge
     logger.info(f"Saved posterior plot to {output_file}")
 
 
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="MCMC Bayesian meta-analysis of TB delays.")
+    parser.add_argument(
+        "--engine",
+        choices=("quadrature", "nuts"),
+        default="quadrature",
+        help="Exact grid quadrature over tau (default) or MCMC with PyMC/NumPyro.",
+    )
+    parser.add_argument(
+        "--approx",
+        action="store_true",
+        help="Preview run by ADVI; writes *_approx outputs and compares them with the last NUTS run.",
+    )
+    parser.add_argument("--approx-steps", type=int, default=5000, help="SVI optimisation steps for --approx.")
+    parser.add_argument(
+        "--validate-quadrature",
+        action="store_true",
+        help="Also run the joint NUTS model and compare its posterior means with the quadrature ones.",
+    )
+    parser.add_argument(
+        "--cold-start",
+        action="store_true",
+        help="Ignore the stored posterior and run the joint NUTS model with a full warmup.",
+    )
+    parser.add_argument(
+        "--sensitivity-only",
+        action="store_true",
+        help="Recompute the prior sensitivity table from the last run's stored draws and exit.",
+    )
+    parser.add_argument(
+        "--compare-likelihoods",
+        action="store_true",
+        help="Rank normal, log-normal and t likelihoods by PSIS-LOO (grid posteriors, no MCMC) and exit.",
+    )
+    parser.add_argument(
+        "--separate",
+        action="store_true",
+        help="Run one NumPyro model per delay type instead of the joint model.",
+    )
+    parser.add_argument(
+        "--chain-method",
+        choices=("auto",) + CHAIN_METHODS,
+        default="auto",
+        help="How NumPyro runs its chains; auto uses parallel when there is a core per chain, else vectorized.",
+    )
+    parser.add_argument(
+        "--target-rhat", type=float, default=1.01,
+        help="Keep sampling until every monitored split-R-hat is at most this.",
+    )
+    parser.add_argument(
+        "--target-ess", type=float, default=400.0,
+        help="Keep sampling until every monitored bulk and tail ESS reaches this.",
+    )
+    parser.add_argument("--chunk-draws", type=int, default=500, help="Draws per chain in each sampling chunk.")
+    parser.add_argument("--max-draws", type=int, default=8000, help="Upper limit on draws per chain.")
+    parser.add_argument(
+        "--benchmark-chains",
+        action="store_true",
+        help="Time the joint model under every chain method and exit.",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
     """Main execution function."""
+    args = parse_args()
     logger = configure_logging()
     logger.info("Starting MCMC Bayesian meta-analysis of TB delays")
 
-    if pm is None and not numpyro_available:
+    if args.engine == "nuts" and pm is None and not numpyro_available:
         logger.error("Neither PyMC nor NumPyro available for Bayesian meta-analysis")
         return
+    if args.approx and not numpyro_available:
+        logger.error("--approx needs NumPyro")
+        return
+    engine = "approx" if args.approx else args.engine
+    chain_method = "sequential"
+    if numpyro_available:
+        # Host devices must be configured before JAX initialises its backend.
+        chain_method = configure_chain_method(
+            "parallel" if args.benchmark_chains else args.chain_method, NUM_CHAINS
+        )
+        logger.info(f"NumPyro chains: {NUM_CHAINS} {chain_method} on {available_cores()} cores")
+        if enable_compilation_cache():
+            logger.info(f"JAX compilation cache: {JAX_CACHE_DIR}")
 
     df = load_data(logger)
     if df.empty:
         logger.error("No data available for analysis")
         return
 
-    results_list = []
+    targets = SamplingTargets(
+        r_hat=args.target_rhat, ess_bulk=args.target_ess, ess_tail=args.target_ess,
+        chunk=args.chunk_draws, max_draws=args.max_draws,
+    )
 
+    prepared = []
     for delay_col, delay_label in DELAY_TYPES.items():
-        logger.info(f"Analyzing {delay_label}")
-
         data = prepare_meta_data(df, delay_col, logger)
-        if not data:
-            continue
+        if data:
+            prepared.append((delay_label, data))
+
+    if args.sensitivity_only:
+        if not RESULTS_PATH.exists():
+            logger.error(f"No previous run at {RESULTS_PATH} to reweight")
+            return
+        prior_sensitivity(prepared, pd.read_csv(RESULTS_PATH).to_dict("records"), logger)
+        return
+
+    if args.compare_likelihoods:
+        if prepared:
+            compare_likelihoods(prepared, logger)
+        return
+
+    if args.benchmark_chains:
+        if not numpyro_available or not prepared:
+            logger.error("Chain benchmark needs NumPyro and at least one delay type with data")
+            return
+        benchmark = benchmark_chain_methods(
+            [data for _, data in prepared], [label for label, _ in prepared], logger, targets
+        )
+        benchmark.to_csv(CHAIN_BENCHMARK_PATH, index=False)
+        warm = benchmark[benchmark["run"] == "Benchmark warm"]
+        best = warm.iloc[0]
+        logger.info(
+            f"Most efficient warm chain method: {best['chain_method']} "
+            f"({best['ess_per_wall_second']:.0f} bulk ESS per wall-clock second, {best['wall_seconds']:.1f} s)"
+        )
+        logger.info(f"Saved chain method benchmark to {CHAIN_BENCHMARK_PATH}")
+        return
+
+    results_list = []
+    start = time.perf_counter()
+    if args.approx and prepared:
+        logger.info(f"Previewing {len(prepared)} delay types with ADVI (approximate)")
+        approx = run_approx_meta_analysis(
+            [data for _, data in prepared], [label for label, _ in prepared], logger, args.approx_steps
+        )
+        pairs = [(data, results) for (_, data), results in zip(prepared, approx)]
+    elif args.engine == "quadrature" and prepared:
+        logger.info(f"Analyzing {len(prepared)} delay types by grid quadrature")
+        quadrature = run_quadrature_meta_analysis(
+            [data for _, data in prepared], [label for label, _ in prepared], logger
+        )
+        pairs = [(data, results) for (_, data), results in zip(prepared, quadrature)]
+    elif pm is None and numpyro_available and not args.separate and prepared:
+        logger.info(f"Analyzing {len(prepared)} delay types in one joint NumPyro model")
+        datasets = [data for _, data in prepared]
+        labels = [label for label, _ in prepared]
+        warm_start = None if args.cold_start else choose_warm_start(datasets, labels, logger)
+        joint = run_joint_numpyro_meta_analysis(
+            datasets, labels, logger, chain_method, targets=targets, warm_start=warm_start, save_state=True
+        )
+        pairs = [(data, results) for (_, data), results in zip(prepared, joint)]
+    else:
+        pairs = []
+        for delay_label, data in prepared:
+            logger.info(f"Analyzing {delay_label}")
+            pairs.append((
+                data,
+                run_bayesian_meta_analysis(
+                    data["effects"], data["ses"], delay_label, logger, chain_method, targets
+                ),
+            ))
+    logger.info(f"Total {engine} wall time: {time.perf_counter() - start:.1f} s")
+
+    if args.validate_quadrature and engine == "quadrature" and prepared:
+        if numpyro_available:
+            nuts = run_joint_numpyro_meta_analysis(
+                [data for _, data in prepared], [label for label, _ in prepared], logger, chain_method,
+                targets=targets,
+            )
+            validation = validate_quadrature([results for _, results in pairs], nuts)
+            validation.to_csv(QUADRATURE_VALIDATION_PATH, index=False)
+            logger.info(
+                f"Largest |quadrature - NUTS| mean difference: {validation['z'].abs().max():.2f} Monte Carlo SEs"
+            )
+            logger.info(f"Saved quadrature validation to {QUADRATURE_VALIDATION_PATH}")
+        else:
+            logger.warning("Quadrature validation needs NumPyro; skipped.")
 
-        results = run_bayesian_meta_analysis(data["effects"], data["ses"], delay_label, logger)
+    for data, results in pairs:
         if not results:
             continue
 
+        if args.approx:
+            # Previews leave the full run's draws and figures alone.
+            results_list.append(store_draws(results, logger, APPROX_POSTERIOR_DIR))
+            continue
+
+        summary = store_draws(results, logger)
+
         # Create visualizations
-        create_bayesian_forest_plot(data, results, delay_label, logger)
-        create_posterior_plot(results, delay_label, logger)
+        create_bayesian_forest_plot(data, results, results["delay_type"], logger)
+        create_posterior_plot({**results, **summary}, results["delay_type"], logger)
 
-        results_list.append(results)
+        results_list.append(summary)
 
     if results_list:
         results_df = pd.DataFrame(results_list)
-        output_path = OUTPUT_DIR / "bayesian_meta_analysis_results.csv"
+        results_df["approximate"] = args.approx
+        output_path = APPROX_RESULTS_PATH if args.approx else RESULTS_PATH
         results_df.to_csv(output_path, index=False)
         logger.info(f"Saved Bayesian meta-analysis results to {output_path}")
+        if engine == "nuts":
+            results_df.to_csv(NUTS_REFERENCE_PATH, index=False)
+        if not args.approx:
+            prior_sensitivity(prepared, results_list, logger)
+        else:
+            write_comparison(
+                results_df, NUTS_REFERENCE_PATH, APPROX_COMPARISON_PATH, ["delay_type"], APPROX_STATISTICS, logger
+            )
 
         # Summary table
         summary_cols = ["delay_type", "pooled_effect", "hdi_2.5", "hdi_97.5", "tau", "n_studies"]
         summary_df = results_df[summary_cols].copy()
         summary_df.columns = ["Delay Type", "Mean (days)", "HDI 2.5%", "HDI 97.5%", "Heterogeneity (τ)", "Studies"]
-        summary_path = OUTPUT_DIR / "bayesian_meta_analysis_summary.csv"
+        summary_path = APPROX_SUMMARY_PATH if args.approx else SUMMARY_PATH
         summary_df.to_csv(summary_path, index=False)
         logger.info(f"Saved summary to {summary_path}")
 
+    if TIMINGS:
+        pd.DataFrame(TIMINGS).to_csv(TIMING_PATH, index=False)
+        logger.info(f"Saved compile/sample timings to {TIMING_PATH}")
+
     logger.info("MCMC Bayesian meta-analysis completed")
 
 
@@ -7,6 +7,7 @@ to identify underlying components and improve explanatory power.
 
 from __future__ import annotations
 
+import argparse
 import logging
 import sys
 from pathlib import Path
@@ -19,8 +20,12 @@ import seaborn as sns
 from sklearn.decomposition import PCA
 from sklearn.preprocessing import StandardScaler
 
+from geography import level_path
+from rollups import rollup
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DATA_PATH = PROJECT_ROOT / "data" / "processed" / "proxy_delay_results.csv"
+DISTRICT_DATA_PATH = PROJECT_ROOT / "data" / "processed" / "proxy_delay_results_district.csv"
 OUTPUT_DIR = PROJECT_ROOT / "data" / "processed"
 FIGURES_DIR = PROJECT_ROOT / "output" / "figures"
 LOG_PATH = OUTPUT_DIR / "pca_delay_determinants.log"
@@ -57,24 +62,28 @@ def configure_logging() -> logging.Logger:
     return logger
 
 
-def load_data(logger: logging.Logger) -> pd.DataFrame:
-    """Load proxy delay results data."""
-    if not DATA_PATH.exists() or DATA_PATH.stat().st_size == 0:
+def load_data(logger: logging.Logger, level: str = "state") -> pd.DataFrame:
+    """Load proxy delay results data (district proxies for district-level runs)."""
+    path = DISTRICT_DATA_PATH if level == "district" else DATA_PATH
+    if not path.exists() or path.stat().st_size == 0:
         logger.error("Proxy delay results file missing or empty.")
         return pd.DataFrame()
-    return pd.read_csv(DATA_PATH)
+    return pd.read_csv(path)
 
 
-def prepare_pca_data(df: pd.DataFrame, logger: logging.Logger) -> Tuple[pd.DataFrame, np.ndarray]:
+def prepare_pca_data(
+    df: pd.DataFrame, logger: logging.Logger, level: str = "state"
+) -> Tuple[pd.DataFrame, np.ndarray]:
     """Prepare data for PCA analysis."""
-    # Aggregate by state (mean across years)
-    state_data = df.groupby("state")[PROXY_FEATURES].mean().dropna()
+    # Aggregate by unit (mean across years), via the cached roll-ups
+    aggregated = rollup(df, level, {f: "mean" for f in PROXY_FEATURES}, logger, name="proxy_features")
+    state_data = aggregated[PROXY_FEATURES].dropna()
 
     if state_data.empty:
-        logger.error("No complete state-level data for PCA")
+        logger.error(f"No complete {level}-level data for PCA")
         return pd.DataFrame(), np.array([])
 
-    logger.info(f"Prepared data for {len(state_data)} states")
+    logger.info(f"Prepared data for {len(state_data)} {level} units")
 
     # Standardize features
     scaler = StandardScaler()
@@ -91,13 +100,13 @@ def perform_pca(scaled_data: np.ndarray, state_data: pd.DataFrame, logger: loggi
     # Create component loadings dataframe
     loadings = pd.DataFrame(
         pca.components_.T,
-        columns=[f"PC{i+1}" for i in range(len(PROXY_FEATURES))],
+        columns=[f"PC{i+1}" for i in range(pca.n_components_)],
         index=PROXY_FEATURES
     )
 
     # Explained variance
     explained_var = pd.DataFrame({
-        "component": [f"PC{i+1}" for i in range(len(PROXY_FEATURES))],
+        "component": [f"PC{i+1}" for i in range(pca.n_components_)],
         "explained_variance": pca.explained_variance_,
         "explained_variance_ratio": pca.explained_variance_ratio_,
         "cumulative_variance": np.cumsum(pca.explained_variance_ratio_)
@@ -108,7 +117,7 @@ def perform_pca(scaled_data: np.ndarray, state_data: pd.DataFrame, logger: loggi
     return pca, loadings, explained_var
 
 
-def create_scree_plot(explained_var: pd.DataFrame, logger: logging.Logger) -> None:
+def create_scree_plot(explained_var: pd.DataFrame, logger: logging.Logger, level: str = "state") -> None:
     """Create scree plot showing explained variance."""
     FIGURES_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -135,13 +144,13 @@ def create_scree_plot(explained_var: pd.DataFrame, logger: logging.Logger) -> No
     ax2.grid(True, alpha=0.3)
 
     fig.tight_layout()
-    output_file = FIGURES_DIR / "pca_scree_plot_delay_determinants.png"
+    output_file = level_path(FIGURES_DIR / "pca_scree_plot_delay_determinants.png", level)
     fig.savefig(output_file, dpi=300, bbox_inches="tight")
     plt.close(fig)
     logger.info(f"Saved scree plot to {output_file}")
 
 
-def create_loadings_heatmap(loadings: pd.DataFrame, logger: logging.Logger) -> None:
+def create_loadings_heatmap(loadings: pd.DataFrame, logger: logging.Logger, level: str = "state") -> None:
     """Create heatmap of component loadings."""
     FIGURES_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -156,13 +165,14 @@ def create_loadings_heatmap(loadings: pd.DataFrame, logger: logging.Logger) -> N
     ax.set_ylabel("Original Features")
 
     fig.tight_layout()
-    output_file = FIGURES_DIR / "pca_loadings_heatmap_delay_determinants.png"
+    output_file = level_path(FIGURES_DIR / "pca_loadings_heatmap_delay_determinants.png", level)
     fig.savefig(output_file, dpi=300, bbox_inches="tight")
     plt.close(fig)
     logger.info(f"Saved loadings heatmap to {output_file}")
 
 
-def create_component_biplot(pca: PCA, scaled_data: np.ndarray, state_data: pd.DataFrame, logger: logging.Logger) -> None:
+def create_component_biplot(pca: PCA, scaled_data: np.ndarray, state_data: pd.DataFrame,
+                            logger: logging.Logger, level: str = "state") -> None:
     """Create biplot showing components and feature loadings."""
     FIGURES_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -193,7 +203,7 @@ def create_component_biplot(pca: PCA, scaled_data: np.ndarray, state_data: pd.Da
     ax.grid(True, alpha=0.3)
 
     fig.tight_layout()
-    output_file = FIGURES_DIR / "pca_biplot_delay_determinants.png"
+    output_file = level_path(FIGURES_DIR / "pca_biplot_delay_determinants.png", level)
     fig.savefig(output_file, dpi=300, bbox_inches="tight")
     plt.close(fig)
     logger.info(f"Saved biplot to {output_file}")
@@ -238,42 +248,56 @@ def interpret_components(loadings: pd.DataFrame, explained_var: pd.DataFrame, lo
 
 
 def save_pca_results(state_data: pd.DataFrame, pca: PCA, loadings: pd.DataFrame,
-                    explained_var: pd.DataFrame, interpretation: pd.DataFrame, logger: logging.Logger) -> None:
+                    explained_var: pd.DataFrame, interpretation: pd.DataFrame, logger: logging.Logger,
+                    level: str = "state") -> None:
     """Save all PCA results to files."""
     # Component scores
     scores = pca.transform(StandardScaler().fit_transform(state_data))
     scores_df = pd.DataFrame(scores, columns=[f"PC{i+1}" for i in range(scores.shape[1])], index=state_data.index)
-    scores_path = OUTPUT_DIR / "pca_component_scores_delay_determinants.csv"
+    scores_path = level_path(OUTPUT_DIR / "pca_component_scores_delay_determinants.csv", level)
     scores_df.to_csv(scores_path)
     logger.info(f"Saved component scores to {scores_path}")
 
     # Loadings
-    loadings_path = OUTPUT_DIR / "pca_loadings_delay_determinants.csv"
+    loadings_path = level_path(OUTPUT_DIR / "pca_loadings_delay_determinants.csv", level)
     loadings.to_csv(loadings_path)
     logger.info(f"Saved loadings to {loadings_path}")
 
     # Explained variance
-    explained_path = OUTPUT_DIR / "pca_explained_variance_delay_determinants.csv"
+    explained_path = level_path(OUTPUT_DIR / "pca_explained_variance_delay_determinants.csv", level)
     explained_var.to_csv(explained_path, index=False)
     logger.info(f"Saved explained variance to {explained_path}")
 
     # Interpretation
-    interp_path = OUTPUT_DIR / "pca_interpretation_delay_determinants.csv"
+    interp_path = level_path(OUTPUT_DIR / "pca_interpretation_delay_determinants.csv", level)
     interpretation.to_csv(interp_path, index=False)
     logger.info(f"Saved interpretation to {interp_path}")
 
 
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="PCA of TB delay determinants.")
+    parser.add_argument(
+        "--level",
+        choices=["district", "state", "zone"],
+        default="state",
+        help="Geographic level of the analysis; non-state outputs get a level suffix.",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
     """Main execution function."""
+    args = parse_args()
     logger = configure_logging()
-    logger.info("Starting PCA analysis of TB delay determinants")
+    logger.info(f"Starting {args.level}-level PCA analysis of TB delay determinants")
 
-    df = load_data(logger)
+    df = load_data(logger, args.level)
     if df.empty:
         logger.error("No data available for PCA analysis")
         return
 
-    state_data, scaled_data = prepare_pca_data(df, logger)
+    state_data, scaled_data = prepare_pca_data(df, logger, args.level)
     if state_data.empty:
         logger.error("Insufficient data for PCA")
         return
@@ -281,15 +305,15 @@ def main() -> None:
     pca, loadings, explained_var = perform_pca(scaled_data, state_data, logger)
 
     # Create visualizations
-    create_scree_plot(explained_var, logger)
-    create_loadings_heatmap(loadings, logger)
-    create_component_biplot(pca, scaled_data, state_data, logger)
+    create_scree_plot(explained_var, logger, args.level)
+    create_loadings_heatmap(loadings, logger, args.level)
+    create_component_biplot(pca, scaled_data, state_data, logger, args.level)
 
     # Interpret components
     interpretation = interpret_components(loadings, explained_var, logger)
 
     # Save results
-    save_pca_results(state_data, pca, loadings, explained_var, interpretation, logger)
+    save_pca_results(state_data, pca, loadings, explained_var, interpretation, logger, args.level)
 
     logger.info("PCA analysis of TB delay determinants completed")
 
@@ -7,6 +7,7 @@ and DAG causal modeling to provide comprehensive insights into TB detection dela
 
 from __future__ import annotations
 
+import argparse
 import logging
 import sys
 from pathlib import Path
@@ -17,6 +18,10 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 
+from geography import LEVELS, level_path
+from posterior_store import load_draws, resolve_posterior_path
+from rollups import rollup
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 OUTPUT_DIR = PROJECT_ROOT / "data" / "processed"
 FIGURES_DIR = PROJECT_ROOT / "output" / "figures"
@@ -43,7 +48,7 @@ def configure_logging() -> logging.Logger:
     return logger
 
 
-def load_analysis_results(logger: logging.Logger) -> Dict[str, pd.DataFrame]:
+def load_analysis_results(logger: logging.Logger, level: str = "state") -> Dict[str, pd.DataFrame]:
     """Load results from individual analysis methods."""
     results = {}
 
@@ -57,8 +62,8 @@ def load_analysis_results(logger: logging.Logger) -> Dict[str, pd.DataFrame]:
         results["mcmc"] = pd.DataFrame()
 
     # PCA results
-    pca_scores_path = OUTPUT_DIR / "pca_component_scores_delay_determinants.csv"
-    pca_loadings_path = OUTPUT_DIR / "pca_loadings_delay_determinants.csv"
+    pca_scores_path = level_path(OUTPUT_DIR / "pca_component_scores_delay_determinants.csv", level)
+    pca_loadings_path = level_path(OUTPUT_DIR / "pca_loadings_delay_determinants.csv", level)
     if pca_scores_path.exists():
         results["pca_scores"] = pd.read_csv(pca_scores_path, index_col=0)
         logger.info(f"Loaded PCA scores: {len(results['pca_scores'])} states")
@@ -73,7 +78,7 @@ def load_analysis_results(logger: logging.Logger) -> Dict[str, pd.DataFrame]:
         logger.info(f"Loaded DAG metrics: {len(results['dag_metrics'])} states")
 
     # Original proxy data
-    proxy_path = OUTPUT_DIR / "proxy_delay_results.csv"
+    proxy_path = OUTPUT_DIR / ("proxy_delay_results_district.csv" if level == "district" else "proxy_delay_results.csv")
     if proxy_path.exists():
         results["proxy_data"] = pd.read_csv(proxy_path)
         logger.info(f"Loaded proxy data: {len(results['proxy_data'])} records")
@@ -81,7 +86,8 @@ def load_analysis_results(logger: logging.Logger) -> Dict[str, pd.DataFrame]:
     return results
 
 
-def create_integrated_summary(results: Dict[str, pd.DataFrame], logger: logging.Logger) -> pd.DataFrame:
+def create_integrated_summary(results: Dict[str, pd.DataFrame], logger: logging.Logger,
+                              level: str = "state") -> pd.DataFrame:
     """Create integrated summary of all methods."""
     summary_data = []
 
@@ -99,7 +105,7 @@ def create_integrated_summary(results: Dict[str, pd.DataFrame], logger: logging.
 
     # PCA summary
     if "pca_loadings" in results and not results["pca_loadings"].empty:
-        explained_var_path = OUTPUT_DIR / "pca_explained_variance_delay_determinants.csv"
+        explained_var_path = level_path(OUTPUT_DIR / "pca_explained_variance_delay_determinants.csv", level)
         if explained_var_path.exists():
             explained_var = pd.read_csv(explained_var_path)
             for _, row in explained_var.iterrows():
@@ -133,7 +139,8 @@ def create_integrated_summary(results: Dict[str, pd.DataFrame], logger: logging.
     return summary_df
 
 
-def create_multi_method_comparison(results: Dict[str, pd.DataFrame], logger: logging.Logger) -> None:
+def create_multi_method_comparison(results: Dict[str, pd.DataFrame], logger: logging.Logger,
+                                   level: str = "state") -> None:
     """Create comparison visualizations across methods."""
     FIGURES_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -149,6 +156,14 @@ def create_multi_method_comparison(results: Dict[str, pd.DataFrame], logger: log
         lowers = mcmc_data["pooled_effect"] - mcmc_data["hdi_2.5"]
         uppers = mcmc_data["hdi_97.5"] - mcmc_data["pooled_effect"]
 
+        # Full posteriors of the pooled delay when 17_ stored its draws
+        paths = [resolve_posterior_path(value) for value in mcmc_data.get("posterior_path", [])]
+        if paths and all(path is not None for path in paths):
+            positions = np.arange(len(paths))
+            ax.violinplot([load_draws(path, "mu") for path in paths], positions=positions,
+                          showextrema=False)
+            ax.set_xticks(positions)
+            ax.set_xticklabels(delays)
         ax.errorbar(delays, means, yerr=[lowers, uppers], fmt='o', capsize=5,
                    color='darkblue', alpha=0.8)
         ax.set_title("MCMC Bayesian Meta-Analysis")
@@ -207,34 +222,42 @@ def create_multi_method_comparison(results: Dict[str, pd.DataFrame], logger: log
             ax.tick_params(axis='x', rotation=45)
 
     fig.tight_layout()
-    output_file = FIGURES_DIR / "integrated_multi_method_comparison.png"
+    output_file = level_path(FIGURES_DIR / "integrated_multi_method_comparison.png", level)
     fig.savefig(output_file, dpi=300, bbox_inches="tight")
     plt.close(fig)
     logger.info(f"Saved integrated comparison plot to {output_file}")
 
 
-def create_state_ranking(results: Dict[str, pd.DataFrame], logger: logging.Logger) -> pd.DataFrame:
-    """Create integrated state ranking based on multiple methods."""
+def create_state_ranking(results: Dict[str, pd.DataFrame], logger: logging.Logger,
+                         level: str = "state") -> pd.DataFrame:
+    """Create integrated ranking of ``level`` units based on multiple methods."""
     if "proxy_data" not in results or results["proxy_data"].empty:
         return pd.DataFrame()
 
     # Start with proxy data
-    state_summary = results["proxy_data"].groupby("state").agg({
+    state_summary = rollup(results["proxy_data"], level, {
         "pn_ratio": "mean",
         "in_ratio": "mean",
         "symptomatic_no_care_pct": "mean",
         "poverty_pct": "mean"
-    }).reset_index()
+    }, logger, name="ranking_proxies").reset_index()
 
     # Add PCA scores if available
     if "pca_scores" in results and not results["pca_scores"].empty:
-        pca_scores = results["pca_scores"].reset_index().rename(columns={"index": "state"})
-        state_summary = state_summary.merge(pca_scores, on="state", how="left")
+        pca_scores = results["pca_scores"].reset_index().rename(columns={"index": level})
+        state_summary = state_summary.merge(pca_scores, on=level, how="left")
 
-    # Add DAG metrics if available
+    # Add DAG metrics if available (state-level, so only for state and coarser units)
+    dag_columns = ["pn_ratio_weighted_influence", "poverty_pct_weighted_influence"]
     if "dag_metrics" in results and not results["dag_metrics"].empty:
-        dag_metrics = results["dag_metrics"][["state", "pn_ratio_weighted_influence", "poverty_pct_weighted_influence"]]
-        state_summary = state_summary.merge(dag_metrics, on="state", how="left")
+        if LEVELS.index(level) >= LEVELS.index("state"):
+            dag_metrics = rollup(
+                results["dag_metrics"][["state", *dag_columns]], level,
+                {column: "mean" for column in dag_columns}, logger, name="ranking_dag",
+            )[dag_columns].reset_index()
+            state_summary = state_summary.merge(dag_metrics, on=level, how="left")
+        else:
+            logger.info("DAG metrics are state-level; not merged into the district ranking.")
 
     # Calculate composite risk score
     risk_score = state_summary["pn_ratio"] * 0.4 + state_summary["poverty_pct"] * 0.3 + state_summary["symptomatic_no_care_pct"] * 0.3
@@ -244,16 +267,17 @@ def create_state_ranking(results: Dict[str, pd.DataFrame], logger: logging.Logge
     state_summary = state_summary.sort_values("composite_risk_score", ascending=False)
     state_summary["priority_rank"] = range(1, len(state_summary) + 1)
 
-    logger.info(f"Created state ranking for {len(state_summary)} states")
+    logger.info(f"Created {level} ranking for {len(state_summary)} units")
     return state_summary
 
 
 def generate_integrated_report(results: Dict[str, pd.DataFrame], summary_df: pd.DataFrame,
-                              state_ranking: pd.DataFrame, logger: logging.Logger) -> None:
+                              state_ranking: pd.DataFrame, logger: logging.Logger,
+                              level: str = "state") -> None:
     """Generate comprehensive integrated analysis report."""
     REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
-    report_path = REPORTS_DIR / "integrated_delay_analysis_report.md"
+    report_path = level_path(REPORTS_DIR / "integrated_delay_analysis_report.md", level)
 
     with open(report_path, 'w', encoding='utf-8') as f:
         f.write("# Integrated Multi-Method Analysis: TB Detection Delays\n\n")
@@ -283,11 +307,11 @@ def generate_integrated_report(results: Dict[str, pd.DataFrame], summary_df: pd.
         if not state_ranking.empty:
             f.write("## State Prioritization Framework\n\n")
             f.write("Top 5 high-priority states for intervention:\n\n")
-            top_states = state_ranking.head(5)[["state", "composite_risk_score", "priority_rank"]]
-            f.write("| Rank | State | Risk Score |\n")
+            top_states = state_ranking.head(5)[[level, "composite_risk_score", "priority_rank"]]
+            f.write(f"| Rank | {level.capitalize()} | Risk Score |\n")
             f.write("|------|-------|------------|\n")
             for _, row in top_states.iterrows():
-                f.write(f"| {row['priority_rank']} | {row['state']} | {row['composite_risk_score']:.2f} |\n")
+                f.write(f"| {row['priority_rank']} | {row[level]} | {row['composite_risk_score']:.2f} |\n")
             f.write("\n")
 
         # Recommendations
@@ -307,45 +331,59 @@ def generate_integrated_report(results: Dict[str, pd.DataFrame], summary_df: pd.
     logger.info(f"Generated integrated report: {report_path}")
 
 
-def save_integrated_results(summary_df: pd.DataFrame, state_ranking: pd.DataFrame, logger: logging.Logger) -> None:
+def save_integrated_results(summary_df: pd.DataFrame, state_ranking: pd.DataFrame, logger: logging.Logger,
+                            level: str = "state") -> None:
     """Save integrated analysis results."""
     if not summary_df.empty:
-        summary_path = OUTPUT_DIR / "integrated_analysis_summary.csv"
+        summary_path = level_path(OUTPUT_DIR / "integrated_analysis_summary.csv", level)
         summary_df.to_csv(summary_path, index=False)
         logger.info(f"Saved integrated summary to {summary_path}")
 
     if not state_ranking.empty:
-        ranking_path = OUTPUT_DIR / "integrated_state_ranking.csv"
+        ranking_path = OUTPUT_DIR / f"integrated_{level}_ranking.csv"
         state_ranking.to_csv(ranking_path, index=False)
         logger.info(f"Saved state ranking to {ranking_path}")
 
 
+def parse_args() -> argparse.Namespace:
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Integrated multi-method analysis of TB delays.")
+    parser.add_argument(
+        "--level",
+        choices=["district", "state", "zone"],
+        default="state",
+        help="Geographic level for rankings; run 18_pca_delay_determinants.py at the same level first.",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
     """Main execution function."""
+    args = parse_args()
     logger = configure_logging()
     logger.info("Starting integrated multi-method analysis of TB detection delays")
 
     # Load results from individual methods
-    results = load_analysis_results(logger)
+    results = load_analysis_results(logger, args.level)
 
     if not results:
         logger.error("No analysis results found. Run individual method scripts first.")
         return
 
     # Create integrated summary
-    summary_df = create_integrated_summary(results, logger)
+    summary_df = create_integrated_summary(results, logger, args.level)
 
     # Create comparison visualizations
-    create_multi_method_comparison(results, logger)
+    create_multi_method_comparison(results, logger, args.level)
 
     # Create state ranking
-    state_ranking = create_state_ranking(results, logger)
+    state_ranking = create_state_ranking(results, logger, args.level)
 
     # Generate comprehensive report
-    generate_integrated_report(results, summary_df, state_ranking, logger)
+    generate_integrated_report(results, summary_df, state_ranking, logger, args.level)
 
     # Save results
-    save_integrated_results(summary_df, state_ranking, logger)
+    save_integrated_results(summary_df, state_ranking, logger, args.level)
 
     logger.info("Integrated multi-method analysis completed")
 
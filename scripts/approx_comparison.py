@@ -0,0 +1,81 @@
+"""Compare an approximate-inference summary with the last full NUTS run.
+
+Preview runs (``--approx``) write their summaries next to, not over, the
+full outputs. :func:`compare_summaries` lines an approximate summary table
+up against the reference one on shared key columns and reports each
+statistic's difference, also in units of the reference posterior sd where
+the table has one.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+COMPARISON_COLUMNS = ["statistic", "approx", "reference", "difference", "difference_in_sd"]
+
+
+def compare_summaries(
+    approx: pd.DataFrame,
+    reference: pd.DataFrame,
+    keys: List[str],
+    statistics: Dict[str, Optional[str]],
+) -> pd.DataFrame:
+    """Long table of approx vs reference values for every key and statistic.
+
+    ``statistics`` maps each compared column to the reference column that
+    holds its posterior sd, or None when the table has no sd for it.
+    """
+    merged = approx.merge(reference, on=keys, how="inner", suffixes=("_approx", "_reference"))
+    frames = []
+    for column, sd_column in statistics.items():
+        frame = merged[keys].copy()
+        frame["statistic"] = column
+        frame["approx"] = merged[f"{column}_approx"].to_numpy(dtype=float)
+        frame["reference"] = merged[f"{column}_reference"].to_numpy(dtype=float)
+        frame["difference"] = frame["approx"] - frame["reference"]
+        if sd_column is None:
+            frame["difference_in_sd"] = np.nan
+        else:
+            sd = merged[f"{sd_column}_reference"].to_numpy(dtype=float)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                frame["difference_in_sd"] = np.where(sd > 0, frame["difference"] / sd, np.nan)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=keys + COMPARISON_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[keys + COMPARISON_COLUMNS]
+
+
+def write_comparison(
+    approx: pd.DataFrame,
+    reference_path: Path,
+    output_path: Path,
+    keys: List[str],
+    statistics: Dict[str, Optional[str]],
+    logger: logging.Logger,
+) -> pd.DataFrame:
+    """Compare ``approx`` with the summary saved at ``reference_path`` and write the report."""
+    if not reference_path.exists():
+        logger.warning("No full NUTS run at %s to compare the approximation with.", reference_path)
+        return pd.DataFrame(columns=keys + COMPARISON_COLUMNS)
+    reference = pd.read_csv(reference_path)
+    comparison = compare_summaries(approx, reference, keys, statistics)
+    comparison.to_csv(output_path, index=False)
+    stamp = datetime.fromtimestamp(reference_path.stat().st_mtime).isoformat(timespec="seconds")
+    worst = comparison["difference_in_sd"].abs().max()
+    if np.isfinite(worst):
+        logger.info(
+            "Approximation vs NUTS run of %s: largest shift %.2f posterior sds; report saved to %s",
+            stamp, worst, output_path,
+        )
+    else:
+        logger.warning(
+            "Approximation vs NUTS run of %s: the reference has no nonzero posterior sds to scale by; "
+            "largest absolute difference %.3g; report saved to %s",
+            stamp, comparison["difference"].abs().max(), output_path,
+        )
+    return comparison
@@ -0,0 +1,107 @@
+"""Benchmark single-pass panel assembly against pairwise outer merges.
+
+Generates synthetic district-by-year sources at programme scale (default 780
+districts x 12 years) shaped like the ingested data: several yearly sources
+with partial coverage plus year-less structural sources. Times the previous
+``functools.reduce`` of pairwise ``pd.merge(..., how="outer")`` against
+``panel_builder.build_panel``.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from functools import reduce
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from panel_builder import build_panel
+
+
+def synthetic_sources(
+    n_units: int, n_years: int, n_yearly: int, n_static: int, n_columns: int, seed: int
+) -> Dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    units = np.array([f"district_{i:04d}" for i in range(n_units)], dtype=object)
+    years = np.arange(2025 - n_years, 2025)
+    grid_units = np.repeat(units, n_years)
+    grid_years = np.tile(years, n_units)
+    sources: Dict[str, pd.DataFrame] = {}
+    for s in range(n_yearly):
+        keep = rng.random(len(grid_units)) < 0.9
+        values = rng.normal(size=(int(keep.sum()), n_columns)).astype("float32")
+        frame = pd.DataFrame(values, columns=[f"yearly{s}_v{c}" for c in range(n_columns)])
+        frame.insert(0, "year", grid_years[keep])
+        frame.insert(0, "district", grid_units[keep])
+        sources[f"yearly{s}"] = frame
+    for s in range(n_static):
+        keep = rng.random(n_units) < 0.95
+        values = rng.normal(size=(int(keep.sum()), n_columns)).astype("float32")
+        frame = pd.DataFrame(values, columns=[f"static{s}_v{c}" for c in range(n_columns)])
+        frame.insert(0, "district", units[keep])
+        sources[f"static{s}"] = frame
+    return sources
+
+
+def pairwise_merge(sources: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    frames: List[pd.DataFrame] = list(sources.values())
+
+    def merge_two(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+        keys = [k for k in ["district", "year"] if k in left.columns and k in right.columns]
+        return pd.merge(left, right, on=keys or ["district"], how="outer")
+
+    return reduce(merge_two, frames)
+
+
+def time_call(func: Callable[[], pd.DataFrame], repeats: int) -> tuple[float, pd.DataFrame]:
+    best = float("inf")
+    result = pd.DataFrame()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark panel assembly strategies.")
+    parser.add_argument("--units", type=int, default=780, help="Number of districts.")
+    parser.add_argument("--years", type=int, default=12, help="Number of years.")
+    parser.add_argument("--yearly-sources", type=int, default=4)
+    parser.add_argument("--static-sources", type=int, default=3)
+    parser.add_argument("--columns", type=int, default=40, help="Value columns per source.")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logger = logging.getLogger("benchmark_panel_assembly")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    sources = synthetic_sources(
+        args.units, args.years, args.yearly_sources, args.static_sources, args.columns, args.seed
+    )
+    print(
+        f"[benchmark] {args.units} districts x {args.years} years, "
+        f"{args.yearly_sources} yearly + {args.static_sources} year-less sources, "
+        f"{args.columns} columns each"
+    )
+    pairwise_s, pairwise = time_call(lambda: pairwise_merge(sources), args.repeats)
+    single_s, single = time_call(
+        lambda: build_panel(sources, logger, unit="district"), args.repeats
+    )
+    for label, seconds, panel in [
+        ("pairwise outer merges", pairwise_s, pairwise),
+        ("single-pass build_panel", single_s, single),
+    ]:
+        memory = panel.memory_usage(deep=True).sum() / 2 ** 20
+        print(
+            f"[benchmark] {label:<24} {seconds * 1000:9.1f} ms  "
+            f"{len(panel):>7} rows  {memory:8.1f} MB"
+        )
+    print(f"[benchmark] speed-up: {pairwise_s / single_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Columns that downstream stages read, used to project ingestion and merging.
+
+Each stage declares the catalogue variables it consumes (see
+``variable_catalogue.CATALOGUE``; they map to ``state_year_panel`` columns
+named ``<dataset>_<column>`` as written by ``02_clean_merge.py``) and any
+cleaned source files it reads directly. ``01_ingest_sources*.py`` and
+``02_clean_merge.py`` keep only these plus the state/year keys unless run
+with ``--full-panel``.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from variable_catalogue import panel_column
+
+DATASET_NAMES = (
+    "who_tb_global",
+    "india_tb_reports",
+    "india_tb_notifications_2025",
+    "tb_prevalence",
+    "nfhs",
+    "census",
+)
+
+# Identifier columns always kept so that 02_clean_merge.py can detect keys.
+KEY_COLUMNS = frozenset(
+    {
+        "state",
+        "state_ut",
+        "stateut",
+        "statenames",
+        "state_name",
+        "state/ut",
+        "name",
+        "district",
+        "district_name",
+        "districts",
+        "country",
+        "year",
+        "fy",
+        "financial_year",
+        "survey_year",
+        "time",
+    }
+)
+
+STAGE_VARIABLES: Dict[str, Tuple[str, ...]] = {
+    "05_state_proxy_model": (
+        "population",
+        "households",
+        "households_with_assets",
+        "literacy_rate_pct",
+        "tb_notified_2025",
+        "tb_notified_2023",
+        "tb_treated_successfully_2023",
+        "tb_notified_2024",
+        "tb_deaths_2024_jan_oct",
+        "improved_sanitation_pct",
+        "clean_cooking_fuel_pct",
+    ),
+    "07_generate_manuscript": ("tb_notified_2025",),
+}
+
+PANEL_REQUIREMENTS: Dict[str, Tuple[str, ...]] = {
+    stage: tuple(panel_column(name) for name in names) for stage, names in STAGE_VARIABLES.items()
+}
+
+# Cleaned source files read directly, bypassing the panel.
+SOURCE_REQUIREMENTS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "05_state_proxy_model": {"tb_prevalence": ("country", "total_tb_survey_cases")},
+}
+
+
+def split_panel_column(column: str) -> Optional[Tuple[str, str]]:
+    """Return ``(dataset, source_column)`` for a prefixed panel column."""
+    matches = [name for name in DATASET_NAMES if column.startswith(f"{name}_")]
+    if not matches:
+        return None
+    dataset = max(matches, key=len)
+    return dataset, column[len(dataset) + 1:]
+
+
+def stage_variables(stage: str) -> Tuple[str, ...]:
+    return STAGE_VARIABLES.get(stage, ())
+
+
+def stage_panel_columns(stage: str) -> Tuple[str, ...]:
+    return PANEL_REQUIREMENTS.get(stage, ())
+
+
+def required_panel_columns(stages: Optional[Iterable[str]] = None) -> Set[str]:
+    selected = PANEL_REQUIREMENTS if stages is None else {s: stage_panel_columns(s) for s in stages}
+    return {column for columns in selected.values() for column in columns}
+
+
+def required_source_columns(dataset: str) -> Set[str]:
+    """Cleaned column names of ``dataset`` that some downstream stage needs."""
+    needed = set(KEY_COLUMNS)
+    for column in required_panel_columns():
+        parts = split_panel_column(column)
+        if parts and parts[0] == dataset:
+            needed.add(parts[1])
+    for sources in SOURCE_REQUIREMENTS.values():
+        needed.update(sources.get(dataset, ()))
+    return needed
@@ -0,0 +1,263 @@
+"""Declarative dtype schemas for the ingested TB data sources.
+
+Each dataset maps its cleaned column names (lower-case, underscores, as
+written by ``clean_generic`` in the ingest scripts) onto one of four kinds:
+
+- ``category``: identifiers such as state, country and year, plus repeated
+  provenance strings;
+- ``count``: integer tallies, stored in the narrowest integer width that fits
+  (nullable when values are missing);
+- ``rate``: continuous measures;
+- ``percent``: percentages, parsed from text such as ``"12.5 %"`` and checked
+  against the 0-100 range.
+
+Continuous columns are held as float32 only when every value survives the
+round trip through float32's shortest decimal form, so written outputs keep
+their digits; otherwise they stay float64. :func:`widen_floats` turns
+float32 columns back into the float64 values they were parsed from, for
+writers whose output dtype would otherwise change.
+
+Rules are regular expressions tried in order; the first full match wins and
+unmatched columns keep their inferred dtype.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+KINDS = ("category", "count", "rate", "percent")
+FLOAT32_EXACT_LIMIT = 2 ** 24
+# A rule is treated as a schema mismatch (column left untouched) when more
+# than this share of non-missing values cannot be parsed.
+MISMATCH_SHARE = 0.5
+
+
+@dataclass(frozen=True)
+class ColumnRule:
+    pattern: str
+    kind: str
+
+    def matches(self, column: str) -> bool:
+        return re.fullmatch(self.pattern, column) is not None
+
+
+@dataclass(frozen=True)
+class DatasetSchema:
+    name: str
+    rules: Tuple[ColumnRule, ...]
+    required: Tuple[str, ...] = field(default_factory=tuple)
+
+    def kind_of(self, column: str) -> Optional[str]:
+        for rule in self.rules:
+            if rule.matches(column):
+                return rule.kind
+        return None
+
+    def parse_dtypes(
+        self, header: Iterable[str], normalize: Callable[[str], str] = str
+    ) -> Dict[str, str]:
+        """dtype mapping for ``pd.read_csv`` covering kinds safe to declare up front."""
+        dtypes: Dict[str, str] = {}
+        for column in header:
+            kind = self.kind_of(normalize(column))
+            if kind == "category":
+                dtypes[column] = "category"
+        return dtypes
+
+
+ID_RULES = (
+    ColumnRule(r"state|state_ut|stateut|statenames|state_name|state/ut|name", "category"),
+    ColumnRule(r"year|fy|financial_year|survey_year|time", "category"),
+    ColumnRule(r"source_dataset|source_file.*", "category"),
+)
+
+SCHEMAS: Dict[str, DatasetSchema] = {
+    "who_tb_global": DatasetSchema(
+        "who_tb_global",
+        (
+            *ID_RULES,
+            ColumnRule(r"country|iso2|iso3|g_whoregion", "category"),
+            ColumnRule(r"iso_numeric|e_pop_num|.*_num(_lo|_hi)?", "count"),
+            ColumnRule(r".*_prct(_lo|_hi)?|cfr_pct(_lo|_hi)?", "percent"),
+            # Case detection ratio bounds legitimately exceed 100.
+            ColumnRule(r".*_100k(_lo|_hi)?|cfr(_lo|_hi)?|c_cdr(_lo|_hi)?", "rate"),
+        ),
+        required=("country", "year"),
+    ),
+    "india_tb_reports": DatasetSchema(
+        "india_tb_reports",
+        (
+            *ID_RULES,
+            ColumnRule(r"percentage_of_.*", "percent"),
+            ColumnRule(r"\d{4}", "count"),
+            ColumnRule(r".*(notified|notification|deaths|treated_successfully).*", "count"),
+        ),
+        required=("stateut",),
+    ),
+    "india_tb_notifications_2025": DatasetSchema(
+        "india_tb_notifications_2025",
+        (*ID_RULES, ColumnRule(r"total_notified_\d{4}", "count")),
+        required=("state", "total_notified_2025"),
+    ),
+    "tb_prevalence": DatasetSchema(
+        "tb_prevalence",
+        (
+            *ID_RULES,
+            ColumnRule(r"who_region|country|bact_or_smear_positive_category", "category"),
+            ColumnRule(r"main_year_of_field_operations", "category"),
+            ColumnRule(r"total_tb_survey_cases.*", "count"),
+            ColumnRule(r"proportion_of_.*", "percent"),
+        ),
+        required=("country", "total_tb_survey_cases"),
+    ),
+    "nfhs": DatasetSchema(
+        "nfhs",
+        (*ID_RULES, ColumnRule(r".*\(%\)", "percent")),
+        required=("state_ut",),
+    ),
+    "census": DatasetSchema(
+        "census",
+        (
+            *ID_RULES,
+            ColumnRule(r".*_pct", "percent"),
+            ColumnRule(r".*_per_1000_.*", "rate"),
+            ColumnRule(r".*", "count"),
+        ),
+        required=("state", "population", "households"),
+    ),
+}
+
+
+def numeric_text(series: pd.Series) -> pd.Series:
+    """Strip thousands separators, percent signs and padding before numeric parsing."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    text = series.astype("string").str.strip()
+    return text.str.replace(r"[,%\s]", "", regex=True).replace({"": pd.NA, "-": pd.NA})
+
+
+def smallest_int_dtype(values: pd.Series, nullable: bool) -> str:
+    low, high = values.min(), values.max()
+    for bits in (8, 16, 32, 64):
+        info = np.iinfo(f"int{bits}")
+        if info.min <= low and high <= info.max:
+            return f"Int{bits}" if nullable else f"int{bits}"
+    return "Float64" if nullable else "float64"
+
+
+def float32_if_lossless(values: pd.Series) -> pd.Series:
+    """``values`` as float32 when float32 keeps every value's decimal digits, else float64."""
+    wide = values.astype("float64")
+    narrow = wide.astype("float32")
+    restored = narrow.to_numpy().astype(str).astype("float64")
+    if np.array_equal(restored, wide.to_numpy(), equal_nan=True):
+        return narrow
+    return wide
+
+
+def widen_floats(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of ``df`` with float32 columns restored to float64 through their shortest decimal form."""
+    narrow = [column for column in df.columns if df[column].dtype == np.float32]
+    if not narrow:
+        return df
+    df = df.copy()
+    for column in narrow:
+        df[column] = df[column].to_numpy().astype(str).astype("float64")
+    return df
+
+
+def cast_count(values: pd.Series) -> pd.Series:
+    present = values.dropna()
+    if present.empty:
+        return values.astype("float32")
+    if not np.all(np.mod(present.to_numpy(dtype="float64"), 1) == 0):
+        too_large = present.abs().max() >= FLOAT32_EXACT_LIMIT
+        return values.astype("float64") if too_large else float32_if_lossless(values)
+    dtype = smallest_int_dtype(present, nullable=bool(values.isna().any()))
+    return values.astype(dtype)
+
+
+def cast_column(
+    series: pd.Series, kind: str, column: str, dataset: str, logger: logging.Logger
+) -> pd.Series:
+    if kind == "category":
+        return series.astype("category")
+    parsed = pd.to_numeric(numeric_text(series), errors="coerce")
+    failed = int((parsed.isna() & series.notna()).sum())
+    present = int(series.notna().sum())
+    if failed:
+        if present and failed / present > MISMATCH_SHARE:
+            logger.warning(
+                "%s.%s: %s of %s values are not %s; leaving column unconverted.",
+                dataset, column, failed, present, kind,
+            )
+            return series
+        logger.warning(
+            "%s.%s: %s value(s) could not be parsed as %s and were set missing.",
+            dataset, column, failed, kind,
+        )
+    if kind == "count":
+        return cast_count(parsed)
+    if kind == "percent":
+        out_of_range = int(((parsed < 0) | (parsed > 100)).sum())
+        if out_of_range:
+            logger.warning(
+                "%s.%s: %s percentage value(s) outside 0-100.", dataset, column, out_of_range
+            )
+    return float32_if_lossless(parsed)
+
+
+def apply_schema(df: pd.DataFrame, dataset: str, logger: logging.Logger) -> pd.DataFrame:
+    """Validate ``df`` against the dataset schema and cast columns to compact dtypes."""
+    schema = SCHEMAS.get(dataset)
+    if schema is None or df.empty:
+        return df
+    missing = [c for c in schema.required if c not in df.columns]
+    if missing:
+        logger.warning(
+            "%s is missing required column(s) %s; leaving dtypes as inferred.",
+            dataset, ", ".join(missing),
+        )
+        return df
+    df = df.copy()
+    for column in df.columns:
+        kind = schema.kind_of(str(column))
+        if kind is not None:
+            df[column] = cast_column(df[column], kind, column, dataset, logger)
+    return df
+
+
+def read_csv_with_schema(
+    path: Path,
+    dataset: str,
+    logger: logging.Logger,
+    usecols: Optional[Callable[[str], bool]] = None,
+) -> pd.DataFrame:
+    """Parse ``path`` with declared dtypes, falling back to inference if they do not hold."""
+    schema = SCHEMAS.get(dataset)
+    if schema is None:
+        return pd.read_csv(path, usecols=usecols)
+    try:
+        header = pd.read_csv(path, nrows=0).columns
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame()
+    dtypes = schema.parse_dtypes(header, lambda c: str(c).strip().lower())
+    if usecols is not None:
+        dtypes = {c: t for c, t in dtypes.items() if usecols(c)}
+    try:
+        df = pd.read_csv(path, dtype=dtypes, usecols=usecols)
+    except (ValueError, TypeError) as exc:
+        logger.warning("Declared dtypes for %s did not parse (%s); inferring instead.", dataset, exc)
+        df = pd.read_csv(path, usecols=usecols)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    return apply_schema(df, dataset, logger)
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return float(df.memory_usage(deep=True).sum()) / 2 ** 20
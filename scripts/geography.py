@@ -0,0 +1,421 @@
+"""Shared resolution of Indian geography names to canonical units.
+
+Every stage that keys data by state goes through :func:`resolve_states` (for
+name columns) or :func:`find_states_in_text` (for free text such as
+abstracts), so one spelling of each state reaches the panel, the PCA/DAG
+outputs and the manuscript metrics.
+
+:class:`NameResolver` maps only the unique values of a column: each is
+looked up in a precompiled alias table keyed on a normalised form of the
+name, unmatched names fall back to fuzzy matching, and the resolved
+mapping is cached on disk so later runs skip both steps. Units may be
+scoped by a parent (e.g. districts within a state), which keeps
+same-named districts apart and limits fuzzy candidates to one parent,
+so the same resolver scales to district and sub-district gazetteers.
+
+Units form a hierarchy, district -> state -> zone (:data:`LEVELS`). District
+frames carry a ``state`` column next to a ``district`` id of the form
+``"District, State"``; :func:`attach_hierarchy` adds the zone, after which
+``rollups.rollup`` can aggregate the frame to any coarser level.
+"""
+from __future__ import annotations
+
+import difflib
+import hashlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+CACHE_DIR = PROJECT_ROOT / "data" / "cache" / "geography"
+GAZETTEER_PATH = PROJECT_ROOT / "data" / "raw" / "gazetteer" / "districts.csv"
+FUZZY_CUTOFF = 0.88
+LEVELS = ("district", "state", "zone")
+
+STATE_CENTROIDS: Dict[str, Tuple[float, float]] = {
+    "Andaman and Nicobar Islands": (11.75, 92.72),
+    "Andhra Pradesh": (15.91, 79.74),
+    "Arunachal Pradesh": (28.21, 94.73),
+    "Assam": (26.20, 92.93),
+    "Bihar": (25.09, 85.31),
+    "Chandigarh": (30.74, 76.79),
+    "Chhattisgarh": (21.27, 82.04),
+    "Dadra and Nagar Haveli": (20.27, 72.90),
+    "Dadra and Nagar Haveli and Daman and Diu": (20.27, 72.90),
+    "Daman and Diu": (20.41, 72.84),
+    "Delhi": (28.61, 77.21),
+    "Goa": (15.49, 73.83),
+    "Gujarat": (22.25, 72.68),
+    "Haryana": (29.06, 76.09),
+    "Himachal Pradesh": (31.10, 77.17),
+    "Jammu and Kashmir": (34.08, 76.83),
+    "Jharkhand": (23.61, 85.28),
+    "Karnataka": (15.32, 75.76),
+    "Kerala": (10.35, 76.27),
+    "Ladakh": (34.15, 77.58),
+    "Lakshadweep": (10.57, 72.64),
+    "Madhya Pradesh": (23.52, 80.83),
+    "Maharashtra": (19.76, 75.71),
+    "Manipur": (24.72, 93.91),
+    "Meghalaya": (25.47, 91.37),
+    "Mizoram": (23.46, 92.69),
+    "Nagaland": (26.16, 94.56),
+    "Odisha": (20.95, 85.10),
+    "Puducherry": (11.91, 79.81),
+    "Punjab": (31.15, 75.34),
+    "Rajasthan": (26.91, 74.80),
+    "Sikkim": (27.53, 88.52),
+    "Tamil Nadu": (11.12, 78.66),
+    "Telangana": (17.87, 79.60),
+    "Tripura": (23.84, 91.29),
+    "Uttar Pradesh": (26.85, 80.91),
+    "Uttarakhand": (30.18, 79.30),
+    "West Bengal": (23.16, 87.84),
+}
+
+CANONICAL_STATES: Tuple[str, ...] = tuple(STATE_CENTROIDS)
+
+# Spelling variants and former names; keys are compared after name_key().
+STATE_ALIASES: Dict[str, str] = {
+    "orissa": "Odisha",
+    "uttaranchal": "Uttarakhand",
+    "pondicherry": "Puducherry",
+    "nct of delhi": "Delhi",
+    "national capital territory of delhi": "Delhi",
+    "maharastra": "Maharashtra",
+    "tamilnadu": "Tamil Nadu",
+    "chattisgarh": "Chhattisgarh",
+    "andaman and nicobar": "Andaman and Nicobar Islands",
+    "a and n islands": "Andaman and Nicobar Islands",
+    "j and k": "Jammu and Kashmir",
+    "dadra and nagar haveli and daman and diu": "Dadra and Nagar Haveli and Daman and Diu",
+    "dnh and dd": "Dadra and Nagar Haveli and Daman and Diu",
+}
+
+# Units merged after the 2011 census, mapped to their successor on request
+# (maps and shapefiles only carry the current boundaries).
+STATE_SUCCESSORS: Dict[str, str] = {
+    "Dadra and Nagar Haveli": "Dadra and Nagar Haveli and Daman and Diu",
+    "Daman and Diu": "Dadra and Nagar Haveli and Daman and Diu",
+}
+
+# Zonal council grouping; island UTs sit with the southern zone.
+STATE_ZONES: Dict[str, str] = {
+    "Chandigarh": "north",
+    "Delhi": "north",
+    "Haryana": "north",
+    "Himachal Pradesh": "north",
+    "Jammu and Kashmir": "north",
+    "Ladakh": "north",
+    "Punjab": "north",
+    "Rajasthan": "north",
+    "Chhattisgarh": "central",
+    "Madhya Pradesh": "central",
+    "Uttar Pradesh": "central",
+    "Uttarakhand": "central",
+    "Bihar": "east",
+    "Jharkhand": "east",
+    "Odisha": "east",
+    "West Bengal": "east",
+    "Dadra and Nagar Haveli": "west",
+    "Dadra and Nagar Haveli and Daman and Diu": "west",
+    "Daman and Diu": "west",
+    "Goa": "west",
+    "Gujarat": "west",
+    "Maharashtra": "west",
+    "Andaman and Nicobar Islands": "south",
+    "Andhra Pradesh": "south",
+    "Karnataka": "south",
+    "Kerala": "south",
+    "Lakshadweep": "south",
+    "Puducherry": "south",
+    "Tamil Nadu": "south",
+    "Telangana": "south",
+    "Arunachal Pradesh": "northeast",
+    "Assam": "northeast",
+    "Manipur": "northeast",
+    "Meghalaya": "northeast",
+    "Mizoram": "northeast",
+    "Nagaland": "northeast",
+    "Sikkim": "northeast",
+    "Tripura": "northeast",
+}
+UNASSIGNED_ZONE = "unassigned"
+
+# Keywords that identify a state in free text; kept narrower than the alias
+# table (e.g. "up" only as a whole word) to avoid false positives.
+STATE_TEXT_KEYWORDS: Dict[str, List[str]] = {
+    "Andhra Pradesh": ["andhra pradesh"],
+    "Arunachal Pradesh": ["arunachal"],
+    "Assam": ["assam"],
+    "Bihar": ["bihar"],
+    "Chhattisgarh": ["chhattisgarh"],
+    "Delhi": ["delhi", "nct of delhi"],
+    "Goa": ["goa"],
+    "Gujarat": ["gujarat"],
+    "Haryana": ["haryana"],
+    "Himachal Pradesh": ["himachal"],
+    "Jharkhand": ["jharkhand"],
+    "Karnataka": ["karnataka"],
+    "Kerala": ["kerala"],
+    "Madhya Pradesh": ["madhya pradesh", "mp"],
+    "Maharashtra": ["maharashtra"],
+    "Manipur": ["manipur"],
+    "Meghalaya": ["meghalaya"],
+    "Mizoram": ["mizoram"],
+    "Nagaland": ["nagaland"],
+    "Odisha": ["odisha", "orissa"],
+    "Punjab": ["punjab"],
+    "Rajasthan": ["rajasthan"],
+    "Sikkim": ["sikkim"],
+    "Tamil Nadu": ["tamil nadu", "tamilnadu"],
+    "Telangana": ["telangana"],
+    "Tripura": ["tripura"],
+    "Uttar Pradesh": ["uttar pradesh", "uttar-pradesh", "up"],
+    "Uttarakhand": ["uttarakhand", "uttaranchal"],
+    "West Bengal": ["west bengal", "wb"],
+    "Andaman and Nicobar Islands": ["andaman", "nicobar"],
+    "Dadra and Nagar Haveli and Daman and Diu": ["dadra", "daman", "diu"],
+    "Puducherry": ["puducherry", "pondicherry"],
+    "Jammu and Kashmir": ["jammu", "kashmir"],
+    "Ladakh": ["ladakh"],
+    "Lakshadweep": ["lakshadweep"],
+    "Chandigarh": ["chandigarh"],
+}
+
+NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def name_key(value: object) -> str:
+    """Case-, punctuation- and ampersand-insensitive lookup key for a place name."""
+    lowered = str(value).lower().replace("&", " and ")
+    return " ".join(NON_ALNUM.sub(" ", lowered).split())
+
+
+class NameResolver:
+    """Map raw place names onto canonical units, scoped by an optional parent."""
+
+    def __init__(
+        self,
+        units: Iterable[Tuple[Optional[str], str]],
+        aliases: Mapping[Tuple[Optional[str], str], str],
+        cache_name: str,
+        successors: Optional[Mapping[str, str]] = None,
+        fuzzy_cutoff: float = FUZZY_CUTOFF,
+        cache_dir: Path = CACHE_DIR,
+    ) -> None:
+        self.successors = dict(successors or {})
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.table: Dict[Tuple[Optional[str], str], str] = {}
+        for parent, name in units:
+            self.table[(parent, name_key(name))] = name
+        for (parent, alias), name in aliases.items():
+            self.table[(parent, name_key(alias))] = name
+        self.candidates: Dict[Optional[str], List[str]] = {}
+        for parent, key in self.table:
+            self.candidates.setdefault(parent, []).append(key)
+        digest = hashlib.sha1(
+            json.dumps(sorted((str(p), k, v) for (p, k), v in self.table.items())).encode("utf-8")
+        ).hexdigest()
+        self.table_version = digest[:16]
+        self.cache_path = cache_dir / f"{cache_name}.json"
+        self.memo: Dict[str, Optional[str]] = self.load_cache()
+        self.dirty = False
+
+    def load_cache(self) -> Dict[str, Optional[str]]:
+        if not self.cache_path.exists():
+            return {}
+        try:
+            payload = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if payload.get("table_version") != self.table_version:
+            return {}
+        return dict(payload.get("resolved", {}))
+
+    def save_cache(self) -> None:
+        if not self.dirty:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(".json.tmp")
+        payload = {"table_version": self.table_version, "resolved": self.memo}
+        tmp_path.write_text(json.dumps(payload, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, self.cache_path)
+        self.dirty = False
+
+    def resolve_one(self, value: object, parent: Optional[str] = None) -> Optional[str]:
+        memo_key = f"{parent or ''}|{value}"
+        if memo_key in self.memo:
+            return self.memo[memo_key]
+        key = name_key(value)
+        resolved = self.table.get((parent, key))
+        if resolved is None and key:
+            close = difflib.get_close_matches(
+                key, self.candidates.get(parent, []), n=1, cutoff=self.fuzzy_cutoff
+            )
+            if close:
+                resolved = self.table[(parent, close[0])]
+        self.memo[memo_key] = resolved
+        self.dirty = True
+        return resolved
+
+    def resolve(
+        self,
+        values: pd.Series,
+        parents: Optional[pd.Series] = None,
+        merge_successors: bool = False,
+        logger: Optional[logging.Logger] = None,
+    ) -> pd.Series:
+        """Resolve a column, touching each distinct (parent, value) pair once.
+
+        Unresolved names are kept, title-cased, so that nothing silently
+        disappears from a merge; they are reported through ``logger``.
+        """
+        if parents is None:
+            codes, uniques = pd.factorize(values)
+            unique_parents: List[Optional[str]] = [None] * len(uniques)
+        else:
+            pairs = pd.MultiIndex.from_arrays([parents.astype(object), values.astype(object)])
+            codes, unique_pairs = pd.factorize(pairs)
+            unique_parents = [p for p, _ in unique_pairs]
+            uniques = pd.Index([v for _, v in unique_pairs], dtype=object)
+        resolved: List[object] = []
+        unresolved: List[str] = []
+        for parent, raw in zip(unique_parents, uniques):
+            name = self.resolve_one(raw, parent)
+            if name is None:
+                unresolved.append(str(raw))
+                name = " ".join(str(raw).split()).title()
+            elif merge_successors:
+                name = self.successors.get(name, name)
+            resolved.append(name)
+        self.save_cache()
+        if unresolved and logger is not None:
+            logger.warning("Unrecognised place names kept as-is: %s", ", ".join(sorted(unresolved)))
+        lookup = np.array(resolved + [np.nan], dtype=object)
+        result = lookup[np.where(codes < 0, len(resolved), codes)]
+        return pd.Series(result, index=values.index, name=values.name)
+
+
+STATE_RESOLVER: Optional[NameResolver] = None
+DISTRICT_RESOLVER: Optional[NameResolver] = None
+STATE_TEXT_PATTERNS: Dict[str, re.Pattern] = {}
+
+
+def state_resolver() -> NameResolver:
+    global STATE_RESOLVER
+    if STATE_RESOLVER is None:
+        STATE_RESOLVER = NameResolver(
+            units=[(None, name) for name in CANONICAL_STATES],
+            aliases={(None, alias): name for alias, name in STATE_ALIASES.items()},
+            cache_name="state_names",
+            successors=STATE_SUCCESSORS,
+        )
+    return STATE_RESOLVER
+
+
+def resolve_states(
+    values: pd.Series,
+    logger: Optional[logging.Logger] = None,
+    merge_successors: bool = False,
+) -> pd.Series:
+    """Canonical state/UT names for a column of raw names."""
+    return state_resolver().resolve(values, merge_successors=merge_successors, logger=logger)
+
+
+def state_zones(states: pd.Series) -> pd.Series:
+    """Zone of each canonical state name; names outside the table are ``unassigned``."""
+    return states.astype(object).map(STATE_ZONES).fillna(UNASSIGNED_ZONE)
+
+
+def level_suffix(level: str) -> str:
+    """File-name suffix for outputs at ``level``; state-level outputs keep their historic names."""
+    if level not in LEVELS:
+        raise ValueError(f"Unknown geographic level '{level}'")
+    return "" if level == "state" else f"_{level}"
+
+
+def level_path(path: Path, level: str) -> Path:
+    """``path`` with the level suffix inserted before its extension."""
+    return path.with_name(f"{path.stem}{level_suffix(level)}{path.suffix}")
+
+
+def attach_hierarchy(frame: pd.DataFrame) -> pd.DataFrame:
+    """Add the zone of each row's state, so the frame can roll up to every coarser level."""
+    if "state" not in frame.columns or "zone" in frame.columns:
+        return frame
+    frame = frame.copy()
+    frame["zone"] = state_zones(frame["state"]).to_numpy()
+    return frame
+
+
+def load_district_gazetteer(path: Path = GAZETTEER_PATH) -> pd.DataFrame:
+    """``state``/``district`` rows, with ``;``-separated spellings in an optional ``aliases`` column."""
+    if not path.exists() or path.stat().st_size == 0:
+        return pd.DataFrame(columns=["state", "district", "aliases"])
+    gazetteer = pd.read_csv(path, dtype=str)
+    gazetteer.columns = [str(c).strip().lower() for c in gazetteer.columns]
+    if "aliases" not in gazetteer.columns:
+        gazetteer["aliases"] = ""
+    gazetteer["state"] = resolve_states(gazetteer["state"])
+    return gazetteer
+
+
+def district_resolver() -> Optional[NameResolver]:
+    global DISTRICT_RESOLVER
+    if DISTRICT_RESOLVER is None:
+        gazetteer = load_district_gazetteer()
+        if gazetteer.empty:
+            return None
+        aliases: Dict[Tuple[Optional[str], str], str] = {}
+        for state, district, spellings in gazetteer[["state", "district", "aliases"]].itertuples(index=False):
+            for alias in str(spellings if pd.notna(spellings) else "").split(";"):
+                if alias.strip():
+                    aliases[(state, alias)] = district
+        DISTRICT_RESOLVER = NameResolver(
+            units=gazetteer[["state", "district"]].itertuples(index=False, name=None),
+            aliases=aliases,
+            cache_name="district_names",
+        )
+    return DISTRICT_RESOLVER
+
+
+def resolve_districts(
+    districts: pd.Series, states: pd.Series, logger: Optional[logging.Logger] = None
+) -> pd.Series:
+    """District ids (``"District, State"``) for raw district names within canonical states.
+
+    Without a gazetteer at ``GAZETTEER_PATH`` names are only tidied, not matched.
+    """
+    resolver = district_resolver()
+    if resolver is None:
+        names = districts.astype("string").str.split().str.join(" ").str.title()
+    else:
+        names = resolver.resolve(districts, parents=states, logger=logger).astype("string")
+    return (names + ", " + states.astype("string")).astype(object)
+
+
+def find_states_in_text(texts: pd.Series) -> pd.Series:
+    """State detected in each text, or an empty string when none is found.
+
+    States are tried in ``STATE_TEXT_KEYWORDS`` order, each as one compiled
+    pattern applied to the whole column.
+    """
+    if not STATE_TEXT_PATTERNS:
+        for name, keywords in STATE_TEXT_KEYWORDS.items():
+            alternation = "|".join(re.escape(k) for k in keywords)
+            STATE_TEXT_PATTERNS[name] = re.compile(rf"\b(?:{alternation})\b")
+    lowered = texts.fillna("").astype(str).str.lower()
+    names = list(STATE_TEXT_PATTERNS)
+    hits = np.column_stack(
+        [lowered.str.contains(pattern).to_numpy(dtype=bool) for pattern in STATE_TEXT_PATTERNS.values()]
+    )
+    first = hits.argmax(axis=1)
+    detected = np.where(hits.any(axis=1), np.array(names, dtype=object)[first], "")
+    return pd.Series(detected, index=texts.index, dtype=object)
@@ -0,0 +1,56 @@
+"""Memory-bounded readers for large raw sources used by the ingestion scripts."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+CSV_CHUNK_ROWS = 100_000
+
+
+def normalize_header(name: object) -> str:
+    return str(name).strip().lower()
+
+
+def resolve_columns(header: Iterable[object], wanted: Optional[Iterable[str]]) -> Optional[List[str]]:
+    """Map normalised column names onto the raw header, preserving header order."""
+    if wanted is None:
+        return None
+    wanted_set = {normalize_header(c) for c in wanted}
+    return [c for c in header if normalize_header(c) in wanted_set]
+
+
+def stream_filter_csv(
+    path: Path,
+    filter_column: str,
+    filter_value: str,
+    columns: Optional[Iterable[str]] = None,
+    chunksize: int = CSV_CHUNK_ROWS,
+) -> pd.DataFrame:
+    """Read rows whose ``filter_column`` equals ``filter_value`` (case-insensitive).
+
+    The file is parsed in chunks restricted to the projected columns and each
+    chunk is filtered before the next is read, so peak memory follows one chunk
+    plus the matching slice rather than the whole file. Per-chunk dtype
+    inference is reconciled by the final concat (e.g. int chunks with a later
+    missing value become float, as a whole-file read would).
+    """
+    header = list(pd.read_csv(path, nrows=0).columns)
+    key_matches = resolve_columns(header, [filter_column])
+    if not key_matches:
+        raise KeyError(f"{path.name} has no '{filter_column}' column to filter on")
+    key = key_matches[0]
+    selected = resolve_columns(header, columns)
+    if selected is not None and key not in selected:
+        selected = [key, *selected]
+    target = filter_value.strip().lower()
+
+    pieces: List[pd.DataFrame] = []
+    for chunk in pd.read_csv(path, usecols=selected, chunksize=chunksize):
+        mask = chunk[key].astype("string").str.lower() == target
+        if mask.any():
+            pieces.append(chunk.loc[mask])
+    if not pieces:
+        return pd.DataFrame(columns=selected if selected is not None else header)
+    return pd.concat(pieces, ignore_index=True)
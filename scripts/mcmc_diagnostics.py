@@ -0,0 +1,162 @@
+"""Convergence diagnostics and convergence-targeted sampling for the MCMC stages.
+
+Draws are arrays shaped (chain, draw, ...) and every diagnostic is
+vectorised over the trailing dimensions:
+
+* :func:`split_rhat` is the rank-normalised split-R-hat of Vehtari et al.
+  (2021), the larger of the bulk and folded (tail) values.
+* :func:`ess_bulk` is the effective sample size of the rank-normalised split
+  chains, and :func:`ess_tail` the smaller ESS of the 5% and 95% quantile
+  indicators. Autocorrelations come from an FFT and are truncated with
+  Geyer's initial monotone sequence.
+
+:func:`sample_until_converged` draws a NumPyro ``MCMC`` in chunks of
+``SamplingTargets.chunk`` draws per chain. Warmup runs only once; each later
+chunk continues from the last state. It stops as soon as every monitored
+quantity meets the R-hat and ESS targets, or when ``max_draws`` is reached.
+The diagnostics are recomputed on the accumulated draws after each chunk,
+which costs milliseconds next to the sampling itself.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import stats
+
+TAIL_QUANTILES = (0.05, 0.95)
+
+
+@dataclass
+class SamplingTargets:
+    r_hat: float = 1.01
+    ess_bulk: float = 400.0
+    ess_tail: float = 400.0
+    chunk: int = 500
+    max_draws: int = 8000
+
+
+def split_chains(draws: np.ndarray) -> np.ndarray:
+    """Halve every chain, dropping the middle draw of odd-length chains."""
+    half = draws.shape[1] // 2
+    return np.concatenate([draws[:, :half], draws[:, -half:]], axis=0)
+
+
+def z_scale(draws: np.ndarray) -> np.ndarray:
+    """Rank-normalise over all chains and draws, separately for each trailing index."""
+    chains, n = draws.shape[:2]
+    flat = draws.reshape(chains * n, -1)
+    ranks = stats.rankdata(flat, axis=0)
+    return stats.norm.ppf((ranks - 0.375) / (len(flat) + 0.25)).reshape(draws.shape)
+
+
+def _rhat(draws: np.ndarray) -> np.ndarray:
+    n = draws.shape[1]
+    within = draws.var(axis=1, ddof=1).mean(axis=0)
+    between = n * draws.mean(axis=1).var(axis=0, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.sqrt(((n - 1) / n * within + between / n) / within)
+
+
+def split_rhat(draws: np.ndarray) -> np.ndarray:
+    split = split_chains(draws)
+    folded = np.abs(split - np.median(split, axis=(0, 1)))
+    return np.maximum(_rhat(z_scale(split)), _rhat(z_scale(folded)))
+
+
+def _autocovariance(draws: np.ndarray) -> np.ndarray:
+    """Biased autocovariance of each chain along the draw axis."""
+    n = draws.shape[1]
+    centred = draws - draws.mean(axis=1, keepdims=True)
+    size = 1 << (2 * n - 1).bit_length()
+    spectrum = np.fft.rfft(centred, n=size, axis=1)
+    return np.fft.irfft(spectrum * np.conjugate(spectrum), n=size, axis=1)[:, :n] / n
+
+
+def _ess(draws: np.ndarray) -> np.ndarray:
+    chains, n = draws.shape[:2]
+    acov = _autocovariance(draws)
+    chain_var = acov[:, 0] * n / (n - 1)
+    mean_var = chain_var.mean(axis=0)
+    var_plus = mean_var * (n - 1) / n
+    if chains > 1:
+        var_plus = var_plus + draws.mean(axis=1).var(axis=0, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rho = 1.0 - (mean_var - acov.mean(axis=0)) / var_plus
+    rho[0] = 1.0
+    # Geyer: sum autocorrelation pairs while positive, forced non-increasing.
+    pairs = rho[: 2 * (n // 2)].reshape(n // 2, 2, *rho.shape[1:]).sum(axis=1)
+    positive = np.cumprod(pairs > 0, axis=0).astype(bool)
+    monotone = np.minimum.accumulate(np.where(positive, pairs, np.inf), axis=0)
+    tau = -1.0 + 2.0 * np.where(positive, monotone, 0.0).sum(axis=0)
+    total = chains * n
+    tau = np.maximum(tau, 1.0 / np.log10(total))
+    return np.where(np.isfinite(var_plus) & (var_plus > 0), total / tau, np.nan)
+
+
+def ess_bulk(draws: np.ndarray) -> np.ndarray:
+    return _ess(z_scale(split_chains(draws)))
+
+
+def ess_tail(draws: np.ndarray) -> np.ndarray:
+    split = split_chains(draws)
+    quantiles = np.quantile(split, TAIL_QUANTILES, axis=(0, 1))
+    return np.minimum(*[_ess((split <= q).astype(float)) for q in quantiles])
+
+
+def diagnostics(draws: np.ndarray) -> Dict[str, np.ndarray]:
+    """Split-R-hat, bulk ESS and tail ESS of (chain, draw, ...) ``draws``."""
+    return {"r_hat": split_rhat(draws), "ess_bulk": ess_bulk(draws), "ess_tail": ess_tail(draws)}
+
+
+def targets_met(diag: Dict[str, np.ndarray], targets: SamplingTargets) -> bool:
+    return bool(
+        np.all(diag["r_hat"] <= targets.r_hat)
+        and np.all(diag["ess_bulk"] >= targets.ess_bulk)
+        and np.all(diag["ess_tail"] >= targets.ess_tail)
+    )
+
+
+def sample_until_converged(
+    mcmc,
+    rng_key,
+    monitor: Callable[[Dict[str, np.ndarray]], np.ndarray],
+    targets: SamplingTargets,
+    logger: logging.Logger,
+    init_params: Optional[Dict[str, object]] = None,
+    **model_kwargs,
+) -> Tuple[Dict[str, np.ndarray], Dict[str, float]]:
+    """Sample ``mcmc`` chunk by chunk until ``monitor(samples)`` meets ``targets``.
+
+    ``mcmc`` must be built with ``num_samples=targets.chunk``; ``monitor``
+    maps the accumulated (chain, draw, ...) samples to a (chain, draw, k)
+    array of the quantities that have to converge. ``init_params`` only
+    seeds the first chunk. Returns the samples and
+    the worst R-hat and ESS over the monitored quantities.
+    """
+    chunks: List[Dict[str, np.ndarray]] = []
+    while True:
+        mcmc.run(rng_key, init_params=None if chunks else init_params, **model_kwargs)
+        chunks.append({name: np.asarray(value) for name, value in mcmc.get_samples(group_by_chain=True).items()})
+        mcmc.post_warmup_state = mcmc.last_state
+        rng_key = mcmc.post_warmup_state.rng_key
+        samples = {name: np.concatenate([chunk[name] for chunk in chunks], axis=1) for name in chunks[0]}
+        diag = diagnostics(monitor(samples))
+        draws = len(chunks) * targets.chunk
+        worst = {
+            "draws": draws,
+            "r_hat": float(np.nanmax(diag["r_hat"])),
+            "ess_bulk": float(np.nanmin(diag["ess_bulk"])),
+            "ess_tail": float(np.nanmin(diag["ess_tail"])),
+        }
+        logger.info(
+            f"{draws} draws per chain: max R-hat {worst['r_hat']:.3f}, "
+            f"min bulk ESS {worst['ess_bulk']:.0f}, min tail ESS {worst['ess_tail']:.0f}"
+        )
+        if targets_met(diag, targets):
+            return samples, worst
+        if draws + targets.chunk > targets.max_draws:
+            logger.warning(f"Convergence targets not met after {draws} draws per chain; stopping.")
+            return samples, worst
@@ -0,0 +1,118 @@
+"""JAX runtime settings shared by the NumPyro MCMC stages.
+
+NUTS kernels are compiled for the exact shapes of their inputs, so a
+quarterly refresh that adds one study would otherwise recompile every model.
+Study arrays are therefore padded up to a bucketed size (:func:`study_bucket`)
+and masked, and :func:`enable_compilation_cache` points JAX's persistent
+compilation cache at ``data/cache/jax/`` so compiled kernels are reused across
+processes. :func:`compile_timer` splits a run's wall time into compilation
+(tracing, lowering and XLA compilation, including cache lookups) and
+sampling.
+
+Chains run one of three ways: ``"parallel"`` maps them over host CPU devices
+(XLA exposes a single CPU device unless ``XLA_FLAGS`` sets
+``--xla_force_host_platform_device_count``), ``"vectorized"`` batches them
+on one device, and ``"sequential"`` runs them one after another.
+:func:`configure_chain_method` picks parallel when every chain can have its
+own core and vectorized otherwise.
+"""
+from __future__ import annotations
+
+import os
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+try:
+    import jax
+    import jax.monitoring
+except ImportError:
+    jax = None
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+JAX_CACHE_DIR = PROJECT_ROOT / "data" / "cache" / "jax"
+MIN_STUDY_BUCKET = 8
+COMPILE_EVENT_PREFIX = "/jax/core/compile/"
+CHAIN_METHODS = ("parallel", "vectorized", "sequential")
+HOST_DEVICE_FLAG = "--xla_force_host_platform_device_count"
+
+_compile_seconds = [0.0]
+_listening = [False]
+
+
+def study_bucket(n: int) -> int:
+    """Padded study dimension for ``n`` studies: the next power of two, at least 8."""
+    return max(MIN_STUDY_BUCKET, 1 << max(0, int(n) - 1).bit_length())
+
+
+def enable_compilation_cache(path: Path = JAX_CACHE_DIR) -> bool:
+    """Persist every compiled kernel under ``path``; returns False without JAX."""
+    if jax is None:
+        return False
+    path.mkdir(parents=True, exist_ok=True)
+    jax.config.update("jax_compilation_cache_dir", str(path))
+    jax.config.update("jax_persistent_cache_min_compile_time_secs", 0.0)
+    jax.config.update("jax_persistent_cache_min_entry_size_bytes", 0)
+    return True
+
+
+def available_cores() -> int:
+    """CPU cores this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def choose_chain_method(num_chains: int, cores: Optional[int] = None) -> str:
+    """``"parallel"`` when every chain gets its own core, else ``"vectorized"``."""
+    cores = cores or available_cores()
+    if num_chains < 2:
+        return "sequential"
+    return "parallel" if cores >= num_chains else "vectorized"
+
+
+def set_host_device_count(n: int) -> None:
+    """Ask XLA for ``n`` CPU devices; only effective before JAX first touches its backend."""
+    flags = re.sub(rf"{HOST_DEVICE_FLAG}=\S+", "", os.environ.get("XLA_FLAGS", "")).split()
+    os.environ["XLA_FLAGS"] = " ".join([f"{HOST_DEVICE_FLAG}={n}"] + flags)
+
+
+def configure_chain_method(requested: str, num_chains: int) -> str:
+    """Resolve ``"auto"`` and expose enough host devices for parallel chains.
+
+    Falls back to vectorized chains when the JAX backend was already
+    initialised with fewer devices than chains.
+    """
+    method = choose_chain_method(num_chains) if requested == "auto" else requested
+    if method not in CHAIN_METHODS:
+        raise ValueError(f"Unknown chain method {requested!r}")
+    if method == "parallel" and jax is not None:
+        set_host_device_count(num_chains)
+        if jax.local_device_count() < num_chains:
+            method = "vectorized"
+    return method
+
+
+def _record_compile(event: str, duration: float, **kwargs: object) -> None:
+    if event.startswith(COMPILE_EVENT_PREFIX):
+        _compile_seconds[0] += duration
+
+
+@contextmanager
+def compile_timer() -> Iterator[Dict[str, float]]:
+    """Yield a dict filled on exit with ``wall``, ``compile`` and ``sample`` seconds."""
+    if jax is not None and not _listening[0]:
+        jax.monitoring.register_event_duration_secs_listener(_record_compile)
+        _listening[0] = True
+    timing: Dict[str, float] = {}
+    compiled_before = _compile_seconds[0]
+    start = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing["wall"] = time.perf_counter() - start
+        timing["compile"] = _compile_seconds[0] - compiled_before
+        timing["sample"] = max(0.0, timing["wall"] - timing["compile"])
@@ -0,0 +1,159 @@
+"""Warm starts for the joint NumPyro meta-analysis from the previous run's posterior.
+
+After a full NUTS run of the joint model, :func:`save_warm_start` keeps the
+adapted step size and diagonal inverse mass matrix (averaged over chains),
+each delay type's posterior mean and sd of mu and tau, and a thinned set
+of posterior draws keyed by study ID. It writes them to
+``data/processed/bayesian_posterior/warm_start.json`` together with the
+living-review quarter.
+
+The next run can reuse the adaptation with a short, step-size-only warmup
+and start its chains from those draws (:func:`initial_params`). This is
+only valid when the layout of the unconstrained parameters is unchanged
+(same delay types and padded study width) and the new data leave the
+posterior close to the stored one. :func:`posterior_shift` measures the
+change; the caller decides.
+"""
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from posterior_store import POSTERIOR_DIR
+
+WARM_START_PATH = POSTERIOR_DIR / "warm_start.json"
+WARM_START_VERSION = 1
+STORED_DRAWS = 200
+WARM_WARMUP = 200
+# Fall back to a full warmup beyond these changes in any delay type's mu or tau.
+MAX_MEAN_SHIFT_SD = 0.5
+MAX_SD_RATIO = 1.5
+
+
+def adaptation_state(mcmc) -> Dict[str, object]:
+    """Chain-averaged step size and inverse mass matrix of a finished NUTS run."""
+    adapt = mcmc.last_state.adapt_state
+    matrices = {
+        "|".join(sites): np.asarray(matrix, dtype=float).reshape(-1, np.shape(matrix)[-1]).mean(axis=0).tolist()
+        for sites, matrix in adapt.inverse_mass_matrix.items()
+    }
+    return {"step_size": float(np.mean(adapt.step_size)), "inverse_mass_matrix": matrices}
+
+
+def inverse_mass_matrix(state: Dict[str, object]) -> Dict[tuple, np.ndarray]:
+    """The stored inverse mass matrix in the form ``NUTS(inverse_mass_matrix=...)`` takes."""
+    return {
+        tuple(key.split("|")): np.asarray(values) for key, values in state["inverse_mass_matrix"].items()
+    }
+
+
+def save_warm_start(
+    quarter: str,
+    labels: List[str],
+    study_ids: List[List[str]],
+    shape: tuple,
+    adaptation: Dict[str, object],
+    samples: Dict[str, np.ndarray],
+    seed: int = 42,
+    path: Path = WARM_START_PATH,
+) -> None:
+    """Store adaptation, per-delay-type summaries and thinned draws of the joint run.
+
+    ``samples`` are the joint model's (chain, draw, rows, ...) draws of mu,
+    tau and theta_z, rows in the order of ``labels``.
+    """
+    rng = np.random.default_rng(seed)
+    mu = np.asarray(samples["mu"])[..., 0].reshape(-1, shape[0])
+    tau = np.asarray(samples["tau"])[..., 0].reshape(-1, shape[0])
+    theta_z = np.asarray(samples["theta_z"]).reshape(-1, *shape)
+    keep = rng.choice(len(mu), size=min(STORED_DRAWS, len(mu)), replace=False)
+    delay_types = {}
+    for row, (label, ids) in enumerate(zip(labels, study_ids)):
+        delay_types[label] = {
+            "mu_mean": float(mu[:, row].mean()),
+            "mu_sd": float(mu[:, row].std()),
+            "tau_mean": float(tau[:, row].mean()),
+            "tau_sd": float(tau[:, row].std()),
+            "study_ids": list(ids),
+            "mu_draws": mu[keep, row].tolist(),
+            "tau_draws": tau[keep, row].tolist(),
+            "theta_z_draws": theta_z[keep, row, :len(ids)].tolist(),
+        }
+    payload = {
+        "version": WARM_START_VERSION,
+        "quarter": quarter,
+        "labels": list(labels),
+        "shape": list(shape),
+        **adaptation,
+        "delay_types": delay_types,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def load_warm_start(path: Path = WARM_START_PATH) -> Optional[Dict[str, object]]:
+    if not path.exists():
+        return None
+    state = json.loads(path.read_text(encoding="utf-8"))
+    return state if state.get("version") == WARM_START_VERSION else None
+
+
+def incompatibility(state: Dict[str, object], labels: List[str], shape: tuple) -> Optional[str]:
+    """Why the stored adaptation cannot be reused for ``labels`` at ``shape``, or None."""
+    if state["labels"] != list(labels):
+        return "delay types changed"
+    if tuple(state["shape"]) != tuple(shape):
+        return f"padded shape changed from {tuple(state['shape'])} to {tuple(shape)}"
+    return None
+
+
+def posterior_shift(state: Dict[str, object], current: Dict[str, Dict[str, float]]) -> float:
+    """Largest change of any delay type's mu or tau, in previous sds or as an sd ratio excess.
+
+    ``current`` maps labels to mu/tau means and sds of the new posterior.
+    The result is compared with 1: mean shifts are scaled by
+    ``MAX_MEAN_SHIFT_SD`` and sd ratios by ``MAX_SD_RATIO``.
+    """
+    worst = 0.0
+    for label, new in current.items():
+        old = state["delay_types"][label]
+        for name in ("mu", "tau"):
+            shift = abs(new[f"{name}_mean"] - old[f"{name}_mean"]) / old[f"{name}_sd"] / MAX_MEAN_SHIFT_SD
+            ratio = max(new[f"{name}_sd"] / old[f"{name}_sd"], old[f"{name}_sd"] / new[f"{name}_sd"])
+            worst = max(worst, shift, np.log(ratio) / np.log(MAX_SD_RATIO))
+    return worst
+
+
+def initial_params(
+    state: Dict[str, object],
+    labels: List[str],
+    study_ids: List[List[str]],
+    shape: tuple,
+    num_chains: int,
+    seed: int = 42,
+) -> Dict[str, np.ndarray]:
+    """Unconstrained per-chain starting points drawn from the stored posterior.
+
+    Studies are matched by ID; new studies and padding start at z = 0.
+    """
+    rng = np.random.default_rng(seed)
+    mu = np.zeros((num_chains, shape[0], 1))
+    log_tau = np.zeros((num_chains, shape[0], 1))
+    theta_z = np.zeros((num_chains, *shape))
+    for row, (label, ids) in enumerate(zip(labels, study_ids)):
+        stored = state["delay_types"][label]
+        pick = rng.choice(len(stored["mu_draws"]), size=num_chains, replace=False)
+        mu[:, row, 0] = np.asarray(stored["mu_draws"])[pick]
+        log_tau[:, row, 0] = np.log(np.asarray(stored["tau_draws"])[pick])
+        position = {sid: i for i, sid in enumerate(stored["study_ids"])}
+        z_draws = np.asarray(stored["theta_z_draws"])[pick]
+        for j, sid in enumerate(ids):
+            if sid in position:
+                theta_z[:, row, j] = z_draws[:, position[sid]]
+    return {"mu": mu, "tau": log_tau, "theta_z": theta_z}
@@ -0,0 +1,376 @@
+"""Grouped random-effects pooling of study-level delay estimates.
+
+``04_meta_analysis_delays.py`` pools every delay type, and every subgroup of
+every delay type, in one pass. :func:`study_effects` stacks the extracted
+table into one row per (study, delay type) with its within-study variance.
+:func:`pool_groups` sorts those rows by group once and runs
+DerSimonian-Laird on every group simultaneously with segmented sums
+(``np.add.reduceat``), so thousands of (delay type x state / setting / year)
+pools cost a handful of array operations rather than a Python loop.
+Besides DerSimonian-Laird, tau^2 can be estimated by REML or Paule-Mandel,
+iterated for all groups at once, and intervals can use the
+Hartung-Knapp-Sidik-Jonkman (HKSJ) t-based variance instead of ``z``.
+
+:func:`influence_analysis` (leave-one-out) and :func:`cumulative_analysis`
+(studies added in publication order) get every fold's Q and tau^2 from
+segment totals and prefix sums of the weighted sufficient statistics
+instead of refitting each fold. Only the final random-effects reweighting,
+which depends on the fold's own tau^2, touches each fold's studies.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+Z_95 = 1.96
+TAU_METHODS = ("DL", "REML", "PM")
+ITERATIVE_METHODS = ("REML", "PM")
+INTERVALS = ("z", "hksj")
+POOL_COLUMNS = ["effect", "se", "ci_low", "ci_high", "tau_sq", "q", "k"]
+STUDY_COLUMNS = ["pmid", "state", "study_year", "setting_public_private", "sample_size"]
+# Studies without a usable standard error get unit variance, as before.
+DEFAULT_VARIANCE = 1.0
+
+
+def standard_errors(df: pd.DataFrame, column: str) -> pd.Series:
+    """Reported ``<delay>_se``, else ``<delay>_sd / sqrt(sample_size)``, else NaN."""
+    se_column = column.replace("_days", "_se")
+    sd_column = column.replace("_days", "_sd")
+    se = (
+        pd.to_numeric(df[se_column], errors="coerce")
+        if se_column in df.columns
+        else pd.Series(np.nan, index=df.index)
+    )
+    if sd_column in df.columns and "sample_size" in df.columns:
+        n = pd.to_numeric(df["sample_size"], errors="coerce")
+        from_sd = pd.to_numeric(df[sd_column], errors="coerce") / np.sqrt(n.where(n > 0))
+        se = se.fillna(from_sd)
+    return se.astype(float)
+
+
+def study_effects(df: pd.DataFrame, delay_types: Mapping[str, str]) -> pd.DataFrame:
+    """One row per (study, delay type) with ``effect`` and ``variance``.
+
+    ``delay_type`` is categorical in ``delay_types`` order so grouped results
+    keep that order.
+    """
+    keys = [c for c in STUDY_COLUMNS if c in df.columns]
+    frames: List[pd.DataFrame] = []
+    for column, label in delay_types.items():
+        if column not in df.columns:
+            continue
+        effect = pd.to_numeric(df[column], errors="coerce")
+        observed = effect.notna()
+        variance = standard_errors(df.loc[observed], column) ** 2
+        variance = variance.mask(variance.isna() | (variance == 0), DEFAULT_VARIANCE)
+        frame = df.loc[observed, keys].copy()
+        frame.insert(0, "delay_column", column)
+        frame.insert(1, "delay_type", label)
+        frame["effect"] = effect[observed].astype(float)
+        frame["variance"] = variance.astype(float)
+        frames.append(frame)
+    columns = ["delay_column", "delay_type", *keys, "effect", "variance"]
+    long = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    long["delay_type"] = pd.Categorical(long["delay_type"], categories=list(delay_types.values()))
+    return long
+
+
+def subgroup_levels(long: pd.DataFrame, moderators: Sequence[str]) -> pd.DataFrame:
+    """Stack ``long`` once per moderator as (``moderator``, ``level``) rows, dropping missing levels."""
+    moderators = [m for m in moderators if m in long.columns]
+    frames: List[pd.DataFrame] = []
+    for moderator in moderators:
+        values = long[moderator]
+        numeric = pd.to_numeric(values, errors="coerce")
+        if numeric.notna().all() and (numeric % 1 == 0).all():
+            values = numeric.astype("Int64")
+        present = values.notna()
+        frame = long.loc[present, ["delay_type", "effect", "variance"]].copy()
+        frame.insert(1, "moderator", moderator)
+        frame.insert(2, "level", values[present].astype(str).str.strip().to_numpy())
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=["delay_type", "moderator", "level", "effect", "variance"])
+    stacked = pd.concat(frames, ignore_index=True)
+    stacked["moderator"] = pd.Categorical(stacked["moderator"], categories=moderators)
+    return stacked
+
+
+def segment_starts(codes: np.ndarray) -> np.ndarray:
+    """First position of each run in a sorted code array."""
+    if len(codes) == 0:
+        return np.zeros(0, dtype=np.intp)
+    return np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+
+def pool_sums(values: np.ndarray, pool: np.ndarray, n_pools: int) -> np.ndarray:
+    return np.bincount(pool, weights=values, minlength=n_pools)
+
+
+def iterate_tau_sq(
+    effects: np.ndarray,
+    variances: np.ndarray,
+    pool: np.ndarray,
+    n_pools: int,
+    method: str,
+    tau_sq: np.ndarray,
+    tol: float = 1e-10,
+    max_iter: int = 200,
+) -> np.ndarray:
+    """REML or Paule-Mandel tau^2 of every pool, iterated together from ``tau_sq``.
+
+    ``pool[i]`` is the pool that study ``i`` belongs to. REML uses Fisher
+    scoring on the restricted likelihood; Paule-Mandel uses Newton steps on
+    the generalised Q statistic, whose derivative in tau^2 is
+    ``-sum(w^2 (y - mu)^2)``. Both are truncated at zero.
+    """
+    if method not in ITERATIVE_METHODS:
+        raise ValueError(f"Unknown tau^2 estimator '{method}'")
+    k = np.bincount(pool, minlength=n_pools)
+    active = k > 1
+    tau_sq = np.where(active, tau_sq, 0.0)
+    for _ in range(max_iter):
+        weights = 1 / (variances + tau_sq[pool])
+        sum_w = pool_sums(weights, pool, n_pools)
+        sum_w2 = pool_sums(weights ** 2, pool, n_pools)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            resid = effects - (pool_sums(weights * effects, pool, n_pools) / sum_w)[pool]
+            sum_w2r2 = pool_sums((weights * resid) ** 2, pool, n_pools)
+            if method == "REML":
+                sum_w3 = pool_sums(weights ** 3, pool, n_pools)
+                trace_p = sum_w - sum_w2 / sum_w
+                trace_pp = sum_w2 - 2 * sum_w3 / sum_w + (sum_w2 / sum_w) ** 2
+                step = (sum_w2r2 - trace_p) / trace_pp
+            else:
+                q = pool_sums(weights * resid ** 2, pool, n_pools)
+                step = np.where(sum_w2r2 > 0, (q - (k - 1)) / sum_w2r2, -tau_sq)
+        updated = np.where(active, np.maximum(0.0, tau_sq + np.nan_to_num(step)), 0.0)
+        done = np.abs(updated - tau_sq) <= tol * np.maximum(1.0, tau_sq)
+        tau_sq = updated
+        if done.all():
+            break
+    return tau_sq
+
+
+def random_effects(
+    effects: np.ndarray,
+    variances: np.ndarray,
+    pool: np.ndarray,
+    n_pools: int,
+    tau_sq: np.ndarray,
+    interval: str = "z",
+) -> Dict[str, np.ndarray]:
+    """Random-effects estimate of every pool with a normal (``z``) or HKSJ (``hksj``) interval."""
+    if interval not in INTERVALS:
+        raise ValueError(f"Unknown interval '{interval}'")
+    weights = 1 / (variances + tau_sq[pool])
+    sum_w = pool_sums(weights, pool, n_pools)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pooled = pool_sums(weights * effects, pool, n_pools) / sum_w
+        pooled_se = np.sqrt(1 / sum_w)
+        critical = np.full(n_pools, Z_95)
+        if interval == "hksj":
+            df = np.bincount(pool, minlength=n_pools) - 1
+            q = pool_sums(weights * (effects - pooled[pool]) ** 2, pool, n_pools)
+            pooled_se = np.where(df > 0, np.sqrt(q / np.maximum(df, 1) / sum_w), np.nan)
+            critical = np.where(df > 0, stats.t.ppf(0.975, np.maximum(df, 1)), np.nan)
+    return {
+        "effect": pooled,
+        "se": pooled_se,
+        "ci_low": pooled - critical * pooled_se,
+        "ci_high": pooled + critical * pooled_se,
+    }
+
+
+def pool_segments(
+    effects: np.ndarray,
+    variances: np.ndarray,
+    starts: np.ndarray,
+    method: str = "DL",
+    interval: str = "z",
+) -> Dict[str, np.ndarray]:
+    """Random-effects pools of the contiguous segments beginning at ``starts``.
+
+    tau^2 is the DerSimonian-Laird estimate, or the REML / Paule-Mandel
+    estimate iterated from it.
+    """
+    counts = np.diff(np.append(starts, len(effects)))
+    pool = np.repeat(np.arange(len(starts)), counts)
+    weights = 1 / variances
+    sum_w = np.add.reduceat(weights, starts)
+    sum_w2 = np.add.reduceat(weights ** 2, starts)
+    fixed = np.add.reduceat(weights * effects, starts) / sum_w
+    # Two passes keep Q exact (zero for single-study pools) instead of
+    # differencing large sums of squares.
+    q = np.add.reduceat(weights * (effects - fixed[pool]) ** 2, starts)
+    c = sum_w - sum_w2 / sum_w
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tau_sq = np.where(c > 0, np.maximum(0.0, (q - (counts - 1)) / c), 0.0)
+    if method != "DL":
+        tau_sq = iterate_tau_sq(effects, variances, pool, len(starts), method, tau_sq)
+    pooled = random_effects(effects, variances, pool, len(starts), tau_sq, interval)
+    return {**pooled, "tau_sq": tau_sq, "q": q, "k": counts}
+
+
+def sort_groups(long: pd.DataFrame, by: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Row order that makes every ``by`` group contiguous, and each group's start."""
+    codes = long.groupby(list(by), observed=True, sort=True).ngroup().to_numpy()
+    order = np.argsort(codes, kind="stable")
+    return order, segment_starts(codes[order])
+
+
+def pool_groups(
+    long: pd.DataFrame, by: Sequence[str], method: str = "DL", interval: str = "z"
+) -> pd.DataFrame:
+    """Random-effects pool of every ``by`` group of ``long`` in one vectorised pass."""
+    by = list(by)
+    if long.empty:
+        return pd.DataFrame(columns=by + POOL_COLUMNS)
+    order, starts = sort_groups(long, by)
+    stats = pool_segments(
+        long["effect"].to_numpy(dtype=float)[order],
+        long["variance"].to_numpy(dtype=float)[order],
+        starts,
+        method,
+        interval,
+    )
+    result = long[by].iloc[order[starts]].reset_index(drop=True)
+    for name in POOL_COLUMNS:
+        result[name] = stats[name]
+    return result
+
+
+def estimator_comparison(long: pd.DataFrame, by: Sequence[str] = ("delay_type",)) -> pd.DataFrame:
+    """Pools of every ``by`` group under each tau^2 estimator and interval type."""
+    frames = []
+    for method in TAU_METHODS:
+        for interval in INTERVALS:
+            frame = pool_groups(long, by, method, interval)
+            frame.insert(len(by), "tau_method", method)
+            frame.insert(len(by) + 1, "interval", interval)
+            frames.append(frame)
+    return pd.concat(frames, ignore_index=True).sort_values(list(by), kind="stable")
+
+
+def heterogeneity_from_sums(
+    sum_w: np.ndarray,
+    sum_w2: np.ndarray,
+    sum_wy: np.ndarray,
+    sum_wy2: np.ndarray,
+    k: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Fixed effect, Cochran's Q and DerSimonian-Laird tau^2 from weighted sums."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fixed = sum_wy / sum_w
+        # A single study has no heterogeneity; rounding would otherwise
+        # leave a tiny Q over a tiny c.
+        q = np.where(k > 1, np.maximum(0.0, sum_wy2 - sum_wy ** 2 / sum_w), 0.0)
+        c = sum_w - sum_w2 / sum_w
+        tau_sq = np.where((k > 1) & (c > 0), np.maximum(0.0, (q - (k - 1)) / c), 0.0)
+    return fixed, q, tau_sq
+
+
+def pool_folds(
+    effects: np.ndarray,
+    variances: np.ndarray,
+    starts: np.ndarray,
+    mode: str,
+    method: str = "DL",
+    interval: str = "z",
+) -> Dict[str, np.ndarray]:
+    """Random-effects pool of one fold per study of every segment.
+
+    With ``mode="leave_one_out"`` fold ``i`` omits study ``i`` of its
+    segment; with ``mode="cumulative"`` it holds the segment's studies up to
+    and including ``i``. REML and Paule-Mandel iterate from the fold's
+    DerSimonian-Laird tau^2 over its studies.
+    """
+    counts = np.diff(np.append(starts, len(effects)))
+    group = np.repeat(np.arange(len(starts)), counts)
+    position = np.arange(len(effects)) - starts[group]
+    weights = 1 / variances
+    # Centring on each segment's fixed effect keeps the one-pass Q free of
+    # cancellation; Q and tau^2 are shift invariant.
+    centre = np.add.reduceat(weights * effects, starts) / np.add.reduceat(weights, starts)
+    centred = effects - centre[group]
+    terms = np.stack([weights, weights ** 2, weights * centred, weights * centred ** 2])
+    if mode == "leave_one_out":
+        sums = np.add.reduceat(terms, starts, axis=1)[:, group] - terms
+        k = counts[group] - 1
+    elif mode == "cumulative":
+        running = np.cumsum(terms, axis=1)
+        sums = running - (running[:, starts] - terms[:, starts])[:, group]
+        k = position + 1
+    else:
+        raise ValueError(f"Unknown fold mode '{mode}'")
+    fixed, q, tau_sq = heterogeneity_from_sums(*sums, k)
+
+    slots = np.arange(counts.max())
+    padded_y = np.zeros((len(starts), len(slots)))
+    padded_v = np.ones((len(starts), len(slots)))
+    padded_y[group, position] = effects
+    padded_v[group, position] = variances
+    if mode == "leave_one_out":
+        include = (slots < counts[group][:, None]) & (slots != position[:, None])
+    else:
+        include = slots <= position[:, None]
+    fold, slot = np.nonzero(include)
+    fold_effects = padded_y[group[fold], slot]
+    fold_variances = padded_v[group[fold], slot]
+    if method != "DL":
+        tau_sq = iterate_tau_sq(fold_effects, fold_variances, fold, len(effects), method, tau_sq)
+    pooled = random_effects(fold_effects, fold_variances, fold, len(effects), tau_sq, interval)
+    return {**pooled, "tau_sq": tau_sq, "q": q, "k": k, "fixed_effect": fixed + centre[group]}
+
+
+def fold_frame(
+    long: pd.DataFrame, order_by: Sequence[str], mode: str, method: str = "DL", interval: str = "z"
+) -> pd.DataFrame:
+    """Study keys of every fold of ``long`` (grouped by delay type) with its pool."""
+    if long.empty:
+        return pd.DataFrame(columns=["delay_type", "pmid", "study_year"] + POOL_COLUMNS)
+    order_by = [c for c in order_by if c in long.columns]
+    ordered = long.sort_values(order_by, kind="stable", na_position="last") if order_by else long
+    order, starts = sort_groups(ordered, ["delay_type"])
+    ordered = ordered.iloc[order].reset_index(drop=True)
+    stats = pool_folds(
+        ordered["effect"].to_numpy(dtype=float),
+        ordered["variance"].to_numpy(dtype=float),
+        starts,
+        mode,
+        method,
+        interval,
+    )
+    keys = [c for c in ("delay_type", "pmid", "study_year") if c in ordered.columns]
+    result = ordered[keys].copy()
+    for name in POOL_COLUMNS:
+        result[name] = stats[name]
+    return result
+
+
+def influence_analysis(
+    long: pd.DataFrame, pooled: pd.DataFrame, method: str = "DL", interval: str = "z"
+) -> pd.DataFrame:
+    """Leave-one-out pools of every delay type and their shift from the full ``pooled`` estimate."""
+    folds = fold_frame(long, [], "leave_one_out", method, interval)
+    folds = folds[folds["k"] > 0].reset_index(drop=True)
+    full = pooled.set_index(pooled["delay_type"].astype(str))
+    delay = folds["delay_type"].astype(str)
+    folds["delta_effect"] = folds["effect"] - delay.map(full["effect"]).to_numpy(dtype=float)
+    folds["delta_tau_sq"] = folds["tau_sq"] - delay.map(full["tau_sq"]).to_numpy(dtype=float)
+    return folds.rename(columns={"pmid": "omitted_pmid"})
+
+
+def cumulative_analysis(
+    long: pd.DataFrame,
+    order_by: Sequence[str] = ("study_year", "pmid"),
+    method: str = "DL",
+    interval: str = "z",
+) -> pd.DataFrame:
+    """Pools of every delay type as studies are added in ``order_by`` (publication) order."""
+    folds = fold_frame(long, order_by, "cumulative", method, interval)
+    folds.insert(1, "step", folds["k"])
+    return folds.rename(columns={"pmid": "added_pmid"})
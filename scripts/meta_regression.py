@@ -0,0 +1,286 @@
+"""Mixed-effects meta-regression of pooled delays on study-level moderators.
+
+Each (delay type x moderator) model is a weighted least-squares fit with a
+method-of-moments residual heterogeneity, i.e. the DerSimonian-Laird
+estimator generalised to a design matrix. All delay types of a moderator are
+padded to a common number of studies and fitted together with batched
+``numpy.linalg`` calls; padded rows carry zero weight. Numeric moderators are
+centred within each delay type, so the intercept is the pooled delay at the
+mean moderator value; categorical moderators use treatment coding against the
+first level observed for that delay type.
+
+The omnibus moderator test (QM) gets a chi-square p-value and a permutation
+p-value. Permutations shuffle moderator values across the studies of each
+delay type, are fitted in the same batched way, and are split into chunks
+with independent ``SeedSequence`` streams across a process pool.
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from meta_pooling import Z_95
+
+# Moderator -> coding: "categorical", "numeric" or "log" (numeric on the log scale).
+MODERATORS: Dict[str, str] = {
+    "state": "categorical",
+    "study_year": "numeric",
+    "setting_public_private": "categorical",
+    "sample_size": "log",
+}
+PERMUTATION_CHUNK = 250
+SUMMARY_COLUMNS = [
+    "delay_type", "moderator", "k", "n_coef", "tau_sq", "tau_sq_null", "r_squared",
+    "i_squared_resid", "qe", "qe_df", "qe_p", "qm", "qm_df", "qm_p", "qm_p_perm",
+    "n_permutations",
+]
+COEFFICIENT_COLUMNS = [
+    "delay_type", "moderator", "term", "reference", "estimate", "se", "z", "p",
+    "ci_low", "ci_high",
+]
+
+
+@dataclass
+class Design:
+    """Padded per-delay-type design of one moderator: arrays are (groups, studies[, terms])."""
+
+    groups: List[str]
+    terms: List[str]
+    X: np.ndarray
+    y: np.ndarray
+    v: np.ndarray
+    mask: np.ndarray
+    estimable: np.ndarray
+    references: List[Optional[str]]
+
+
+def pad_positions(codes: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Row of each element within its group (packed to the front) and the widest group."""
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    position = np.empty(len(codes), dtype=np.intp)
+    position[order] = np.arange(len(codes)) - starts[codes[order]]
+    return position, counts, int(counts.max()) if len(counts) else 0
+
+
+def build_design(long: pd.DataFrame, moderator: str, kind: str) -> Optional[Design]:
+    """Design matrices of ``moderator`` for every delay type observing it."""
+    if moderator not in long.columns:
+        return None
+    values = long[moderator]
+    if kind == "categorical":
+        present = values.notna() & (values.astype(str).str.strip() != "")
+    else:
+        values = pd.to_numeric(values, errors="coerce")
+        if kind == "log":
+            values = np.log(values.where(values > 0))
+        present = values.notna()
+    rows = long[present]
+    if rows.empty:
+        return None
+    delay = rows["delay_type"].astype("category").cat.remove_unused_categories()
+    groups = [str(g) for g in delay.cat.categories]
+    codes = delay.cat.codes.to_numpy()
+    position, counts, width = pad_positions(codes, len(groups))
+    shape = (len(groups), width)
+    mask = np.zeros(shape, dtype=bool)
+    mask[codes, position] = True
+    y = np.zeros(shape)
+    y[codes, position] = rows["effect"].to_numpy(dtype=float)
+    v = np.ones(shape)
+    v[codes, position] = rows["variance"].to_numpy(dtype=float)
+
+    if kind == "categorical":
+        level_codes, levels = pd.factorize(values[present].astype(str).str.strip(), sort=True)
+        dummies = np.zeros((*shape, len(levels)))
+        dummies[codes, position, level_codes] = 1.0
+        observed = dummies.any(axis=1)
+        reference = observed.argmax(axis=1)
+        dummies[np.arange(len(groups)), :, reference] = 0.0
+        estimable_levels = observed.copy()
+        estimable_levels[np.arange(len(groups)), reference] = False
+        X = np.concatenate([mask[..., None].astype(float), dummies], axis=-1)
+        terms = ["intercept", *[str(level) for level in levels]]
+        estimable = np.concatenate([np.ones((len(groups), 1), dtype=bool), estimable_levels], axis=1)
+        references = [str(levels[r]) for r in reference]
+    else:
+        x = np.zeros(shape)
+        x[codes, position] = values[present].to_numpy(dtype=float)
+        centre = x.sum(axis=1) / counts
+        x = np.where(mask, x - centre[:, None], 0.0)
+        X = np.stack([mask.astype(float), x], axis=-1)
+        terms = ["intercept", moderator]
+        estimable = np.ones((len(groups), 2), dtype=bool)
+        references = [None] * len(groups)
+    return Design(groups, terms, X, y, v, mask, estimable, references)
+
+
+def weighted_fit(X: np.ndarray, y: np.ndarray, w: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Batched WLS: ``(X'WX)^+`` and coefficients for every leading batch index."""
+    XtW = np.swapaxes(X, -1, -2) * w[..., None, :]
+    cov = np.linalg.pinv(XtW @ X, hermitian=True)
+    beta = (cov @ (XtW @ y[..., None]))[..., 0]
+    return cov, beta
+
+
+def fit_mixed_effects(
+    X: np.ndarray, y: np.ndarray, v: np.ndarray, mask: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """Method-of-moments mixed-effects meta-regression of every batch model at once.
+
+    Models whose residual degrees of freedom are not positive (saturated
+    designs) get NaN heterogeneity and test statistics.
+    """
+    w = np.where(mask, 1 / v, 0.0)
+    cov_fe, beta_fe = weighted_fit(X, y, w)
+    XtW = np.swapaxes(X, -1, -2) * w[..., None, :]
+    rank = np.linalg.matrix_rank(XtW @ X, hermitian=True)
+    k = mask.sum(axis=-1)
+    resid = y - (X @ beta_fe[..., None])[..., 0]
+    qe = np.sum(w * resid ** 2, axis=-1)
+    XtW2X = (XtW * w[..., None, :]) @ X
+    trace = w.sum(axis=-1) - np.einsum("...ij,...ji->...", cov_fe, XtW2X)
+    df_resid = k - rank
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tau_sq = np.where(trace > 0, np.maximum(0.0, (qe - df_resid) / trace), 0.0)
+    fitted_ok = df_resid > 0
+    tau_sq = np.where(fitted_ok, tau_sq, np.nan)
+
+    w_random = np.where(mask, 1 / (v + np.nan_to_num(tau_sq)[..., None]), 0.0)
+    cov, beta = weighted_fit(X, y, w_random)
+    fitted = (X @ beta[..., None])[..., 0]
+    centre = np.sum(w_random * y, axis=-1) / np.sum(w_random, axis=-1)
+    qm = np.sum(w_random * (fitted - centre[..., None]) ** 2, axis=-1)
+    return {
+        "beta": beta,
+        "se": np.sqrt(np.clip(np.diagonal(cov, axis1=-2, axis2=-1), 0.0, None)),
+        "tau_sq": tau_sq,
+        "qe": np.where(fitted_ok, qe, np.nan),
+        "qe_df": df_resid,
+        "qm": np.where(fitted_ok, qm, np.nan),
+        "qm_df": rank - 1,
+        "k": k,
+        "rank": rank,
+    }
+
+
+def permutation_exceedances(
+    design: Design, qm: np.ndarray, n_permutations: int, seed: np.random.SeedSequence
+) -> np.ndarray:
+    """Per-group count of permuted QM statistics at least as large as ``qm``."""
+    rng = np.random.default_rng(seed)
+    keys = rng.random((n_permutations, *design.mask.shape))
+    keys[:, ~design.mask] = np.inf
+    index = np.argsort(keys, axis=-1)
+    X = np.take_along_axis(design.X[None], index[..., None], axis=-2)
+    fit = fit_mixed_effects(X, design.y, design.v, design.mask)
+    tolerance = 1e-8 * np.maximum(np.abs(qm), 1.0)
+    return np.sum(fit["qm"] >= qm - tolerance, axis=0)
+
+
+def _permutation_task(args: Tuple[Design, np.ndarray, int, np.random.SeedSequence]) -> np.ndarray:
+    return permutation_exceedances(*args)
+
+
+def permutation_p_values(
+    design: Design,
+    qm: np.ndarray,
+    n_permutations: int,
+    seed: int,
+    workers: Optional[int] = None,
+) -> np.ndarray:
+    """``(1 + exceedances) / (1 + n_permutations)`` per group; NaN where QM is undefined.
+
+    Chunks draw from ``SeedSequence(seed).spawn`` streams, so results do not
+    depend on the number of workers.
+    """
+    if n_permutations <= 0:
+        return np.full(len(design.groups), np.nan)
+    sizes = [PERMUTATION_CHUNK] * (n_permutations // PERMUTATION_CHUNK)
+    if n_permutations % PERMUTATION_CHUNK:
+        sizes.append(n_permutations % PERMUTATION_CHUNK)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(design, qm, size, s) for size, s in zip(sizes, seeds)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = sum(pool.map(_permutation_task, tasks))
+    else:
+        counts = sum(_permutation_task(task) for task in tasks)
+    p_values = (1 + counts) / (1 + n_permutations)
+    return np.where(np.isfinite(qm) & (qm > 0), p_values, np.nan)
+
+
+def run_meta_regression(
+    long: pd.DataFrame,
+    moderators: Mapping[str, str] = MODERATORS,
+    n_permutations: int = 1000,
+    seed: int = 42,
+    workers: Optional[int] = None,
+) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """Omnibus summary for every (delay type x moderator) and a coefficient table per moderator."""
+    summaries: List[pd.DataFrame] = []
+    coefficients: Dict[str, pd.DataFrame] = {}
+    for offset, (moderator, kind) in enumerate(moderators.items()):
+        design = build_design(long, moderator, kind)
+        if design is None:
+            continue
+        fit = fit_mixed_effects(design.X, design.y, design.v, design.mask)
+        null = fit_mixed_effects(design.X[..., :1], design.y, design.v, design.mask)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r_squared = np.where(
+                null["tau_sq"] > 0, np.maximum(0.0, 1 - fit["tau_sq"] / null["tau_sq"]), np.nan
+            )
+            i_squared = np.where(
+                fit["qe"] > 0, np.maximum(0.0, (fit["qe"] - fit["qe_df"]) / fit["qe"]), np.nan
+            )
+        qm_defined = np.isfinite(fit["qm"]) & (fit["qm_df"] > 0)
+        summaries.append(pd.DataFrame({
+            "delay_type": design.groups,
+            "moderator": moderator,
+            "k": fit["k"],
+            "n_coef": fit["rank"],
+            "tau_sq": fit["tau_sq"],
+            "tau_sq_null": null["tau_sq"],
+            "r_squared": r_squared,
+            "i_squared_resid": i_squared,
+            "qe": fit["qe"],
+            "qe_df": fit["qe_df"],
+            "qe_p": stats.chi2.sf(fit["qe"], np.maximum(fit["qe_df"], 1)),
+            "qm": fit["qm"],
+            "qm_df": fit["qm_df"],
+            "qm_p": np.where(qm_defined, stats.chi2.sf(fit["qm"], np.maximum(fit["qm_df"], 1)), np.nan),
+            "qm_p_perm": permutation_p_values(
+                design, np.where(qm_defined, fit["qm"], np.nan), n_permutations, seed + offset, workers
+            ),
+            "n_permutations": n_permutations,
+        }))
+
+        group_idx, term_idx = np.nonzero(design.estimable & np.isfinite(fit["tau_sq"])[:, None])
+        estimate = fit["beta"][group_idx, term_idx]
+        se = fit["se"][group_idx, term_idx]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = estimate / se
+        coefficients[moderator] = pd.DataFrame({
+            "delay_type": [design.groups[g] for g in group_idx],
+            "moderator": moderator,
+            "term": [design.terms[t] for t in term_idx],
+            "reference": [design.references[g] for g in group_idx],
+            "estimate": estimate,
+            "se": se,
+            "z": z,
+            "p": 2 * stats.norm.sf(np.abs(z)),
+            "ci_low": estimate - Z_95 * se,
+            "ci_high": estimate + Z_95 * se,
+        }, columns=COEFFICIENT_COLUMNS)
+    summary = (
+        pd.concat(summaries, ignore_index=True) if summaries else pd.DataFrame(columns=SUMMARY_COLUMNS)
+    )
+    return summary, coefficients
@@ -0,0 +1,206 @@
+"""Persistent sufficient statistics for living updates of the pooled delays.
+
+Every pool (one per delay type) keeps the weighted sums (sum w, sum w^2,
+sum w y, sum w y^2, k) of its studies together with each study's own
+effect and variance, keyed by study ID (the PMID). Adding or retracting a
+study adjusts the sums in O(1), so the fixed effect, Cochran's Q and the
+DerSimonian-Laird tau^2 are available without re-reading the extracted
+literature. The random-effects estimate reweights the pool's stored studies
+by the new tau^2, which touches only that pool's k entries.
+
+Effects are stored relative to a per-pool shift (the first study's effect)
+so the one-pass Q does not lose precision. The store is a JSON file;
+every change is appended to an audit log, and :meth:`record_quarter` keeps
+one row per quarter and pool listing the studies behind that quarter's
+estimate.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from meta_pooling import POOL_COLUMNS, heterogeneity_from_sums, iterate_tau_sq, random_effects
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+PROCESSED_DIR = PROJECT_ROOT / "data" / "processed"
+STORE_PATH = PROCESSED_DIR / "meta_sufficient_stats.json"
+AUDIT_PATH = PROCESSED_DIR / "meta_store_audit.csv"
+QUARTERS_PATH = PROCESSED_DIR / "meta_store_quarters.csv"
+STORE_VERSION = 1
+SUM_KEYS = ("sum_w", "sum_w2", "sum_wy", "sum_wy2")
+AUDIT_COLUMNS = ["timestamp", "quarter", "action", "pool", "study_id", "effect", "variance"]
+QUARTER_COLUMNS = ["quarter", "pool", "k", "study_ids", "fixed_effect", "effect", "tau_sq"]
+
+
+def current_quarter(today: Optional[date] = None) -> str:
+    today = today or date.today()
+    return f"{today.year}Q{(today.month - 1) // 3 + 1}"
+
+
+def study_ids(long: pd.DataFrame) -> pd.Series:
+    """PMID of each row (row number when missing), suffixed when a pool repeats it."""
+    if "pmid" in long.columns:
+        ids = long["pmid"].astype("string").str.replace(r"\.0$", "", regex=True)
+        ids = ids.fillna(pd.Series([f"row{i}" for i in range(len(long))], index=long.index))
+    else:
+        ids = pd.Series([f"row{i}" for i in range(len(long))], index=long.index)
+    repeat = long.groupby([long["delay_type"].astype(str), ids], sort=False).cumcount()
+    return ids.where(repeat == 0, ids + "#" + (repeat + 1).astype(str)).astype(str)
+
+
+def contribution(effect: float, variance: float, shift: float) -> Dict[str, float]:
+    w = 1.0 / variance
+    y = effect - shift
+    return {"sum_w": w, "sum_w2": w * w, "sum_wy": w * y, "sum_wy2": w * y * y}
+
+
+class SufficientStatisticsStore:
+    """Per-pool weighted sums with O(1) :meth:`add` and :meth:`retract`."""
+
+    def __init__(
+        self,
+        path: Path = STORE_PATH,
+        audit_path: Path = AUDIT_PATH,
+        quarters_path: Path = QUARTERS_PATH,
+    ) -> None:
+        self.path = path
+        self.audit_path = audit_path
+        self.quarters_path = quarters_path
+        self.pools: Dict[str, Dict[str, object]] = {}
+        self.pending: List[Dict[str, object]] = []
+        if path.exists():
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            if payload.get("version") == STORE_VERSION:
+                self.pools = payload["pools"]
+
+    def add(self, pool: str, study_id: str, effect: float, variance: float, quarter: str) -> None:
+        entry = self.pools.setdefault(
+            pool, {"shift": float(effect), "k": 0, **{key: 0.0 for key in SUM_KEYS}, "studies": {}}
+        )
+        if study_id in entry["studies"]:
+            raise KeyError(f"Study {study_id} is already pooled in {pool}")
+        for key, value in contribution(effect, variance, entry["shift"]).items():
+            entry[key] += value
+        entry["k"] += 1
+        entry["studies"][study_id] = {"effect": float(effect), "variance": float(variance), "quarter": quarter}
+        self.log(quarter, "add", pool, study_id, effect, variance)
+
+    def retract(self, pool: str, study_id: str, quarter: str) -> None:
+        entry = self.pools[pool]
+        study = entry["studies"].pop(study_id)
+        entry["k"] -= 1
+        if entry["k"] == 0:
+            # Reset rather than leave rounding residue in an empty pool.
+            for key in SUM_KEYS:
+                entry[key] = 0.0
+        else:
+            for key, value in contribution(study["effect"], study["variance"], entry["shift"]).items():
+                entry[key] -= value
+        self.log(quarter, "retract", pool, study_id, study["effect"], study["variance"])
+
+    def log(
+        self, quarter: str, action: str, pool: str, study_id: str, effect: float, variance: float
+    ) -> None:
+        self.pending.append({
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "quarter": quarter,
+            "action": action,
+            "pool": pool,
+            "study_id": study_id,
+            "effect": effect,
+            "variance": variance,
+        })
+
+    def sync(self, long: pd.DataFrame, quarter: str, logger: logging.Logger) -> Dict[str, int]:
+        """Bring the store in line with ``long``: add new studies, retract dropped ones, replace changed ones."""
+        current: Dict[Tuple[str, str], Tuple[float, float]] = {
+            (str(pool), sid): (float(effect), float(variance))
+            for pool, sid, effect, variance in zip(
+                long["delay_type"], study_ids(long), long["effect"], long["variance"]
+            )
+        }
+        stored = {
+            (pool, sid): (study["effect"], study["variance"])
+            for pool, entry in self.pools.items()
+            for sid, study in entry["studies"].items()
+        }
+        counts = {"added": 0, "retracted": 0, "updated": 0}
+        for key in stored.keys() - current.keys():
+            self.retract(*key, quarter)
+            counts["retracted"] += 1
+        for key, (effect, variance) in current.items():
+            if key in stored:
+                if stored[key] == (effect, variance):
+                    continue
+                self.retract(*key, quarter)
+                counts["updated"] += 1
+            else:
+                counts["added"] += 1
+            self.add(*key, effect, variance, quarter)
+        logger.info(
+            "Sufficient-statistics store for %s: %s added, %s retracted, %s updated.",
+            quarter, counts["added"], counts["retracted"], counts["updated"],
+        )
+        return counts
+
+    def estimates(self, method: str = "DL", interval: str = "z") -> pd.DataFrame:
+        """Fixed- and random-effects estimate of every non-empty pool."""
+        pools = [pool for pool, entry in self.pools.items() if entry["k"] > 0]
+        if not pools:
+            return pd.DataFrame(columns=["pool", "fixed_effect"] + POOL_COLUMNS)
+        entries = [self.pools[pool] for pool in pools]
+        sums = [np.array([entry[key] for entry in entries]) for key in SUM_KEYS]
+        k = np.array([entry["k"] for entry in entries])
+        shift = np.array([entry["shift"] for entry in entries])
+        fixed, q, tau_sq = heterogeneity_from_sums(*sums, k)
+
+        membership = np.repeat(np.arange(len(pools)), k)
+        studies = [study for entry in entries for study in entry["studies"].values()]
+        effects = np.array([study["effect"] for study in studies])
+        variances = np.array([study["variance"] for study in studies])
+        if method != "DL":
+            tau_sq = iterate_tau_sq(effects, variances, membership, len(pools), method, tau_sq)
+        pooled = random_effects(effects, variances, membership, len(pools), tau_sq, interval)
+        result = pd.DataFrame({"pool": pools, "fixed_effect": fixed + shift})
+        for name in POOL_COLUMNS:
+            result[name] = {**pooled, "tau_sq": tau_sq, "q": q, "k": k}[name]
+        return result
+
+    def record_quarter(self, quarter: str) -> pd.DataFrame:
+        """Replace ``quarter``'s rows of the quarterly membership table with the current pools."""
+        estimates = self.estimates()
+        rows = pd.DataFrame({
+            "quarter": quarter,
+            "pool": estimates["pool"],
+            "k": estimates["k"],
+            "study_ids": [";".join(sorted(self.pools[pool]["studies"])) for pool in estimates["pool"]],
+            "fixed_effect": estimates["fixed_effect"],
+            "effect": estimates["effect"],
+            "tau_sq": estimates["tau_sq"],
+        }, columns=QUARTER_COLUMNS)
+        history = pd.DataFrame(columns=QUARTER_COLUMNS)
+        if self.quarters_path.exists():
+            history = pd.read_csv(self.quarters_path, dtype={"quarter": str, "study_ids": str})
+            history = history[history["quarter"] != quarter]
+        table = pd.concat([history, rows], ignore_index=True) if not history.empty else rows
+        table.to_csv(self.quarters_path, index=False)
+        return table
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(
+            json.dumps({"version": STORE_VERSION, "pools": self.pools}, indent=1), encoding="utf-8"
+        )
+        os.replace(tmp_path, self.path)
+        if self.pending:
+            audit = pd.DataFrame(self.pending, columns=AUDIT_COLUMNS)
+            audit.to_csv(self.audit_path, mode="a", header=not self.audit_path.exists(), index=False)
+            self.pending = []
@@ -0,0 +1,166 @@
+"""Single-pass assembly of keyed sources into a unit-by-year panel.
+
+Every source is encoded on a shared categorical ``(unit, year)`` key, or on
+``unit`` alone when it carries no year. Each source is then aligned to the
+panel index with one vectorised take and all sources are joined with a
+single ``pd.concat``. Year-less sources follow an explicit broadcast rule
+instead of whatever pairwise outer merges happen to produce:
+
+- ``all_years``: repeat the unit's values in every panel year (structural
+  covariates such as census denominators);
+- ``latest``: attach the values to the most recent panel year only;
+- ``("year", value)``: attach the values to that year only, adding it to the
+  panel years when no yearly source has it (a snapshot whose year is known
+  from the source, such as one year's notifications).
+
+When no source has a year the panel is keyed on the unit alone.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+BROADCAST_RULES = ("all_years", "latest")
+DEFAULT_BROADCAST = "all_years"
+FIXED_YEAR_RULE = "year"
+
+BroadcastRule = Union[str, Tuple[str, object]]
+
+
+def encode_keys(series: List[pd.Series]) -> tuple[List[np.ndarray], pd.Index]:
+    """Factorize key columns of several sources against one sorted category set.
+
+    Returns per-source integer codes (-1 for missing keys) and the categories.
+    """
+    if not series:
+        return [], pd.Index([])
+    combined = pd.concat([s.astype(object) for s in series], ignore_index=True)
+    codes, categories = pd.factorize(combined, sort=True)
+    bounds = np.cumsum([0, *[len(s) for s in series]])
+    return [codes[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])], categories
+
+
+def fixed_year(rule: BroadcastRule) -> Optional[object]:
+    """Year of a ``("year", value)`` rule, None for the named rules."""
+    if isinstance(rule, tuple) and len(rule) == 2 and rule[0] == FIXED_YEAR_RULE:
+        return rule[1]
+    return None
+
+
+def match_year_type(year: object, observed: List[pd.Series]) -> object:
+    """``year`` as a string when the sources' years are strings, so both sort together."""
+    for values in observed:
+        values = values.dropna()
+        if len(values):
+            return str(year) if isinstance(values.iloc[0], str) else year
+    return year
+
+
+def align(frame: pd.DataFrame, indexer: np.ndarray) -> pd.DataFrame:
+    """Row ``i`` of the result is ``frame`` row ``indexer[i]``, or missing where it is -1."""
+    block = frame.reset_index(drop=True).reindex(indexer)
+    block.index = pd.RangeIndex(len(indexer))
+    return block
+
+
+def build_panel(
+    datasets: Mapping[str, pd.DataFrame],
+    logger: logging.Logger,
+    broadcast: Optional[Mapping[str, BroadcastRule]] = None,
+    unit: str = "state",
+    time: str = "year",
+) -> pd.DataFrame:
+    """Align every non-empty source on the shared key and join them in one pass."""
+    broadcast = dict(broadcast or {})
+    sources: Dict[str, pd.DataFrame] = {
+        name: df for name, df in datasets.items() if not df.empty and unit in df.columns
+    }
+    if not sources:
+        logger.warning("No datasets available to merge; writing empty panel.")
+        return pd.DataFrame(columns=[unit, time])
+    for name in sources:
+        rule = broadcast.get(name, DEFAULT_BROADCAST)
+        if rule not in BROADCAST_RULES and fixed_year(rule) is None:
+            raise ValueError(f"Unknown broadcast rule '{rule}' for {name}")
+
+    yearly = [name for name, df in sources.items() if time in df.columns]
+    codes, units = encode_keys([df[unit] for df in sources.values()])
+    unit_codes = dict(zip(sources, codes))
+    year_series = [sources[n][time] for n in yearly]
+    fixed = {
+        name: match_year_type(fixed_year(broadcast.get(name, DEFAULT_BROADCAST)), year_series)
+        for name in sources
+        if name not in yearly and fixed_year(broadcast.get(name, DEFAULT_BROADCAST)) is not None
+    }
+    codes, years = encode_keys(year_series + [pd.Series([year]) for year in fixed.values()])
+    year_code_map = dict(zip(yearly, codes))
+    n_years = max(len(years), 1)
+    # Year code each year-less source is attached to, unless it spans all years.
+    target_year = {name: int(code[0]) for name, code in zip(fixed, codes[len(yearly):])}
+    for name in sources:
+        if name not in yearly and broadcast.get(name, DEFAULT_BROADCAST) == "latest":
+            target_year[name] = n_years - 1
+
+    key_ids: Dict[str, np.ndarray] = {}
+    for name, df in sources.items():
+        year_codes = year_code_map.get(name)
+        ids = unit_codes[name].astype(np.int64) * n_years
+        if year_codes is not None:
+            ids = np.where((year_codes >= 0) & (unit_codes[name] >= 0), ids + year_codes, -1)
+        else:
+            ids = np.where(unit_codes[name] >= 0, ids, -1)
+        duplicated = pd.Series(ids).duplicated(keep="first").to_numpy() | (ids < 0)
+        if duplicated.any():
+            logger.warning(
+                "%s has %s duplicated or missing key(s); keeping the first occurrence.",
+                name, int(duplicated.sum()),
+            )
+            sources[name] = df.loc[~duplicated]
+            unit_codes[name] = unit_codes[name][~duplicated]
+            ids = ids[~duplicated]
+        key_ids[name] = ids
+
+    # Panel rows: every observed (unit, year) key, plus the years each
+    # year-less source is broadcast into.
+    present = np.zeros(len(units) * n_years, dtype=bool)
+    for name in sources:
+        if name in yearly:
+            present[key_ids[name]] = True
+        elif name in target_year:
+            present.reshape(len(units), n_years)[unit_codes[name], target_year[name]] = True
+        else:
+            present.reshape(len(units), n_years)[unit_codes[name], :] = True
+    panel_ids = np.flatnonzero(present)
+    panel_units = panel_ids // n_years
+    panel_years = panel_ids % n_years
+
+    blocks: List[pd.DataFrame] = []
+    for name, df in sources.items():
+        values = df.drop(columns=[unit, time], errors="ignore")
+        if name in yearly:
+            indexer = np.full(len(panel_ids), -1, dtype=np.int64)
+            indexer[np.searchsorted(panel_ids, key_ids[name])] = np.arange(len(values))
+        else:
+            by_unit = np.full(len(units), -1, dtype=np.int64)
+            by_unit[unit_codes[name]] = np.arange(len(values))
+            indexer = by_unit[panel_units]
+            if name in target_year:
+                indexer[panel_years != target_year[name]] = -1
+            logger.info(
+                "Broadcasting year-less source %s with rule '%s'.",
+                name, broadcast.get(name, DEFAULT_BROADCAST),
+            )
+        blocks.append(align(values, indexer))
+
+    keys = {unit: pd.Categorical.from_codes(panel_units, categories=units)}
+    if len(years):
+        keys[time] = pd.Categorical.from_codes(panel_years, categories=years)
+    panel = pd.concat([pd.DataFrame(keys), *blocks], axis=1)
+    duplicated_columns = panel.columns[panel.columns.duplicated()].tolist()
+    if duplicated_columns:
+        logger.warning("Duplicate panel columns after join: %s", ", ".join(duplicated_columns))
+    logger.info("Assembled %s sources into %s keyed rows in one join.", len(sources), len(panel))
+    return panel
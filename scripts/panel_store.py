@@ -0,0 +1,207 @@
+"""Partitioned Parquet store for the state-year panel.
+
+``02_clean_merge.py`` writes the panel as a hive-partitioned Parquet dataset
+under ``data/processed/<level>_year_panel/`` (``state`` by default, or
+``district``), one partition per ``year`` (a
+single file when the panel has no year). Rows inside a partition are sorted
+by geographic ``zone`` (see ``geography.STATE_ZONES``) and state, so state
+filters can skip row groups through their statistics. Partitioning by zone as
+well was tried and rejected: with a few hundred columns the per-file
+overhead of many small files outweighed the pruning. A small
+``_panel_store.json`` records the partition types and column schema so that
+every reader sees the same dtypes.
+
+:func:`read_panel` pushes year/state filters down to partition pruning and
+row-group statistics and reads only the requested columns. Without pyarrow,
+or before the store has been written, it falls back to filtering
+``state_year_panel.csv``.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from geography import resolve_states, state_zones
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+    pc = None
+    ds = None
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+PROCESSED_DIR = PROJECT_ROOT / "data" / "processed"
+METADATA_FILE = "_panel_store.json"
+STORE_VERSION = 1
+KEY_COLUMNS = ("district", "state", "year")
+ZONE_COLUMN = "zone"
+
+
+def panel_store_dir(level: str = "state") -> Path:
+    return PROCESSED_DIR / f"{level}_year_panel"
+
+
+def panel_csv_path(level: str = "state") -> Path:
+    return PROCESSED_DIR / f"{level}_year_panel.csv"
+
+
+PANEL_STORE_DIR = panel_store_dir("state")
+PANEL_CSV_PATH = panel_csv_path("state")
+
+
+def year_partition_values(years: pd.Series) -> pd.Series:
+    """Integer years when every value is numeric, otherwise strings (e.g. ``2023-24``)."""
+    numeric = pd.to_numeric(years.astype(object), errors="coerce")
+    if numeric.notna().all() and (numeric % 1 == 0).all():
+        return numeric.astype("int16")
+    return years.astype(str)
+
+
+def read_store_metadata(path: Path = PANEL_STORE_DIR) -> Optional[Dict[str, object]]:
+    meta_path = path / METADATA_FILE
+    if not meta_path.exists():
+        return None
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != STORE_VERSION:
+        return None
+    return meta
+
+
+def write_panel_store(
+    panel: pd.DataFrame, logger: logging.Logger, path: Path = PANEL_STORE_DIR
+) -> bool:
+    """Replace the Parquet store with ``panel``; returns False when pyarrow is unavailable."""
+    if ds is None:
+        logger.warning("pyarrow not installed; panel kept as CSV only.")
+        return False
+    frame = panel.copy()
+    if "year" in frame.columns:
+        frame["year"] = year_partition_values(frame["year"])
+    frame[ZONE_COLUMN] = state_zones(frame["state"]).astype("category")
+    frame = frame.sort_values(
+        [c for c in (ZONE_COLUMN, "state", "district") if c in frame.columns], kind="stable"
+    )
+    partition_cols = ["year"] if "year" in frame.columns else []
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    partition_schema = pa.schema([table.schema.field(c) for c in partition_cols])
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    ds.write_dataset(
+        table,
+        tmp_path,
+        format="parquet",
+        partitioning=ds.partitioning(partition_schema, flavor="hive") if partition_cols else None,
+        basename_template="part-{i}.parquet",
+    )
+    meta = {
+        "version": STORE_VERSION,
+        "rows": len(frame),
+        "partitions": {f.name: str(f.type) for f in partition_schema},
+        "columns": {f.name: str(f.type) for f in table.schema if f.name not in partition_cols},
+    }
+    (tmp_path / METADATA_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    old_path = path.with_name(path.name + ".old")
+    if old_path.exists():
+        shutil.rmtree(old_path)
+    if path.exists():
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    if old_path.exists():
+        shutil.rmtree(old_path)
+    logger.info(
+        "Panel store written to %s (%s).",
+        path, "partitioned by year" if partition_cols else "single file, no year column",
+    )
+    return True
+
+
+def select_columns(available: Iterable[str], columns: Optional[Iterable[str]]) -> List[str]:
+    """Requested columns that exist, in stored order and led by the unit/year keys."""
+    available = [c for c in available if c != ZONE_COLUMN]
+    keys = [c for c in KEY_COLUMNS if c in available]
+    wanted = set(available if columns is None else columns)
+    return keys + [c for c in available if c in wanted and c not in keys]
+
+
+def read_panel(
+    columns: Optional[Iterable[str]] = None,
+    years: Optional[Iterable[object]] = None,
+    states: Optional[Iterable[str]] = None,
+    logger: Optional[logging.Logger] = None,
+    level: str = "state",
+    path: Optional[Path] = None,
+    csv_path: Optional[Path] = None,
+) -> pd.DataFrame:
+    """Load the ``level`` panel slice for ``years`` x ``states`` restricted to ``columns``.
+
+    ``None`` means no restriction. State names are resolved through
+    ``geography`` first, so any spelling known to the resolver matches.
+    """
+    path = path or panel_store_dir(level)
+    csv_path = csv_path or panel_csv_path(level)
+    columns = None if columns is None else list(columns)
+    wanted_states = None
+    if states is not None:
+        wanted_states = resolve_states(pd.Series(list(states), dtype=object)).dropna().tolist()
+    meta = read_store_metadata(path)
+    if ds is None or meta is None:
+        return read_panel_csv(columns, years, wanted_states, logger, csv_path)
+
+    partitioning = None
+    if meta["partitions"]:
+        partitioning = ds.partitioning(
+            pa.schema([(name, pa.type_for_alias(kind)) for name, kind in meta["partitions"].items()]),
+            flavor="hive",
+        )
+    dataset = ds.dataset(path, format="parquet", partitioning=partitioning)
+    predicate = None
+    if years is not None and "year" in meta["partitions"]:
+        cast = str if "string" in meta["partitions"]["year"] else int
+        predicate = pc.field("year").isin([cast(y) for y in years])
+    if wanted_states is not None:
+        zones = sorted(set(state_zones(pd.Series(wanted_states, dtype=object))))
+        state_filter = pc.field(ZONE_COLUMN).isin(zones) & pc.field("state").isin(wanted_states)
+        predicate = state_filter if predicate is None else predicate & state_filter
+    selected = select_columns(dataset.schema.names, columns)
+    missing = sorted(set(columns or []) - set(selected))
+    if missing and logger is not None:
+        logger.warning("Panel store lacks requested column(s): %s", ", ".join(missing))
+    table = dataset.to_table(columns=selected, filter=predicate)
+    panel = table.to_pandas()
+    sort_keys = [c for c in KEY_COLUMNS if c in panel.columns]
+    return panel.sort_values(sort_keys, kind="stable").reset_index(drop=True)
+
+
+def read_panel_csv(
+    columns: Optional[List[str]],
+    years: Optional[Iterable[object]],
+    states: Optional[List[str]],
+    logger: Optional[logging.Logger],
+    csv_path: Path = PANEL_CSV_PATH,
+) -> pd.DataFrame:
+    if not csv_path.exists() or csv_path.stat().st_size == 0:
+        if logger is not None:
+            logger.warning("Panel store and %s are both missing.", csv_path)
+        return pd.DataFrame(columns=list(KEY_COLUMNS))
+    header = pd.read_csv(csv_path, nrows=0).columns
+    panel = pd.read_csv(csv_path, usecols=select_columns(header, columns))
+    if years is not None and "year" in panel.columns:
+        panel = panel[panel["year"].astype(str).isin({str(y) for y in years})]
+    if states is not None:
+        panel = panel[panel["state"].isin(states)]
+    return panel.reset_index(drop=True)
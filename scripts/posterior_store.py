@@ -0,0 +1,113 @@
+"""Posterior draws on disk, kept out of the summary CSVs.
+
+Each model's draws are stored as float32 arrays shaped (chain, draw, ...),
+one file per model under ``data/processed/bayesian_posterior/``. With ArviZ
+and h5netcdf installed the file is a compressed, chunked InferenceData
+NetCDF (``.nc``); otherwise it is a directory of uncompressed ``.npy``
+arrays, one per variable. Summary tables record the path relative to the
+project root, and readers go through :func:`open_posterior`, which reads
+nothing up front: NetCDF variables are read lazily by xarray and ``.npy``
+arrays are memory-mapped, so a slice of the draws only pages in that slice.
+Pointwise log-likelihoods for model comparison go in the InferenceData
+``log_likelihood`` group (``log_likelihood__``-prefixed ``.npy`` files).
+"""
+from __future__ import annotations
+
+import re
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+
+try:
+    import arviz as az
+    import h5netcdf  # noqa: F401  (ArviZ's NetCDF engine)
+except ImportError:
+    az = None
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+POSTERIOR_DIR = PROJECT_ROOT / "data" / "processed" / "bayesian_posterior"
+LOG_LIKELIHOOD_PREFIX = "log_likelihood__"
+
+
+def posterior_slug(label: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", label.lower()).strip("_")
+
+
+def save_posterior(
+    draws: Mapping[str, np.ndarray],
+    name: str,
+    directory: Path = POSTERIOR_DIR,
+    attrs: Optional[Dict[str, object]] = None,
+    log_likelihood: Optional[Mapping[str, np.ndarray]] = None,
+) -> Path:
+    """Write (chain, draw, ...) ``draws`` and ``log_likelihood`` as float32 and return the file path."""
+    directory.mkdir(parents=True, exist_ok=True)
+    arrays = {key: np.asarray(value, dtype=np.float32) for key, value in draws.items()}
+    log_lik = {key: np.asarray(value, dtype=np.float32) for key, value in (log_likelihood or {}).items()}
+    if az is not None:
+        path = directory / f"{posterior_slug(name)}.nc"
+        idata = az.from_dict(posterior=arrays, log_likelihood=log_lik or None, attrs=attrs or {})
+        idata.to_netcdf(str(path), compress=True, engine="h5netcdf")
+    else:
+        path = directory / posterior_slug(name)
+        path.mkdir(exist_ok=True)
+        for key, value in arrays.items():
+            np.save(path / f"{key}.npy", value)
+        for key, value in log_lik.items():
+            np.save(path / f"{LOG_LIKELIHOOD_PREFIX}{key}.npy", value)
+    return path
+
+
+def relative_posterior_path(path: Path) -> str:
+    try:
+        return path.resolve().relative_to(PROJECT_ROOT).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def resolve_posterior_path(value: object) -> Optional[Path]:
+    """Absolute path of a summary table's ``posterior_path`` entry, None if missing."""
+    if not isinstance(value, str) or not value:
+        return None
+    path = Path(value)
+    path = path if path.is_absolute() else PROJECT_ROOT / path
+    return path if path.exists() else None
+
+
+def open_posterior(path: Path) -> Mapping[str, object]:
+    """Lazy mapping from variable name to its (chain, draw, ...) draws."""
+    if path.suffix == ".nc":
+        if az is None:
+            raise ImportError(f"Reading {path.name} needs arviz and h5netcdf")
+        return az.from_netcdf(str(path)).posterior
+    if path.is_dir():
+        return {
+            file.stem: np.load(file, mmap_mode="r")
+            for file in sorted(path.glob("*.npy"))
+            if not file.stem.startswith(LOG_LIKELIHOOD_PREFIX)
+        }
+    return np.load(path)  # .npz written by earlier versions
+
+
+def load_draws(path: Path, name: str) -> np.ndarray:
+    """One variable's draws with chains pooled: shape (chain * draw, ...).
+
+    Draws from a ``.npy`` directory come back as a read-only memory-mapped
+    view; nothing is read until the values are used.
+    """
+    values = np.asarray(open_posterior(path)[name])
+    return values.reshape(-1, *values.shape[2:])
+
+
+def load_log_likelihood(path: Path, name: str) -> np.ndarray:
+    """Pointwise log-likelihood of observed variable ``name``, chains pooled."""
+    if path.suffix == ".nc":
+        if az is None:
+            raise ImportError(f"Reading {path.name} needs arviz and h5netcdf")
+        values = np.asarray(az.from_netcdf(str(path)).log_likelihood[name])
+    elif path.is_dir():
+        values = np.load(path / f"{LOG_LIKELIHOOD_PREFIX}{name}.npy", mmap_mode="r")
+    else:
+        values = np.load(path)[LOG_LIKELIHOOD_PREFIX + name]
+    return values.reshape(-1, *values.shape[2:])
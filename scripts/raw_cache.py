@@ -0,0 +1,146 @@
+"""Columnar cache of parsed raw sources shared by the ingestion scripts."""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (parquet engine)
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+    pq = None
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+CACHE_DIR = PROJECT_ROOT / "data" / "cache" / "raw"
+CACHE_VERSION = 1
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path: Path, with_hash: bool = True) -> Dict[str, object]:
+    stat = path.stat()
+    fingerprint: Dict[str, object] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        fingerprint["sha256"] = file_sha256(path)
+    return fingerprint
+
+
+def cache_paths(path: Path, loader_tag: str, cache_dir: Path) -> tuple[Path, Path]:
+    stem = f"{path.stem}.{path.suffix.lstrip('.')}.{loader_tag}"
+    return cache_dir / f"{stem}.parquet", cache_dir / f"{stem}.json"
+
+
+def read_manifest(manifest_path: Path) -> Optional[Dict[str, object]]:
+    if not manifest_path.exists():
+        return None
+    try:
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(manifest_path: Path, manifest: Dict[str, object]) -> None:
+    tmp_path = manifest_path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp_path, manifest_path)
+
+
+def is_cache_valid(
+    path: Path,
+    manifest: Optional[Dict[str, object]],
+    data_path: Path,
+    manifest_path: Path,
+    variant: str = "",
+) -> bool:
+    """Check size/mtime first and only hash the source when those disagree."""
+    if not manifest or manifest.get("version") != CACHE_VERSION or not data_path.exists():
+        return False
+    if manifest.get("variant", "") != variant:
+        return False
+    source = manifest.get("source", {})
+    current = source_fingerprint(path, with_hash=False)
+    if current["size"] != source.get("size"):
+        return False
+    if current["mtime_ns"] == source.get("mtime_ns"):
+        return True
+    # Same size but touched: trust the content hash and refresh the stored mtime.
+    if file_sha256(path) != source.get("sha256"):
+        return False
+    source["mtime_ns"] = current["mtime_ns"]
+    write_manifest(manifest_path, manifest)
+    return True
+
+
+def project(df: pd.DataFrame, columns: Optional[Callable[[str], bool]]) -> pd.DataFrame:
+    if columns is None:
+        return df
+    return df[[c for c in df.columns if columns(str(c))]]
+
+
+def cached_read(
+    path: Path,
+    loader: Callable[[Path], pd.DataFrame],
+    logger: logging.Logger,
+    cache_dir: Path = CACHE_DIR,
+    refresh: bool = False,
+    variant: str = "",
+    columns: Optional[Callable[[str], bool]] = None,
+) -> pd.DataFrame:
+    """Return ``loader(path)``, served from a Parquet copy while the source is unchanged.
+
+    ``variant`` describes loader settings that change its output (filters,
+    projections); a cached copy built under a different variant is rebuilt.
+    ``columns`` selects the raw column names to return; the cache itself always
+    holds the full parse so that any projection can be served from it.
+    """
+    if pyarrow is None:
+        logger.debug("pyarrow not installed; reading %s without the columnar cache.", path)
+        return project(loader(path), columns)
+    loader_tag = getattr(loader, "__name__", "loader")
+    data_path, manifest_path = cache_paths(path, loader_tag, cache_dir)
+    manifest = read_manifest(manifest_path)
+    if not refresh and is_cache_valid(path, manifest, data_path, manifest_path, variant):
+        logger.info("Using cached columnar copy %s for %s", data_path.name, path.name)
+        names = pq.read_schema(data_path).names
+        selected = None if columns is None else [c for c in names if columns(c)]
+        return pd.read_parquet(data_path, columns=selected)
+
+    df = loader(path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    to_store = df.copy()
+    to_store.columns = [str(c) for c in to_store.columns]
+    tmp_path = data_path.with_suffix(".parquet.tmp")
+    try:
+        to_store.to_parquet(tmp_path, index=False)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Could not cache %s as Parquet (%s); using parsed frame.", path.name, exc)
+        tmp_path.unlink(missing_ok=True)
+        return project(df, columns)
+    os.replace(tmp_path, data_path)
+    write_manifest(
+        manifest_path,
+        {
+            "version": CACHE_VERSION,
+            "loader": loader_tag,
+            "variant": variant,
+            "source_path": str(path),
+            "source": source_fingerprint(path),
+            "rows": len(to_store),
+        },
+    )
+    logger.info("Cached %s rows from %s to %s", len(to_store), path.name, data_path)
+    return project(to_store, columns)
@@ -0,0 +1,99 @@
+"""Cached aggregation of unit-level frames up the geographic hierarchy.
+
+:func:`rollup` aggregates a district- or state-level frame to the requested
+level. On first use it computes every level from the frame's own level up to
+zone in one go and caches all of them, in memory and as Parquet under
+``data/cache/rollups/``, keyed by a hash of the input values and the
+aggregation spec. Later calls at any level, in the same process or a later
+stage, reuse the cached result instead of grouping again.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Mapping
+
+import pandas as pd
+
+from geography import LEVELS, attach_hierarchy
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+ROLLUP_CACHE_DIR = PROJECT_ROOT / "data" / "cache" / "rollups"
+ROLLUP_VERSION = 1
+
+MEMO: Dict[str, Dict[str, pd.DataFrame]] = {}
+
+
+def frame_level(frame: pd.DataFrame) -> str:
+    """Finest geographic level present as a column of ``frame``."""
+    for level in LEVELS:
+        if level in frame.columns:
+            return level
+    raise KeyError("Frame has no district, state or zone column")
+
+
+def rollup_key(frame: pd.DataFrame, aggregations: Mapping[str, str], name: str) -> str:
+    columns = [c for c in (*LEVELS, "year") if c in frame.columns] + list(aggregations)
+    digest = hashlib.sha1(f"{ROLLUP_VERSION}|{name}".encode("utf-8"))
+    digest.update(json.dumps(list(aggregations.items())).encode("utf-8"))
+    digest.update(json.dumps([str(c) for c in columns]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(frame[columns], index=False).to_numpy().tobytes())
+    return f"{name}-{digest.hexdigest()[:16]}"
+
+
+def compute_rollups(
+    frame: pd.DataFrame, aggregations: Mapping[str, str]
+) -> Dict[str, pd.DataFrame]:
+    """One aggregate per level from the frame's level up, each indexed by that level's unit."""
+    frame = attach_hierarchy(frame)
+    start = LEVELS.index(frame_level(frame))
+    results: Dict[str, pd.DataFrame] = {}
+    for position in range(start, len(LEVELS)):
+        level = LEVELS[position]
+        parents: List[str] = [p for p in LEVELS[position + 1:] if p in frame.columns]
+        spec = {**dict(aggregations), **{parent: "first" for parent in parents}}
+        results[level] = frame.groupby(level, observed=True, sort=True).agg(spec)
+    return results
+
+
+def rollup(
+    frame: pd.DataFrame,
+    level: str,
+    aggregations: Mapping[str, str],
+    logger: logging.Logger,
+    name: str = "frame",
+    cache_dir: Path = ROLLUP_CACHE_DIR,
+) -> pd.DataFrame:
+    """``frame`` aggregated to ``level`` with ``aggregations`` (column -> pandas agg name).
+
+    The result is indexed by the ``level`` unit and also carries the unit's
+    coarser parents (e.g. ``state`` and ``zone`` for districts).
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Unknown geographic level '{level}'")
+    if LEVELS.index(level) < LEVELS.index(frame_level(frame)):
+        raise ValueError(f"Cannot disaggregate a {frame_level(frame)}-level frame to {level}")
+    key = rollup_key(frame, aggregations, name)
+    cached = MEMO.get(key)
+    if cached is None:
+        paths = {lvl: cache_dir / f"{key}.{lvl}.parquet" for lvl in LEVELS}
+        if paths[level].exists():
+            cached = {
+                lvl: pd.read_parquet(path) for lvl, path in paths.items() if path.exists()
+            }
+            logger.info("Loaded cached %s roll-ups (%s).", name, key)
+        else:
+            cached = compute_rollups(frame, aggregations)
+            try:
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                for stale in cache_dir.glob(f"{name}-*.parquet"):
+                    stale.unlink()
+                for lvl, result in cached.items():
+                    result.to_parquet(paths[lvl])
+            except (ImportError, OSError, ValueError) as exc:
+                logger.warning("Could not cache %s roll-ups: %s", name, exc)
+            logger.info("Computed %s roll-ups for levels %s.", name, ", ".join(cached))
+        MEMO[key] = cached
+    return cached[level].copy()
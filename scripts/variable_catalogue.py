@@ -0,0 +1,262 @@
+"""Variable catalogue and long-format (state, year, variable, value) store.
+
+The wide panel carries one column per source column, most of them empty for
+most states. ``02_clean_merge.py`` additionally writes every observed panel
+value as one row of ``data/processed/<level>_year_long.parquet``, so storage
+scales with observed values, together with ``variable_catalogue.csv``
+(``variable_catalogue_district.csv`` for the district panel) describing each
+variable's source, unit and meaning.
+
+Stages ask for variables by their short catalogue name (e.g.
+``tb_notified_2023``) through :func:`read_variables`, which pivots only the
+requested variables back to a wide state-year frame. Panel columns without a
+curated entry are catalogued under their panel column name.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from dataset_schemas import SCHEMAS
+from geography import level_suffix, resolve_states
+from panel_store import KEY_COLUMNS, read_panel
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+PROCESSED_DIR = PROJECT_ROOT / "data" / "processed"
+# Rows are sorted by variable, so row groups of this size let variable
+# filters skip most of the file once the store grows to district scale.
+ROW_GROUP_ROWS = 50_000
+KIND_UNITS = {"count": "count", "rate": "rate", "percent": "%"}
+
+
+@dataclass(frozen=True)
+class Variable:
+    name: str
+    dataset: str
+    column: str
+    unit: str
+    description: str
+
+    @property
+    def panel_column(self) -> str:
+        return f"{self.dataset}_{self.column}"
+
+
+CATALOGUE: Dict[str, Variable] = {
+    v.name: v
+    for v in (
+        Variable("population", "census", "population", "persons", "Census 2011 population"),
+        Variable("households", "census", "households", "households", "Census 2011 households"),
+        Variable(
+            "households_with_assets",
+            "census",
+            "households_with_tv_computer_laptop_telephone_mobile_phone_and_scooter_car",
+            "households",
+            "Households owning a TV, computer/laptop, telephone/mobile and scooter/car (Census 2011)",
+        ),
+        Variable("literacy_rate_pct", "census", "literacy_rate_pct", "%", "Literacy rate (Census 2011)"),
+        Variable(
+            "tb_notified_2025",
+            "india_tb_notifications_2025",
+            "total_notified_2025",
+            "cases",
+            "TB patients notified in 2025 (Ni-kshay)",
+        ),
+        Variable(
+            "tb_notified_2023",
+            "india_tb_reports",
+            "2023__tb_patients_notified",
+            "cases",
+            "TB patients notified in 2023 (India TB Report)",
+        ),
+        Variable(
+            "tb_notified_2024",
+            "india_tb_reports",
+            "2024__tb_patients_notified",
+            "cases",
+            "TB patients notified in 2024 (India TB Report)",
+        ),
+        Variable(
+            "tb_treated_successfully_2023",
+            "india_tb_reports",
+            "2023__treated_successfully",
+            "cases",
+            "Patients notified in 2023 and treated successfully (India TB Report)",
+        ),
+        Variable(
+            "tb_deaths_2024_jan_oct",
+            "india_tb_reports",
+            "tb_deaths__2024_january_to_october",
+            "deaths",
+            "TB deaths, January to October 2024 (India TB Report)",
+        ),
+        Variable(
+            "improved_sanitation_pct",
+            "nfhs",
+            "population_living_in_households_that_use_an_improved_sanitation_facility2_(%)",
+            "%",
+            "Population in households using an improved sanitation facility (NFHS-5)",
+        ),
+        Variable(
+            "clean_cooking_fuel_pct",
+            "nfhs",
+            "households_using_clean_fuel_for_cooking3_(%)",
+            "%",
+            "Households using clean fuel for cooking (NFHS-5)",
+        ),
+    )
+}
+PANEL_COLUMN_NAMES = {v.panel_column: v.name for v in CATALOGUE.values()}
+
+
+def long_store_path(level: str = "state") -> Path:
+    return PROCESSED_DIR / f"{level}_year_long.parquet"
+
+
+def catalogue_path(level: str = "state") -> Path:
+    return PROCESSED_DIR / f"variable_catalogue{level_suffix(level)}.csv"
+
+
+def panel_column(name: str) -> str:
+    """Panel column holding variable ``name``; uncatalogued names are taken as columns."""
+    variable = CATALOGUE.get(name)
+    return variable.panel_column if variable else name
+
+
+def describe_column(column: str) -> Variable:
+    """Catalogue entry for a panel column, generated from the schema when not curated."""
+    name = PANEL_COLUMN_NAMES.get(column)
+    if name:
+        return CATALOGUE[name]
+    datasets = [d for d in SCHEMAS if column.startswith(f"{d}_")]
+    if not datasets:
+        return Variable(column, "", column, "", "")
+    dataset = max(datasets, key=len)
+    source_column = column[len(dataset) + 1:]
+    kind = SCHEMAS[dataset].kind_of(source_column)
+    return Variable(
+        column,
+        dataset,
+        source_column,
+        KIND_UNITS.get(kind or "", ""),
+        source_column.replace("_", " ").strip(),
+    )
+
+
+def to_long(panel: pd.DataFrame) -> pd.DataFrame:
+    """Observed numeric panel cells as (state, year, variable, value) rows."""
+    keys = [c for c in KEY_COLUMNS if c in panel.columns]
+    values = panel.drop(columns=keys).apply(pd.to_numeric, errors="coerce")
+    values = values.loc[:, values.notna().any()]
+    names = [describe_column(str(c)).name for c in values.columns]
+    matrix = values.to_numpy(dtype="float64")
+    # Column-major scan keeps each variable's rows contiguous.
+    var_idx, row_idx = np.nonzero(~np.isnan(matrix.T))
+    long = pd.DataFrame(index=pd.RangeIndex(len(row_idx)))
+    for key in keys:
+        categorical = pd.Categorical(panel[key])
+        long[key] = pd.Categorical.from_codes(
+            categorical.codes[row_idx], categories=categorical.categories
+        )
+    long["variable"] = pd.Categorical.from_codes(var_idx, categories=names)
+    long["value"] = matrix[row_idx, var_idx]
+    return long
+
+
+def write_variable_store(
+    panel: pd.DataFrame, logger: logging.Logger, level: str = "state"
+) -> pd.DataFrame:
+    """Write the long store and the catalogue; returns the catalogue frame."""
+    long = to_long(panel)
+    counts = long["variable"].value_counts(sort=False)
+    catalogue = pd.DataFrame(
+        [
+            {**asdict(describe_column(str(c))), "panel_column": str(c)}
+            for c in panel.columns
+            if c not in KEY_COLUMNS
+        ]
+    )
+    if not catalogue.empty:
+        catalogue["n_observed"] = catalogue["name"].map(counts).fillna(0).astype(int)
+    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    catalogue.to_csv(catalogue_path(level), index=False)
+    if pq is None:
+        logger.warning("pyarrow not installed; long-format variable store not written.")
+        return catalogue
+    table = pa.Table.from_pandas(long, preserve_index=False)
+    pq.write_table(table, long_store_path(level), row_group_size=ROW_GROUP_ROWS)
+    wide_cells = len(panel) * max(len(catalogue), 1)
+    logger.info(
+        "Long store holds %s observed values of %s variables (%.0f%% of wide panel cells).",
+        len(long), long["variable"].nunique(), 100 * len(long) / wide_cells,
+    )
+    return catalogue
+
+
+def read_variables(
+    variables: Iterable[str],
+    states: Optional[Iterable[str]] = None,
+    years: Optional[Iterable[object]] = None,
+    logger: Optional[logging.Logger] = None,
+    level: str = "state",
+) -> pd.DataFrame:
+    """Wide ``level``-by-year frame with one column per requested variable.
+
+    Rows are the state-years observing at least one of ``variables``.
+    Without pyarrow or the long store, the same frame is read from the wide
+    panel store instead.
+    """
+    variables = list(dict.fromkeys(variables))
+    wanted_states = None
+    if states is not None:
+        wanted_states = resolve_states(pd.Series(list(states), dtype=object)).dropna().tolist()
+    store_path = long_store_path(level)
+    if pq is None or not store_path.exists():
+        return read_variables_from_panel(variables, wanted_states, years, logger, level)
+
+    names = pq.read_schema(store_path).names
+    filters = [("variable", "in", variables)]
+    if wanted_states is not None:
+        filters.append(("state", "in", wanted_states))
+    if years is not None and "year" in names:
+        filters.append(("year", "in", list(years)))
+    long = pq.read_table(store_path, filters=filters).to_pandas()
+    keys = [c for c in KEY_COLUMNS if c in names]
+    missing = sorted(set(variables) - set(long["variable"].astype(str)))
+    if missing and logger is not None:
+        logger.warning("No observed values for variable(s): %s", ", ".join(missing))
+    long["variable"] = pd.Categorical(long["variable"].astype(str), categories=variables)
+    wide = long.pivot(index=keys, columns="variable", values="value")
+    wide = wide.reindex(columns=variables).reset_index()
+    wide.columns.name = None
+    wide = wide.dropna(subset=variables, how="all")
+    return wide.sort_values(keys, kind="stable").reset_index(drop=True)
+
+
+def read_variables_from_panel(
+    variables: List[str],
+    states: Optional[List[str]],
+    years: Optional[Iterable[object]],
+    logger: Optional[logging.Logger],
+    level: str = "state",
+) -> pd.DataFrame:
+    columns = {panel_column(name): name for name in variables}
+    panel = read_panel(
+        columns=list(columns), years=years, states=states, logger=logger, level=level
+    )
+    panel = panel.rename(columns=columns)
+    keys = [c for c in KEY_COLUMNS if c in panel.columns]
+    panel = panel.reindex(columns=keys + variables)
+    return panel.dropna(subset=variables, how="all").reset_index(drop=True)